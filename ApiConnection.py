@@ -0,0 +1,237 @@
+import contextlib
+import copy
+import random
+import socket
+import threading
+import time
+
+from kubernetes import client
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import HTTPError, MaxRetryError, ReadTimeoutError
+
+from Logger import Logger
+from Metrics import Metrics
+
+
+class CircuitOpenError(Exception):
+    # raised instead of sending a request while the circuit breaker is open
+    pass
+
+
+class OfflineError(Exception):
+    # raised instead of sending a request in offline mode
+    pass
+
+
+class CircuitBreaker:
+    # A class for failing requests fast while the API server is unreachable.
+    # After failure_threshold consecutive connection failures (or 502/503/504 responses) the circuit opens and
+    # requests fail at once with CircuitOpenError. After cooldown_seconds one trial request is let through:
+    # its success closes the circuit, its failure opens it for another cooldown.
+    STATE_CLOSED = "closed"
+    STATE_OPEN = "open"
+    STATE_HALF_OPEN = "half-open"
+    MSG_OPENED = "API server unreachable ({}), failing requests for {:.0f}s"
+    MSG_OPEN = "API server unreachable, retrying in {:.0f}s ({})"
+    MSG_CLOSED = "API server reachable again"
+
+    def __init__(self, failure_threshold, cooldown_seconds):
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.STATE_CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        # raises CircuitOpenError when the request must not be sent
+        with self.lock:
+            if self.state == self.STATE_CLOSED:
+                return
+            remaining = self.opened_at + self.cooldown_seconds - time.monotonic()
+            if self.state == self.STATE_OPEN and remaining <= 0:
+                # this request is the trial, others keep failing fast until it is answered
+                self.state = self.STATE_HALF_OPEN
+                return
+            raise CircuitOpenError(self.MSG_OPEN.format(max(remaining, 0), self.last_error))
+
+    def record_success(self):
+        with self.lock:
+            reopened = self.state != self.STATE_CLOSED
+            self.state = self.STATE_CLOSED
+            self.failures = 0
+        if reopened:
+            Logger.info(self.MSG_CLOSED)
+
+    def record_failure(self, err):
+        with self.lock:
+            self.failures += 1
+            self.last_error = ApiConnection.describe_error(err)
+            if self.state == self.STATE_OPEN or (self.state == self.STATE_CLOSED
+                                                 and self.failures < self.failure_threshold):
+                return
+            self.state = self.STATE_OPEN
+            self.opened_at = time.monotonic()
+        Logger.warn(self.MSG_OPENED.format(self.last_error, self.cooldown_seconds))
+
+    @property
+    def is_open(self):
+        return self.state != self.STATE_CLOSED
+
+
+class RetryPolicy:
+    # Which failed requests are sent again and after how long.
+    # Throttled requests (429) were not processed and are retried whatever their method; connection failures,
+    # read timeouts and server errors only for idempotent methods. The wait is the server's Retry-After when
+    # it sends one, else a jittered exponential backoff.
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+    HTTP_STATUS_TOO_MANY_REQUESTS = 429
+    RETRYABLE_STATUS = (500, 502, 503, 504)
+
+    def __init__(self, max_retries, backoff_base_seconds, backoff_max_seconds):
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+
+    def is_retryable(self, method, err):
+        status = getattr(err, "status", None)
+        if status == self.HTTP_STATUS_TOO_MANY_REQUESTS:
+            return True
+        if method.upper() not in self.IDEMPOTENT_METHODS:
+            return False
+        if status is None:
+            return isinstance(err, HTTPError)
+        return status in self.RETRYABLE_STATUS
+
+    def delay(self, attempt, err):
+        return self.backoff(attempt, err, self.backoff_base_seconds, self.backoff_max_seconds)
+
+    @staticmethod
+    def backoff(attempt, err, base_seconds, max_seconds):
+        # seconds to wait before the next attempt: Retry-After if given, else jittered exponential
+        headers = getattr(err, "headers", None) or {}
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), max_seconds)
+            except ValueError:
+                pass
+        return random.uniform(0, min(max_seconds, base_seconds * 2 ** attempt))
+
+
+class ApiConnection:
+    # A factory of tuned ApiClients sharing one RetryPolicy and one CircuitBreaker.
+    # The ApiClients get a connection pool of pool_maxsize connections with TCP keep-alive, a connect timeout
+    # and, for requests that are not watches or log follows, a read timeout. Their request method is wrapped
+    # so failed requests are retried and the circuit breaker sees every outcome. urllib3's own retries are
+    # turned off: they would retry behind the policy's back and hide failures from the breaker.
+    PHASE_RETRY = "retry backoff"
+    STREAMING_PARAMS = ("watch", "follow")
+    SERVER_FAILURE_STATUS = (502, 503, 504)
+    MSG_OFFLINE = "offline mode, not sending {} {}"
+
+    def __init__(self, pool_maxsize, connect_timeout, read_timeout, keepalive_seconds, retry_policy,
+                 circuit_breaker):
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_seconds = keepalive_seconds
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.local = threading.local()
+        # in offline mode no request is sent, see Client.offline
+        self.offline = False
+
+    def new_api_client(self, pool_maxsize=None, configuration=None):
+        # ApiClient on a copy of configuration, by default of the default configuration (see
+        # Client.load_kube_config), timed by Metrics
+        if configuration is None:
+            configuration = client.Configuration.get_default_copy()
+        else:
+            configuration = copy.deepcopy(configuration)
+        configuration.connection_pool_maxsize = pool_maxsize or self.pool_maxsize
+        configuration.retries = False
+        api_client = client.ApiClient(configuration)
+        if self.keepalive_seconds:
+            api_client.rest_client.pool_manager.connection_pool_kw["socket_options"] = self.socket_options()
+        request = api_client.request
+
+        def retrying_request(method, url, *args, **kwargs):
+            return self.send(request, method, url, *args, **kwargs)
+
+        api_client.request = retrying_request
+        return Metrics.instrument(api_client)
+
+    def socket_options(self):
+        # probe idle connections so a pooled connection to a vanished server is noticed
+        options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            options += [(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_seconds),
+                        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, self.keepalive_seconds),
+                        (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)]
+        return options
+
+    def send(self, request, method, url, *args, **kwargs):
+        # one request with the default timeouts, retried per the RetryPolicy
+        if self.offline:
+            raise OfflineError(self.MSG_OFFLINE.format(method, url))
+        kwargs["_request_timeout"] = self.timeout_of(kwargs.get("_request_timeout"), kwargs.get("query_params"))
+        attempt = 0
+        while True:
+            self.circuit_breaker.before_request()
+            try:
+                response = request(method, url, *args, **kwargs)
+            except Exception as err:
+                if self.is_server_failure(err):
+                    self.circuit_breaker.record_failure(err)
+                else:
+                    self.circuit_breaker.record_success()
+                if getattr(self.local, "retries_disabled", False) or attempt >= self.retry_policy.max_retries \
+                        or self.circuit_breaker.is_open or not self.retry_policy.is_retryable(method, err):
+                    raise
+                attempt += 1
+                delay = self.retry_policy.delay(attempt, err)
+            else:
+                self.circuit_breaker.record_success()
+                return response
+            Metrics.record(self.PHASE_RETRY, delay)
+            time.sleep(delay)
+
+    def timeout_of(self, request_timeout, query_params):
+        # (connect, read) timeout of a request: watches and log follows wait for data as long as they are open,
+        # a single number is a read timeout (the generated client ignores numbers that are not int)
+        if isinstance(request_timeout, tuple):
+            return request_timeout
+        if request_timeout is not None:
+            return self.connect_timeout, request_timeout
+        streaming = any(key in self.STREAMING_PARAMS and value for key, value in query_params or ())
+        return self.connect_timeout, None if streaming else self.read_timeout
+
+    @classmethod
+    def is_server_failure(cls, err):
+        # the API server could not be reached or could not answer, as opposed to answering with an error
+        status = getattr(err, "status", None)
+        if status is None:
+            return isinstance(err, HTTPError) and not isinstance(err, ReadTimeoutError)
+        return status in cls.SERVER_FAILURE_STATUS
+
+    @contextlib.contextmanager
+    def retries_disabled(self):
+        # requests of the calling thread are sent once, for callers with their own retry loop
+        self.local.retries_disabled = True
+        try:
+            yield
+        finally:
+            self.local.retries_disabled = False
+
+    @staticmethod
+    def describe_error(err):
+        # short cause of a connection error, e.g. "[Errno 111] Connection refused"
+        if isinstance(err, MaxRetryError) and err.reason is not None:
+            err = err.reason
+        status = getattr(err, "status", None)
+        if status is not None:
+            return "{} {}".format(status, getattr(err, "reason", "") or "")
+        cause = err.__cause__ if isinstance(err, HTTPError) else None
+        return str(cause if cause is not None else err)
@@ -0,0 +1,435 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from Config import DEPLOY_POD_FILE, EXEC_PARALLELISM, EXEC_TIMEOUT_SECONDS, BULK_DELETE_CONCURRENCY, BULK_DELETE_QPS, \
+    BULK_SCALE_CONCURRENCY, BULK_SCALE_QPS, SUMMARY_TOP
+from Logger import Logger
+from Metrics import Metrics
+from Renderer import TableRenderer
+from Stats import Stats
+
+
+class PlanError(Exception):
+    # a plan that can not be run: unreadable, unknown operation, missing parameter, unknown or cyclic dependency
+    pass
+
+
+class Operation:
+    # One step of a plan: an operation name (see BatchOperations.PARAMETERS), its parameters and the ids of
+    # the operations it runs after
+    __slots__ = ("id", "op", "params", "after")
+
+    def __init__(self, operation_id, op, params, after=()):
+        self.id = operation_id
+        self.op = op
+        self.params = params
+        self.after = tuple(after)
+
+
+class OperationResult:
+    # Outcome of one operation, started and elapsed are seconds from the start of the plan
+    __slots__ = ("id", "op", "status", "started", "elapsed", "errors", "detail")
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_SKIPPED = "skipped"
+
+    def __init__(self, operation, status, started=None, elapsed=None, errors=(), detail=None):
+        self.id = operation.id
+        self.op = operation.op
+        self.status = status
+        self.started = started
+        self.elapsed = elapsed
+        self.errors = list(errors)
+        self.detail = detail or {}
+
+    @property
+    def succeeded(self):
+        return self.status == self.STATUS_SUCCEEDED
+
+    @staticmethod
+    def describe_error(error):
+        # one line for a logged error or an exception: "status reason" and the message of the Status body for
+        # an ApiException, whose str() spans the headers and body
+        status = getattr(error, "status", None)
+        if status is None:
+            return " ".join(str(error).split())
+        description = "{} {}".format(status, getattr(error, "reason", "") or "").strip()
+        try:
+            message = json.loads(error.body).get("message")
+        except (TypeError, ValueError, AttributeError):
+            message = None
+        return "{}: {}".format(description, " ".join(message.split())) if message else description
+
+    def to_dict(self):
+        return {"id": self.id, "op": self.op, "status": self.status,
+                "started_seconds": None if self.started is None else round(self.started, 6),
+                "elapsed_seconds": None if self.elapsed is None else round(self.elapsed, 6),
+                "errors": self.errors, "detail": self.detail}
+
+
+class BatchOperations:
+    # A class for running the operations of the menus without prompts, with the same Client methods.
+    # The Client methods report failures through Logger.err and return, an operation failed when it
+    # logged an error (see Logger.capture_errors) or its result says so.
+    # PARAMETERS maps each operation to its (required, optional) parameters
+    PARAMETERS = {
+        "list": ((), ("kind",)),
+        "describe": (("name",), ()),
+        "create": (("image", "name"), ("wait",)),
+        "scale": (("deployment", "replicas"), ("wait",)),
+        "exec": ((), ("command", "pattern", "selector", "parallelism", "timeout")),
+        "delete": (("name",), ()),
+        "deploy": (("name",), ("manifest", "wait")),
+        "bulk-delete": ((), ("pattern", "selector", "grace_period", "dry_run", "concurrency")),
+        "bulk-scale": (("replicas",), ("pattern", "selector", "dry_run", "concurrency")),
+        "summary": ((), ("top",)),
+    }
+    KIND_PODS = "pods"
+    KIND_DEPLOYMENTS = "deployments"
+    KINDS = (KIND_PODS, KIND_DEPLOYMENTS)
+    MSG_ERR_UNKNOWN_KIND = "Unknown kind: {}, expected one of {}"
+    MSG_ERR_NO_MATCHING_POD = "No pod matching: {}"
+    MSG_ERR_NO_RUNNING_POD = "No running pod matching: {}"
+    MSG_ERR_NOT_READY = "{} not ready"
+    MSG_ERR_EXEC_FAILED = "{} of {} pods failed"
+    MSG_ERR_UNKNOWN_OPERATION = "Unknown operation: {}, expected one of {}"
+    MSG_ERR_MISSING_PARAMETERS = "Operation {} needs {}"
+    MSG_ERR_UNKNOWN_PARAMETERS = "Unknown parameters of {}: {}"
+
+    def __init__(self, k8s_client, listing_client=None):
+        # listing_client lists pods and deployments, a MultiClusterClient to list several clusters
+        self.k8s_client = k8s_client
+        self.listing_client = listing_client or k8s_client
+
+    @classmethod
+    def validate(cls, op, params):
+        # raises PlanError for an unknown operation or missing/unknown parameters
+        if op not in cls.PARAMETERS:
+            raise PlanError(cls.MSG_ERR_UNKNOWN_OPERATION.format(op, ", ".join(cls.PARAMETERS)))
+        required, optional = cls.PARAMETERS[op]
+        missing = [name for name in required if params.get(name) in (None, "")]
+        if missing:
+            raise PlanError(cls.MSG_ERR_MISSING_PARAMETERS.format(op, ", ".join(missing)))
+        unknown = sorted(set(params) - set(required) - set(optional))
+        if unknown:
+            raise PlanError(cls.MSG_ERR_UNKNOWN_PARAMETERS.format(op, ", ".join(unknown)))
+
+    def run(self, operation):
+        # run one operation, returns (errors, detail)
+        with Logger.capture_errors() as errors:
+            detail = getattr(self, "run_" + operation.op.replace("-", "_"))(**operation.params)
+        return [OperationResult.describe_error(error) for error in errors], detail
+
+    def run_list(self, kind=KIND_PODS):
+        if kind == self.KIND_PODS:
+            rows = self.listing_client.list_all_pods()
+        elif kind == self.KIND_DEPLOYMENTS:
+            rows = self.listing_client.list_k8s_deployments()
+        else:
+            raise ValueError(self.MSG_ERR_UNKNOWN_KIND.format(kind, ", ".join(self.KINDS)))
+        return {"count": len(rows)}
+
+    def run_describe(self, name):
+        # like the menu, an exact name wins, otherwise every pod with the prefix
+        names = []
+        pod_index = self.k8s_client.get_pod_index()
+        for pod_name in self.names_of(name):
+            matched_pods = [pod_name] if pod_index.contains(pod_name) else pod_index.prefix_matches(pod_name)
+            if len(matched_pods) == 0:
+                raise ValueError(self.MSG_ERR_NO_MATCHING_POD.format(pod_name))
+            for matched_pod in matched_pods:
+                self.k8s_client.describe_k8s_pod(matched_pod)
+            names.extend(matched_pods)
+        return {"pods": names}
+
+    def run_create(self, image, name, wait=None):
+        # image is a registered manifest name (nginx, redis) or a manifest file
+        return self.rollout_detail(name, wait, self.k8s_client.create_k8s_pod(image, name, wait))
+
+    def run_scale(self, deployment, replicas, wait=None):
+        return self.rollout_detail(deployment, wait,
+                                   self.k8s_client.scale_k8s_deployment(deployment, str(replicas), wait))
+
+    def run_exec(self, command=None, pattern=None, selector=None, parallelism=EXEC_PARALLELISM,
+                 timeout=EXEC_TIMEOUT_SECONDS):
+        pod_keys = self.k8s_client.select_pods(pattern, selector)
+        if len(pod_keys) == 0:
+            raise ValueError(self.MSG_ERR_NO_RUNNING_POD.format(
+                " ".join(filter(None, (pattern, selector))) or "*"))
+        results = self.k8s_client.exec_on_pods(pod_keys, command or self.k8s_client.DEFAULT_EXEC_CMD,
+                                               int(parallelism), float(timeout))
+        failed = [result.name for result in results if not result.succeeded]
+        if failed:
+            Logger.err(self.MSG_ERR_EXEC_FAILED.format(len(failed), len(results)))
+        return {"pods": len(results), "failed": failed}
+
+    def run_delete(self, name):
+        names = self.names_of(name)
+        for pod_name in names:
+            self.k8s_client.delete_k8s_pod(pod_name)
+        return {"pods": names}
+
+    def run_deploy(self, name, manifest=DEPLOY_POD_FILE, wait=None):
+        return self.rollout_detail(name, wait, self.k8s_client.deploy_k8s_pod(manifest, name, wait))
+
+    def run_bulk_delete(self, pattern=None, selector=None, grace_period=None, dry_run=False,
+                        concurrency=BULK_DELETE_CONCURRENCY):
+        # urllib3, used for the retry decisions, is only needed once something is deleted
+        from BulkOperations import BulkDeleter
+        bulk_deleter = BulkDeleter(self.k8s_client, concurrency, BULK_DELETE_QPS, grace_period)
+        if dry_run:
+            return {"pods": len(bulk_deleter.preview(pattern, selector)), "dry_run": True}
+        return self.bulk_detail(bulk_deleter.delete(pattern, selector))
+
+    def run_bulk_scale(self, replicas, pattern=None, selector=None, dry_run=False,
+                       concurrency=BULK_SCALE_CONCURRENCY):
+        from BulkOperations import BulkScaler
+        bulk_scaler = BulkScaler(self.k8s_client, concurrency, BULK_SCALE_QPS)
+        if dry_run:
+            return {"deployments": len(bulk_scaler.preview(int(replicas), pattern, selector)), "dry_run": True}
+        return self.bulk_detail(bulk_scaler.scale(int(replicas), pattern, selector))
+
+    def run_summary(self, top=SUMMARY_TOP):
+        # summary of the first context's pods, its failures were logged
+        summary = self.k8s_client.show_pod_summary(int(top))
+        if summary is None:
+            return None
+        return {"pods": summary.count, "phases": {str(phase): count for phase, count in summary.phases},
+                "not_ready_controllers": len(summary.owners)}
+
+    @staticmethod
+    def bulk_detail(result):
+        # the failures were logged by the bulk operation's summary
+        return {"succeeded": result.succeeded, "failed": len(result.failures), "retries": result.retries,
+                "per_second": round(result.throughput, 1)}
+
+    def rollout_detail(self, name, wait, rollout_seconds):
+        # with a wait, a rollout that did not complete is a failure
+        if wait is None:
+            return {"name": name}
+        if rollout_seconds is None:
+            Logger.err(self.MSG_ERR_NOT_READY.format(name))
+        return {"name": name, "rollout_seconds": rollout_seconds}
+
+    @staticmethod
+    def names_of(name):
+        # a name parameter is one name or a list of names
+        return [name] if isinstance(name, str) else list(name)
+
+
+class PlanScheduler:
+    # A class for running the operations of a plan concurrently, in dependency order.
+    # An operation starts once every operation in its "after" list succeeded, up to concurrency operations
+    # run at a time. Operations after a failed or skipped one are skipped. Results are in plan order.
+    PHASE_OPERATION = "batch {}"
+    MSG_INFO_STARTED = "[{}] {} started"
+    MSG_INFO_FINISHED = "[{}] {} {} in {:.2f}s"
+    MSG_INFO_SKIPPED = "[{}] {} skipped, an operation it runs after did not succeed"
+    MSG_ERR_DUPLICATE_ID = "Duplicate operation id: {}"
+    MSG_ERR_UNKNOWN_DEPENDENCY = "Operation {} runs after unknown operation {}"
+    MSG_ERR_CYCLE = "Dependency cycle through operation {}"
+
+    def __init__(self, operations, run_operation, concurrency, show_progress=True):
+        # run_operation(operation) returns (errors, detail), an exception fails the operation.
+        # show_progress prints a line as each operation starts and ends
+        self.operations = operations
+        self.run_operation = run_operation
+        self.concurrency = max(int(concurrency), 1)
+        self.show_progress = show_progress
+        self.check(operations)
+        self.output_lock = threading.Lock()
+
+    @classmethod
+    def check(cls, operations):
+        # raises PlanError for duplicate ids, unknown dependencies and dependency cycles
+        by_id = {}
+        for operation in operations:
+            if operation.id in by_id:
+                raise PlanError(cls.MSG_ERR_DUPLICATE_ID.format(operation.id))
+            by_id[operation.id] = operation
+        for operation in operations:
+            for dependency in operation.after:
+                if dependency not in by_id:
+                    raise PlanError(cls.MSG_ERR_UNKNOWN_DEPENDENCY.format(operation.id, dependency))
+        # depth first search, a dependency met again while on the path closes a cycle
+        visiting, visited = set(), set()
+        for operation in operations:
+            if operation.id in visited:
+                continue
+            stack = [(operation.id, iter(operation.after))]
+            visiting.add(operation.id)
+            while stack:
+                operation_id, dependencies = stack[-1]
+                dependency = next(dependencies, None)
+                if dependency is None:
+                    stack.pop()
+                    visiting.discard(operation_id)
+                    visited.add(operation_id)
+                elif dependency in visiting:
+                    raise PlanError(cls.MSG_ERR_CYCLE.format(dependency))
+                elif dependency not in visited:
+                    visiting.add(dependency)
+                    stack.append((dependency, iter(by_id[dependency].after)))
+
+    def run(self):
+        # run the plan, returns an OperationResult per operation
+        results = {}
+        waiting = {operation.id: set(operation.after) for operation in self.operations}
+        dependents = {operation.id: [] for operation in self.operations}
+        for operation in self.operations:
+            for dependency in operation.after:
+                dependents[dependency].append(operation)
+        by_id = {operation.id: operation for operation in self.operations}
+        ready = [operation for operation in self.operations if len(waiting[operation.id]) == 0]
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            running = {}
+            while ready or running:
+                for operation in ready:
+                    running[executor.submit(self.run_one, operation, started_at)] = operation
+                ready = []
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                finished = []
+                for future in done:
+                    result = future.result()
+                    results[result.id] = result
+                    finished.append(by_id[running.pop(future).id])
+                # skipping cascades through the dependents of skipped operations
+                while finished:
+                    operation = finished.pop()
+                    for dependent in dependents[operation.id]:
+                        if dependent.id in results:
+                            continue
+                        if not results[operation.id].succeeded:
+                            results[dependent.id] = OperationResult(dependent, OperationResult.STATUS_SKIPPED)
+                            self.show(dependent, results[dependent.id])
+                            finished.append(dependent)
+                            continue
+                        waiting[dependent.id].discard(operation.id)
+                        if len(waiting[dependent.id]) == 0:
+                            ready.append(dependent)
+        return [results[operation.id] for operation in self.operations]
+
+    def run_one(self, operation, plan_started_at):
+        started_at = time.perf_counter()
+        self.show(operation)
+        errors = []
+        detail = None
+        try:
+            with Metrics.timed(self.PHASE_OPERATION.format(operation.op)):
+                errors, detail = self.run_operation(operation)
+        except BrokenPipeError:
+            # stdout was closed by its reader, not a failure of the operation: ends the run (see __main__)
+            raise
+        except Exception as err:
+            Logger.err(err)
+            errors = errors + [OperationResult.describe_error(err)]
+        status = OperationResult.STATUS_FAILED if errors else OperationResult.STATUS_SUCCEEDED
+        result = OperationResult(operation, status, started_at - plan_started_at, time.perf_counter() - started_at,
+                                 errors, detail)
+        self.show(operation, result)
+        return result
+
+    def show(self, operation, result=None):
+        # progress lines, only when several operations can interleave their output
+        if not self.show_progress or len(self.operations) == 1:
+            return
+        with self.output_lock:
+            if result is None:
+                Logger.sub_info(self.MSG_INFO_STARTED.format(operation.id, operation.op))
+            elif result.status == OperationResult.STATUS_SKIPPED:
+                Logger.warn(self.MSG_INFO_SKIPPED.format(operation.id, operation.op))
+            else:
+                Logger.sub_info(self.MSG_INFO_FINISHED.format(operation.id, operation.op, result.status,
+                                                              result.elapsed))
+
+
+class BatchRunner:
+    # A class for running a plan file, or a single operation given on the command line, without the menus.
+    # A plan is YAML or JSON, either a list of operations or a mapping with "operations" and optionally
+    # "concurrency". Each operation is a mapping with "op", its parameters, an optional "id" (default
+    # "<op>-<position>") and an optional "after" list of the ids it has to wait for, e.g.
+    #   concurrency: 4
+    #   operations:
+    #     - {id: web, op: create, image: nginx, name: web, wait: 120}
+    #     - {id: scale-web, op: scale, deployment: web, replicas: 3, after: [web]}
+    #     - {op: exec, pattern: "web-*", command: "uname -a", after: [scale-web]}
+    #     - {op: list, kind: deployments}
+    KEY_OPERATIONS = "operations"
+    KEY_CONCURRENCY = "concurrency"
+    KEY_ID = "id"
+    KEY_OP = "op"
+    KEY_AFTER = "after"
+    DEFAULT_CONCURRENCY = 4
+    TITLE_RESULTS = "<Plan Results>"
+    # (title, width) of the result columns, see TableRenderer
+    RESULT_COLUMNS = (("ID", 30), ("OP", 8), ("STATUS", 9), ("START", None), ("TIME", None), ("DETAIL", None))
+    RESULT_KIND = "operation"
+    MSG_INFO_SUMMARY = "{} operations in {:.2f}s: succeeded {}, failed {}, skipped {}"
+    MSG_ERR_UNREADABLE_PLAN = "Unable to read plan {}: {}"
+    MSG_ERR_NO_OPERATIONS = "Plan {} has no list of operations"
+    MSG_ERR_NO_OP = "Operation {} has no op: {}"
+
+    def __init__(self, k8s_client, listing_client=None):
+        self.k8s_client = k8s_client
+        self.operations = BatchOperations(k8s_client, listing_client)
+
+    @classmethod
+    def load_plan(cls, file_name):
+        # (operations, concurrency or None) of a plan file, JSON when it ends with .json else YAML.
+        # yaml is imported here, the CLI's startup does not need it
+        import yaml
+        try:
+            with open(file_name) as f:
+                plan = json.load(f) if file_name.endswith(".json") else yaml.safe_load(f)
+        except (OSError, ValueError, yaml.YAMLError) as err:
+            raise PlanError(cls.MSG_ERR_UNREADABLE_PLAN.format(file_name, err))
+        concurrency = None
+        if isinstance(plan, dict):
+            concurrency = plan.get(cls.KEY_CONCURRENCY)
+            plan = plan.get(cls.KEY_OPERATIONS)
+        if not isinstance(plan, list):
+            raise PlanError(cls.MSG_ERR_NO_OPERATIONS.format(file_name))
+        return [cls.to_operation(position, entry) for position, entry in enumerate(plan, 1)], concurrency
+
+    @classmethod
+    def to_operation(cls, position, entry):
+        if not isinstance(entry, dict) or cls.KEY_OP not in entry:
+            raise PlanError(cls.MSG_ERR_NO_OP.format(position, entry))
+        params = dict(entry)
+        op = params.pop(cls.KEY_OP)
+        operation_id = str(params.pop(cls.KEY_ID, "{}-{}".format(op, position)))
+        after = params.pop(cls.KEY_AFTER, None) or ()
+        BatchOperations.validate(op, params)
+        return Operation(operation_id, op, params, [after] if isinstance(after, str) else [str(a) for a in after])
+
+    def run(self, operations, concurrency=DEFAULT_CONCURRENCY, show_progress=True):
+        # run operations, returns their OperationResults
+        scheduler = PlanScheduler(operations, self.operations.run, concurrency, show_progress)
+        # load kubeconfig and build the shared ApiClient once, before the operations race for them
+        self.k8s_client.api_client
+        return scheduler.run()
+
+    def show_results(self, results, output_format, elapsed):
+        # a table of the results, or one JSON object per operation
+        renderer = TableRenderer(self.RESULT_COLUMNS, output_format, self.TITLE_RESULTS, self.RESULT_KIND)
+        for result in results:
+            detail = "; ".join(result.errors) if result.errors else json.dumps(result.detail, sort_keys=True)
+            renderer.add([result.id, result.op, result.status, Stats.format_ms(result.started),
+                          Stats.format_ms(result.elapsed), detail], result.to_dict(), result.id)
+        renderer.close()
+        if not renderer.is_machine_readable:
+            counts = {status: sum(1 for result in results if result.status == status)
+                      for status in (OperationResult.STATUS_SUCCEEDED, OperationResult.STATUS_FAILED,
+                                     OperationResult.STATUS_SKIPPED)}
+            Logger.info(self.MSG_INFO_SUMMARY.format(len(results), elapsed, counts[OperationResult.STATUS_SUCCEEDED],
+                                                     counts[OperationResult.STATUS_FAILED],
+                                                     counts[OperationResult.STATUS_SKIPPED]))
+
+    @staticmethod
+    def write_results(results, path):
+        with open(path, "w") as f:
+            json.dump([result.to_dict() for result in results], f, indent=2)
+            f.write("\n")
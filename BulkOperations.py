@@ -0,0 +1,358 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from urllib3.exceptions import HTTPError
+
+from ApiConnection import RetryPolicy
+from Logger import Logger
+from Stats import Stats
+
+
+class RateLimiter:
+    # A token bucket limiting the client-side request rate to qps requests per second, with bursts up to burst.
+    # The bucket starts with a single token, so a run does not send a full burst on top of the first second's qps
+
+    def __init__(self, qps, burst=None):
+        self.qps = float(qps)
+        self.burst = float(burst or max(qps, 1))
+        self.tokens = min(1.0, self.burst)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # block until a request may be sent
+        if self.qps <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.qps)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.qps
+            time.sleep(wait)
+
+
+class BulkResult:
+    # Outcome of a bulk run: per-item failures, per-request latencies and throughput
+
+    def __init__(self, total):
+        self.total = total
+        self.succeeded = 0
+        self.failures = []
+        self.retries = 0
+        self.latencies = []
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.succeeded + len(self.failures)
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self):
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add_latency(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def add_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def add_success(self, count=1):
+        with self.lock:
+            self.succeeded += count
+
+    def add_failure(self, name, error):
+        with self.lock:
+            self.failures.append((name, error))
+
+
+class BulkOperation:
+    # A base class for sending one request per item concurrently.
+    # Requests go through a bounded worker pool and a client-side QPS limiter; throttling (429),
+    # server errors (5xx), optimistic-lock conflicts and connection errors are retried with
+    # jittered exponential backoff, honoring Retry-After. Subclasses implement send(item) and name_of(item)
+    # and name what they do in VERB.
+    RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+    HTTP_STATUS_CONFLICT = 409
+    REASON_CONFLICT = "Conflict"
+    BACKOFF_BASE_SECONDS = 0.2
+    BACKOFF_MAX_SECONDS = 10
+    PROGRESS_INTERVAL_SECONDS = 0.5
+    VERB = None
+    MSG_PROGRESS = "{} {}/{}  failed {}  retries {}  {:.1f}/s"
+    MSG_SUMMARY = "{} {} of {} in {:.2f}s ({:.1f}/s), failed {}, retries {}"
+    MSG_LATENCY = "Request latency p50={} p99={} max={}"
+    MSG_FAILURE = "  {}: {}"
+
+    def __init__(self, k8s_client, concurrency, qps, max_retries=5):
+        self.k8s_client = k8s_client
+        self.concurrency = max(int(concurrency), 1)
+        self.rate_limiter = RateLimiter(qps, burst=min(max(int(qps), 1), self.concurrency))
+        self.max_retries = max_retries
+
+    def run(self, items, result=None):
+        # send a request per item and display progress and a summary, returns the BulkResult
+        result = result or BulkResult(len(items))
+        progress_done = threading.Event()
+        progress = threading.Thread(target=self.show_progress, args=(result, progress_done), daemon=True)
+        progress.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                for item in items:
+                    executor.submit(self.run_one, item, result)
+        finally:
+            result.finished_at = time.monotonic()
+            progress_done.set()
+            progress.join()
+        self.show_summary(result)
+        return result
+
+    def run_one(self, item, result):
+        # send the request of one item, retrying transient failures
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            started_at = time.monotonic()
+            try:
+                # this loop does the retrying, the connection's retries would multiply its attempts
+                with self.k8s_client.connection.retries_disabled():
+                    self.send(item)
+                result.add_latency(time.monotonic() - started_at)
+                result.add_success()
+                return
+            except Exception as err:
+                result.add_latency(time.monotonic() - started_at)
+                if attempt >= self.max_retries or not self.is_retryable(err):
+                    result.add_failure(self.name_of(item), self.describe_error(err))
+                    return
+                attempt += 1
+                delay = self.backoff(attempt, err)
+            result.add_retry()
+            time.sleep(delay)
+
+    def send(self, item):
+        # send the request of one item, raising on failure; every subclass (BulkCreator, BulkDeleter,
+        # BulkScaler) overrides it
+        raise NotImplementedError
+
+    @staticmethod
+    def name_of(item):
+        # name of an item in the failure list, subclasses whose items are not names override it
+        return str(item)
+
+    @staticmethod
+    def read(response):
+        # a response requested with _preload_content=False is not deserialized, only read so the connection
+        # can be reused; returns the body
+        data = response.read()
+        response.release_conn()
+        return data
+
+    @classmethod
+    def is_retryable(cls, err):
+        status = getattr(err, "status", None)
+        if status is None:
+            # connection level errors
+            return isinstance(err, HTTPError)
+        if status == cls.HTTP_STATUS_CONFLICT:
+            return cls.error_reason(err) == cls.REASON_CONFLICT
+        return status in cls.RETRYABLE_STATUS
+
+    @classmethod
+    def backoff(cls, attempt, err):
+        # seconds to wait before the next attempt: Retry-After if given, else jittered exponential
+        return RetryPolicy.backoff(attempt, err, cls.BACKOFF_BASE_SECONDS, cls.BACKOFF_MAX_SECONDS)
+
+    @staticmethod
+    def error_reason(err):
+        # "reason" of a kubernetes Status body
+        try:
+            return json.loads(err.body).get("reason")
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    @classmethod
+    def describe_error(cls, err):
+        status = getattr(err, "status", None)
+        if status is None:
+            return str(err)
+        return "{} {}".format(status, cls.error_reason(err) or getattr(err, "reason", ""))
+
+    def show_progress(self, result, progress_done):
+        # live progress line, refreshed until the run is over
+        while not progress_done.wait(self.PROGRESS_INTERVAL_SECONDS):
+            Logger.progress(self.MSG_PROGRESS.format(self.VERB, result.succeeded, result.total,
+                                                     len(result.failures), result.retries, result.throughput))
+        Logger.progress(self.MSG_PROGRESS.format(self.VERB, result.succeeded, result.total, len(result.failures),
+                                                 result.retries, result.throughput), done=True)
+
+    def show_summary(self, result):
+        Logger.info(self.MSG_SUMMARY.format(self.VERB.capitalize(), result.succeeded, result.total, result.elapsed,
+                                            result.throughput, len(result.failures), result.retries))
+        Logger.info(self.MSG_LATENCY.format(Stats.format_ms(Stats.percentile(result.latencies, 50)),
+                                            Stats.format_ms(Stats.percentile(result.latencies, 99)),
+                                            Stats.format_ms(max(result.latencies) if result.latencies else None)))
+        for name, error in result.failures:
+            Logger.err(self.MSG_FAILURE.format(name, error))
+
+
+class BulkCreator(BulkOperation):
+    # A class for creating many deployments from one manifest concurrently
+    VERB = "created"
+
+    @staticmethod
+    def names_for(name_pattern, count):
+        # "web-{}" -> web-1..web-N, a plain prefix "web" -> web-1..web-N
+        if "{" not in name_pattern:
+            name_pattern = name_pattern + "-{}"
+        return [name_pattern.format(index) for index in range(1, count + 1)]
+
+    def create(self, file_name, names):
+        # create one deployment per name from the manifest and display progress and a summary
+        return self.run([(file_name, name) for name in names])
+
+    def send(self, item):
+        file_name, name = item
+        self.read(self.k8s_client.create_deployment(self.k8s_client.render_manifest(file_name, name),
+                                                    _preload_content=False))
+
+    @staticmethod
+    def name_of(item):
+        return item[1]
+
+
+class BulkDeleter(BulkOperation):
+    # A class for deleting the pods of the current scope matching a name pattern and/or a label selector.
+    # Without a name pattern the pods are deleted with one delete-collection call per namespace, the API
+    # server filters them by the selectors. With a name pattern, or when the server refuses delete-collection,
+    # the matching pods are listed and deleted one by one concurrently. A pod already gone counts as deleted.
+    VERB = "deleted"
+    HTTP_STATUS_NOT_FOUND = 404
+    # deletecollection not allowed for the user, or not served
+    COLLECTION_REFUSED_STATUS = (403, 405)
+    MSG_WARN_COLLECTION_REFUSED = "delete-collection refused ({}), deleting pods one by one"
+    TITLE_PREVIEW = "<Dry run: {} pods to delete>"
+    PREVIEW_COLUMNS = (("NAMESPACE", 22), ("NAME", 43))
+
+    def __init__(self, k8s_client, concurrency, qps, grace_period_seconds=None, max_retries=5):
+        # grace_period_seconds overrides the pods' terminationGracePeriodSeconds, 0 deletes at once
+        super().__init__(k8s_client, concurrency, qps, max_retries)
+        self.grace_period_seconds = grace_period_seconds
+
+    def delete_kwargs(self):
+        if self.grace_period_seconds is None:
+            return {}
+        return {"grace_period_seconds": int(self.grace_period_seconds)}
+
+    def preview(self, name_pattern=None, label_selector=None):
+        # display the (namespace, name) keys of the pods delete() would delete and return them, nothing is deleted
+        pod_keys = self.k8s_client.select_pods(name_pattern, label_selector, phase=None)
+        renderer = self.k8s_client.get_renderer(self.PREVIEW_COLUMNS, self.TITLE_PREVIEW.format(len(pod_keys)),
+                                                self.k8s_client.POD_KIND, paged=True)
+        for namespace, name in pod_keys:
+            renderer.add([namespace, name], {"namespace": namespace, "name": name}, name)
+        renderer.close()
+        return pod_keys
+
+    def delete(self, name_pattern=None, label_selector=None):
+        # delete the matching pods, returns the BulkResult
+        if name_pattern is None:
+            try:
+                return self.delete_collections(label_selector)
+            except Exception as err:
+                if getattr(err, "status", None) not in self.COLLECTION_REFUSED_STATUS:
+                    raise
+                Logger.warn(self.MSG_WARN_COLLECTION_REFUSED.format(self.describe_error(err)))
+        return self.run(self.k8s_client.select_pods(name_pattern, label_selector, phase=None))
+
+    def delete_collections(self, label_selector):
+        # one delete-collection call per namespace of the scope, concurrently; the total is only known from
+        # the responses
+        kwargs = self.k8s_client.selector_kwargs(True)
+        kwargs["label_selector"] = ",".join(filter(None, (kwargs.get("label_selector"), label_selector))) or None
+        kwargs.update(self.delete_kwargs())
+        if self.k8s_client.namespace is not None:
+            namespaces = [self.k8s_client.namespace]
+        else:
+            namespaces = sorted({namespace for namespace, _ in
+                                 self.k8s_client.select_pods(None, label_selector, phase=None)})
+        result = BulkResult(0)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self.delete_collection, namespace, kwargs, result)
+                       for namespace in namespaces]
+        result.finished_at = time.monotonic()
+        for future in futures:
+            # a refused call is raised for the caller to fall back, the other namespaces were deleted
+            future.result()
+        self.show_summary(result)
+        return result
+
+    def delete_collection(self, namespace, kwargs, result):
+        self.rate_limiter.acquire()
+        started_at = time.monotonic()
+        data = self.read(self.k8s_client.delete_pod_collection(namespace, _preload_content=False, **kwargs))
+        result.add_latency(time.monotonic() - started_at)
+        deleted = len(json.loads(data).get("items") or ())
+        with result.lock:
+            result.total += deleted
+        result.add_success(deleted)
+
+    def send(self, item):
+        namespace, name = item
+        try:
+            self.read(self.k8s_client.delete_pod(namespace, name, _preload_content=False, **self.delete_kwargs()))
+        except Exception as err:
+            if getattr(err, "status", None) != self.HTTP_STATUS_NOT_FOUND:
+                raise
+
+    @staticmethod
+    def name_of(item):
+        return "/".join(item)
+
+
+class BulkScaler(BulkOperation):
+    # A class for scaling the deployments of the current scope matching a name pattern and/or a label selector
+    # concurrently, by patching their scale subresources
+    VERB = "scaled"
+    TITLE_PREVIEW = "<Dry run: {} deployments to scale>"
+    PREVIEW_COLUMNS = (("NAMESPACE", 22), ("NAME", 33), ("REPLICAS", 9), ("TARGET", None))
+
+    def preview(self, replicas, name_pattern=None, label_selector=None):
+        # display the deployments scale() would scale with their current and target replicas and return their
+        # DeploymentRows, nothing is scaled
+        deployments = self.k8s_client.select_deployments(name_pattern, label_selector)
+        renderer = self.k8s_client.get_renderer(self.PREVIEW_COLUMNS,
+                                                self.TITLE_PREVIEW.format(len(deployments)),
+                                                self.k8s_client.DEPLOYMENT_KIND, paged=True)
+        for deployment in deployments:
+            renderer.add([deployment.namespace, deployment.name, str(deployment.replicas or 0), str(replicas)],
+                         {"namespace": deployment.namespace, "name": deployment.name,
+                          "replicas": deployment.replicas or 0, "target": replicas}, deployment.name)
+        renderer.close()
+        return deployments
+
+    def scale(self, replicas, name_pattern=None, label_selector=None):
+        # scale the matching deployments, returns the BulkResult
+        deployments = self.k8s_client.select_deployments(name_pattern, label_selector)
+        return self.run([(deployment.namespace, deployment.name, int(replicas)) for deployment in deployments])
+
+    def send(self, item):
+        namespace, name, replicas = item
+        self.read(self.k8s_client.patch_deployment_scale(namespace, name, replicas, _preload_content=False))
+
+    @staticmethod
+    def name_of(item):
+        return "/".join(item[:2])
@@ -1,191 +1,803 @@
+import fnmatch
 import os
+import re
+import threading
 import time
-from os import path
-import yaml
 from kubernetes import client, config
 from kubernetes.client.exceptions import ApiException
 from urllib3.exceptions import NewConnectionError, MaxRetryError, ConnectTimeoutError
-from kubernetes.stream import stream
 
+from ApiConnection import ApiConnection, CircuitBreaker, CircuitOpenError, OfflineError, RetryPolicy
+from Config import PODS_LIST_PAGE_SIZE, EXEC_PARALLELISM, EXEC_TIMEOUT_SECONDS, LOG_BUFFER_LINES, LOG_MAX_STREAMS, \
+    DEFAULT_NAMESPACE, ALL_NAMESPACES, API_POOL_MAXSIZE, API_CONNECT_TIMEOUT_SECONDS, API_READ_TIMEOUT_SECONDS, \
+    API_TCP_KEEPALIVE_SECONDS, API_MAX_RETRIES, API_BACKOFF_BASE_SECONDS, API_BACKOFF_MAX_SECONDS, \
+    API_CIRCUIT_FAILURE_THRESHOLD, API_CIRCUIT_COOLDOWN_SECONDS, SUMMARY_TOP
+from Describer import PodDescriber
+from ExecEngine import ExecEngine
+from Informer import Informer
 from Logger import Logger
+from LogStreamer import LogStreamer
+from Manifests import ManifestCache
+from NameIndex import NameIndex, PodIndex
+from PodAnalytics import PodSummary
+from RolloutWatcher import RolloutWatcher
+from Renderer import TableRenderer
+from Rows import PodRow, DeploymentRow, load_rows, row_to_dict
+from Snapshots import SnapshotError, SnapshotStore
 
 
 class Client:
     # A class for instantiate Kubernetes Client and its resources
     PODS_HEADER = "<Available Pods>"
     DEPLOYMENT_HEADER = "<Available Deployments>"
-    PODS_LIST_DISPLAY_FORMAT = "  {:<21}{:<45}{:<10}{:<10}{:<16}{:<20}{:<20}{}"
-    PODS_LIST_HEADER_DISPLAY_FORMAT = PODS_LIST_DISPLAY_FORMAT.format("NAMESPACE", "NAME", "STATUS", "RESTARTS", "IP",
-                                                                      "NODE", "NOMINATED NODE", "READINESS GATES")
-    DEPLOYMENT_LIST_DISPLAY_FORMAT = "  {:<35}{:<12}{:<12}{}"
-    DEPLOYMENT_LIST_HEADER_DISPLAY_FORMAT = DEPLOYMENT_LIST_DISPLAY_FORMAT.format("NAME", "READY", "UP-TO-DATE",
-                                                                                  "AVAILABLE")
+    # (title, width) of the listing columns, see TableRenderer
+    PODS_LIST_COLUMNS = (("NAMESPACE", 22), ("NAME", 43), ("STATUS", 9), ("RESTARTS", 8), ("IP", 15), ("NODE", 18),
+                         ("NOMINATED NODE", 18), ("READINESS GATES", None))
+    DEPLOYMENT_LIST_COLUMNS = (("NAME", 33), ("READY", 9), ("UP-TO-DATE", 10), ("AVAILABLE", None))
+    POD_KIND = "pod"
+    DEPLOYMENT_KIND = "deployment.apps"
     MSG_WARN_NO_PODS = "There is no {}Pods at this moment.."
-    MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER = "Unable to connect to k8 cluster"
+    MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER = "Unable to connect to k8 cluster: {}"
     MSG_INFO_POD_CREATED = "Pod[type=Deployment] created. status={}"
     MSG_WARN_NO_DEPLOYMENT = "There is no {}deployment at this moment.."
     MSG_INFO_POD_DEPLOYED = "Pod[type=DaemonSet] deployed. status={}"
+    MSG_INFO_POD_DELETED = "pod \"{}\" deleted"
+    MSG_INFO_DEPLOYMENT_SCALED = "deployment.apps/{} scaled. replicas={}"
+    MSG_ERR_INVALID_SCALE_QTY = "Invalid scale quantity: {}"
+    MSG_WARN_STALE_SNAPSHOT = "Showing the {} snapshot of {}, refreshing in the background.."
+    MSG_WARN_OFFLINE_SNAPSHOT = "Offline, showing the {} snapshot of {}"
+    MSG_ERR_NO_SNAPSHOT = "offline mode and no {} snapshot of {} in this scope"
+    MSG_WARN_SNAPSHOT_FAILED = "Snapshot store unusable: {}"
+    SNAPSHOT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+    SNAPSHOTS_HEADER = "<Snapshots of {}>"
+    SNAPSHOT_DIFF_HEADER = "<Changes from snapshot {} to {}>"
+    SNAPSHOT_KIND = "snapshot"
+    SNAPSHOT_LIST_COLUMNS = (("ID", 6), ("KIND", 16), ("SCOPE", 50), ("RESOURCE VERSION", 16), ("TAKEN", 19),
+                             ("ROWS", None))
+    SNAPSHOT_DIFF_COLUMNS = (("CHANGE", 8), ("NAMESPACE", 22), ("NAME", 43), ("FIELDS", None))
+    MSG_WARN_NO_SNAPSHOTS = "There is no snapshot of {} yet"
+    MSG_ERR_TWO_SNAPSHOTS_NEEDED = "Two {} snapshots of this scope are needed to diff, run 'snapshot save' first"
+    MSG_INFO_SNAPSHOT_SAVED = "Saved snapshot {}: {} {} objects at resourceVersion {}"
+    MSG_INFO_SNAPSHOTS_UNCHANGED = "Nothing changed since the latest snapshots"
+    MSG_INFO_SNAPSHOT_DIFF = "{} added, {} removed, {} changed between {} and {}"
+    STR_FIELD_CHANGE = "{}: {} -> {}"
+    # (title, columns) of the pod summary's tables, the per namespace and per node tables show their top rows
+    SUMMARY_PHASES = ("<Pods per Phase>", (("PHASE", 12), ("PODS", None), ("SHARE", None)))
+    SUMMARY_NAMESPACES = ("<Pods per Namespace, top {} of {}>", (("NAMESPACE", 22), ("PODS", None), ("SHARE", None)))
+    SUMMARY_NODES = ("<Pods per Node, top {} of {}>", (("NODE", 18), ("PODS", None), ("SHARE", None)))
+    SUMMARY_RESTARTING_PODS = ("<Most Restarting Pods>", (("NAMESPACE", 22), ("NAME", 43), ("RESTARTS", None),
+                                                          ("NODE", None)))
+    SUMMARY_RESTARTING_CONTAINERS = ("<Most Restarting Containers>", (("NAMESPACE", 22), ("POD", 43),
+                                                                      ("CONTAINER", 20), ("RESTARTS", None)))
+    SUMMARY_NOT_READY = ("<Most Not Ready Controllers>", (("NAMESPACE", 22), ("OWNER", 43), ("ACTIVE", None),
+                                                          ("NOT READY", None), ("SHARE", None)))
+    SUMMARY_AGES = ("<Pod Ages>", (("AGE", 8), ("PODS", None), ("SHARE", None)))
+    SUMMARY_KIND = "summary"
+    STR_NONE = "<none>"
+    MSG_INFO_SUMMARY = "{} pods, the oldest created {}, summarized in {:.0f}ms"
+    DEFAULT_NAMESPACE = DEFAULT_NAMESPACE
+    INDEX_CLASSES = {PodRow: PodIndex, DeploymentRow: NameIndex}
+    ROW_KINDS = {PodRow: POD_KIND, DeploymentRow: DEPLOYMENT_KIND}
+    # kinds of the snapshots, keyed by their row class name
+    SNAPSHOT_KINDS = {row_class.__name__: kind for row_class, kind in ROW_KINDS.items()}
+    ALL_NAMESPACES = ALL_NAMESPACES
+    POD_PHASE_RUNNING = "Running"
+    DEFAULT_EXEC_CMD = 'echo This message goes to stderr >&2; echo This message goes to stdout'
+    MSG_WARN_UNABLE_TO_LOAD_KUBE_CONFIG = "unable to load kube-config"
+    # errors of requests that did not reach the API server, or were not sent in offline mode
+    CONNECTION_ERRORS = (NewConnectionError, MaxRetryError, ConnectTimeoutError, CircuitOpenError, OfflineError,
+                         SnapshotError)
+    # (path, mtime) of the kubeconfig loaded into the kubernetes client's default configuration
+    loaded_kube_config = None
+    kube_config_lock = threading.Lock()
 
-    def __init__(self):
-        # client instance
-        kube_config_filepath = os.getenv("KUBECONFIG") or "~/.kube/config"
+    def __init__(self, context=None):
+        # client instance, kubeconfig is loaded and the API objects are built on the first API call.
+        # All API objects share one ApiClient, see ApiConnection for its pool, timeouts and retries.
+        # context is a kubeconfig context name, None for the current context. Clients of several contexts
+        # can be used at once (see MultiClusterClient), each has its own configuration and connection pool
+        self.context = context
+        self.context_configuration = None
+        self.context_lock = threading.Lock()
+        self.connection = ApiConnection(
+            API_POOL_MAXSIZE, API_CONNECT_TIMEOUT_SECONDS, API_READ_TIMEOUT_SECONDS, API_TCP_KEEPALIVE_SECONDS,
+            RetryPolicy(API_MAX_RETRIES, API_BACKOFF_BASE_SECONDS, API_BACKOFF_MAX_SECONDS),
+            CircuitBreaker(API_CIRCUIT_FAILURE_THRESHOLD, API_CIRCUIT_COOLDOWN_SECONDS))
+        self.shared_api_client = None
+        self.core_api = None
+        self.apps_api = None
+        # informer caches, keyed by the LIST call they mirror, created under the lock as batch operations
+        # run concurrently
+        self.informers = {}
+        self.informers_lock = threading.Lock()
+        # snapshots of the informer caches, see use_snapshots()
+        self.snapshot_store = None
+        self.warm_start = False
+        self.offline = False
+        # parsed manifest templates
+        self.manifest_cache = ManifestCache()
+        # listing scope, pushed down to the API server: namespace (None for all namespaces),
+        # label selector (pods and deployments) and field selector (pods)
+        self.namespace = self.DEFAULT_NAMESPACE
+        self.label_selector = None
+        self.field_selector = None
+        # output format of the listings, one of TableRenderer.FORMATS
+        self.output_format = TableRenderer.FORMAT_TABLE
+
+    @staticmethod
+    def kube_config_file():
+        return os.path.expanduser(os.getenv("KUBECONFIG") or "~/.kube/config")
+
+    @classmethod
+    def kube_contexts(cls):
+        # names of the kubeconfig's contexts, the current one first
+        contexts, current_context = config.list_kube_config_contexts(cls.kube_config_file())
+        names = [context["name"] for context in contexts]
+        if current_context is not None:
+            names.remove(current_context["name"])
+            names.insert(0, current_context["name"])
+        return names
+
+    @classmethod
+    def load_kube_config(cls):
+        # load $KUBECONFIG (default ~/.kube/config) into the default configuration, once per process
+        # and again only when the file changes
+        config_file = cls.kube_config_file()
         try:
-            config_file = os.path.expanduser(kube_config_filepath)
-            config.load_kube_config(config_file=config_file)
-        except:
-            Logger.warn("unable to load kube-config")
-        self.api_instance = client.CoreV1Api()
-        self.apps_api_instance = client.AppsV1Api()
-        self.apps_api_beta1_instance = client.AppsV1beta1Api()
-
-    def list_all_pods(self, all_flag):
-        # get all pods
+            loaded_kube_config = (config_file, os.stat(config_file).st_mtime_ns)
+        except OSError:
+            loaded_kube_config = (config_file, None)
+        # concurrent callers wait for the load instead of building clients on the old configuration
+        with cls.kube_config_lock:
+            if loaded_kube_config == cls.loaded_kube_config:
+                return
+            cls.loaded_kube_config = loaded_kube_config
+            try:
+                config.load_kube_config(config_file=config_file)
+            except:
+                Logger.warn(cls.MSG_WARN_UNABLE_TO_LOAD_KUBE_CONFIG)
+
+    def new_api_client(self, pool_maxsize=None):
+        # tuned ApiClient on the loaded kubeconfig, for callers that can not share the Client's
+        if self.context is None:
+            self.load_kube_config()
+            return self.connection.new_api_client(pool_maxsize)
+        return self.connection.new_api_client(pool_maxsize, self.load_context_config())
+
+    def load_context_config(self):
+        # configuration of this client's context, loaded once; an unknown context is raised
+        with self.context_lock:
+            if self.context_configuration is None:
+                configuration = client.Configuration()
+                config.load_kube_config(config_file=self.kube_config_file(), context=self.context,
+                                        client_configuration=configuration, persist_config=False)
+                self.context_configuration = configuration
+        return self.context_configuration
+
+    def use_snapshots(self, snapshot_store, warm_start=False, offline=False):
+        # save the informer caches to snapshot_store (see save_snapshots). With warm_start new informers are
+        # preloaded from their latest snapshot and reconciled in the background; offline they only serve
+        # snapshots and no request is sent
+        self.snapshot_store = snapshot_store
+        self.warm_start = warm_start
+        self.offline = offline
+        self.connection.offline = offline
+
+    @property
+    def cluster(self):
+        # API server URL, the snapshots of a cluster are keyed by it
+        return self.api_client.configuration.host
+
+    @property
+    def api_client(self):
+        # the ApiClient shared by the API objects, its pool is sized for concurrent bulk operations
+        if self.shared_api_client is None:
+            self.shared_api_client = self.new_api_client()
+        return self.shared_api_client
+
+    @property
+    def api_instance(self):
+        if self.core_api is None:
+            self.core_api = client.CoreV1Api(self.api_client)
+        return self.core_api
+
+    @property
+    def apps_api_instance(self):
+        if self.apps_api is None:
+            self.apps_api = client.AppsV1Api(self.api_client)
+        return self.apps_api
+
+    def set_scope(self, namespace, label_selector=None, field_selector=None):
+        # change the listing scope, informers of the previous scope are saved and stopped
+        self.save_snapshots()
+        self.namespace = None if namespace is None or namespace == self.ALL_NAMESPACES else namespace
+        self.label_selector = label_selector or None
+        self.field_selector = field_selector or None
+        for informer in self.informers.values():
+            informer.stop()
+        self.informers = {}
+
+    def scope_description(self):
+        # e.g. "namespace=default, selector=app=nginx"
+        description = "namespace=" + (self.namespace or self.ALL_NAMESPACES)
+        if self.label_selector:
+            description += ", selector=" + self.label_selector
+        if self.field_selector:
+            description += ", fields=" + self.field_selector
+        return description
+
+    @property
+    def write_namespace(self):
+        # namespace for creates and scales, all-namespaces scope writes to the default namespace
+        return self.namespace or self.DEFAULT_NAMESPACE
+
+    def pod_namespace(self, pod_name):
+        # namespace of a pod of the current listing
+        return self.namespace_of(self.get_pod_index, pod_name)
+
+    def deployment_namespace(self, deployment_name):
+        # namespace of a deployment of the current listing
+        return self.namespace_of(self.get_deployment_index, deployment_name)
+
+    def namespace_of(self, get_index, name):
+        # the scope's namespace, or when listing all namespaces the first namespace holding an object with the
+        # name, looked up in the name index
+        if self.namespace is not None:
+            return self.namespace
+        keys = get_index().keys_of(name)
+        return min(keys)[0] if keys else self.DEFAULT_NAMESPACE
+
+    def selector_kwargs(self, with_field_selector):
+        kwargs = {}
+        if self.label_selector:
+            kwargs["label_selector"] = self.label_selector
+        if with_field_selector and self.field_selector:
+            kwargs["field_selector"] = self.field_selector
+        return kwargs
+
+    def pod_list_call(self):
+        # LIST method, positional args and selectors for pods in the current scope
+        if self.namespace is None:
+            return self.api_instance.list_pod_for_all_namespaces, (), self.selector_kwargs(True)
+        return self.api_instance.list_namespaced_pod, (self.namespace,), self.selector_kwargs(True)
+
+    def deployment_list_call(self):
+        # LIST method, positional args and selectors for deployments in the current scope
+        if self.namespace is None:
+            return self.apps_api_instance.list_deployment_for_all_namespaces, (), self.selector_kwargs(False)
+        return self.apps_api_instance.list_namespaced_deployment, (self.namespace,), self.selector_kwargs(False)
+
+    def get_informer(self, list_func, row_class, *args, **kwargs):
+        # return the started informer for a LIST call, creating it on first use
+        key = (list_func.__name__,) + args + tuple(sorted(kwargs.items()))
+        with self.informers_lock:
+            informer = self.informers.get(key)
+            if informer is None:
+                informer = Informer(list_func, row_class, *args, page_size=PODS_LIST_PAGE_SIZE,
+                                    index=self.INDEX_CLASSES[row_class](), **kwargs)
+                if self.warm_start or self.offline:
+                    self.preload_snapshot(informer)
+                if not self.offline:
+                    informer.start()
+                self.informers[key] = informer
+        return informer
+
+    def get_pod_informer(self, stale_ok=False):
+        list_func, args, kwargs = self.pod_list_call()
+        return self.synced(self.get_informer(list_func, PodRow, *args, **kwargs), stale_ok)
+
+    def get_deployment_informer(self, stale_ok=False):
+        list_func, args, kwargs = self.deployment_list_call()
+        return self.synced(self.get_informer(list_func, DeploymentRow, *args, **kwargs), stale_ok)
+
+    def synced(self, informer, stale_ok):
+        # a cache still holding its snapshot is reconciled first, unless stale rows do (listings); name checks,
+        # selections and namespace lookups must not act on objects that are gone or miss new ones
+        if not stale_ok and not self.offline:
+            informer.sync()
+        return informer
+
+    def get_cached_pods(self, stale_ok=False):
+        # pods of the current scope from the informer cache
+        return self.get_pod_informer(stale_ok).list()
+
+    def get_cached_deployments(self, stale_ok=False):
+        # deployments of the current scope from the informer cache
+        return self.get_deployment_informer(stale_ok).list()
+
+    @staticmethod
+    def scope_of(list_func, args, kwargs):
+        # snapshot scope of a LIST call, e.g. "list_namespaced_pod default label_selector=app=nginx"
+        return " ".join([list_func.__name__] + [str(arg) for arg in args]
+                        + ["{}={}".format(name, value) for name, value in sorted(kwargs.items())])
+
+    def preload_snapshot(self, informer):
+        # fill a new informer with the latest snapshot of its LIST call, offline there must be one
+        scope = self.scope_of(informer.list_func, informer.args, informer.kwargs)
+        if self.snapshot_store is not None:
+            try:
+                snapshots = self.snapshot_store.latest(self.cluster, informer.row_class, scope)
+                if snapshots:
+                    informer.preload(self.snapshot_store.load(snapshots[0], informer.row_class),
+                                     snapshots[0].resource_version, snapshots[0].taken_at)
+            except SnapshotStore.ERRORS as err:
+                Logger.warn(self.MSG_WARN_SNAPSHOT_FAILED.format(err))
+        if self.offline and informer.snapshot_taken_at is None:
+            raise SnapshotError(self.MSG_ERR_NO_SNAPSHOT.format(self.ROW_KINDS[informer.row_class], self.cluster))
+
+    def save_snapshots(self):
+        # save the reconciled informer caches that changed since their latest snapshot, returns the new Snapshots
+        if self.snapshot_store is None or self.offline:
+            return []
+        with self.informers_lock:
+            informers = list(self.informers.values())
+        saved = []
+        for informer in informers:
+            if not informer.reconciled.is_set():
+                continue
+            rows, resource_version = informer.snapshot()
+            scope = self.scope_of(informer.list_func, informer.args, informer.kwargs)
+            try:
+                snapshots = self.snapshot_store.latest(self.cluster, informer.row_class, scope)
+                if snapshots and snapshots[0].resource_version == resource_version:
+                    continue
+                saved.append(self.snapshot_store.save(self.cluster, informer.row_class, scope, rows,
+                                                      resource_version))
+            except SnapshotStore.ERRORS as err:
+                Logger.warn(self.MSG_WARN_SNAPSHOT_FAILED.format(err))
+                break
+        return saved
+
+    def take_snapshots(self):
+        # reconcile the pod and deployment caches of the current scope and save them, returns the new Snapshots
+        self.get_cached_pods()
+        self.get_cached_deployments()
+        snapshots = self.save_snapshots()
+        for snapshot in snapshots:
+            Logger.info(self.MSG_INFO_SNAPSHOT_SAVED.format(snapshot.id, snapshot.count,
+                                                            self.SNAPSHOT_KINDS[snapshot.kind],
+                                                            snapshot.resource_version))
+        if len(snapshots) == 0:
+            Logger.info(self.MSG_INFO_SNAPSHOTS_UNCHANGED)
+        return snapshots
+
+    def format_snapshot_time(self, taken_at):
+        return time.strftime(self.SNAPSHOT_TIME_FORMAT, time.localtime(taken_at))
+
+    def list_snapshots(self):
+        # snapshots of this cluster, newest first, returns their ids
+        snapshots = self.snapshot_store.list(self.cluster)
+        renderer = self.get_renderer(self.SNAPSHOT_LIST_COLUMNS, self.SNAPSHOTS_HEADER.format(self.cluster),
+                                     self.SNAPSHOT_KIND)
+        if len(snapshots) == 0:
+            if not renderer.is_machine_readable:
+                Logger.warn(self.MSG_WARN_NO_SNAPSHOTS.format(self.cluster))
+            return []
+        for snapshot in snapshots:
+            record = {field: getattr(snapshot, field) for field in snapshot.__slots__}
+            renderer.add([str(snapshot.id), self.SNAPSHOT_KINDS.get(snapshot.kind, snapshot.kind), snapshot.scope, str(snapshot.resource_version),
+                          self.format_snapshot_time(snapshot.taken_at), str(snapshot.count)], record,
+                         str(snapshot.id))
+        renderer.close()
+        return [snapshot.id for snapshot in snapshots]
+
+    def diff_snapshots(self, row_class, old_id=None, new_id=None):
+        # objects added, removed and changed from snapshot old_id to new_id. Without new_id the newest snapshot
+        # of old_id's scope is compared, without either the two newest snapshots of the current scope.
+        # Returns the (change, old_row, new_row) list
+        store = self.snapshot_store
+        if old_id is None:
+            list_call = self.pod_list_call() if row_class is PodRow else self.deployment_list_call()
+            snapshots = store.latest(self.cluster, row_class, self.scope_of(*list_call), 2)
+            if len(snapshots) < 2:
+                raise SnapshotError(self.MSG_ERR_TWO_SNAPSHOTS_NEEDED.format(self.ROW_KINDS[row_class]))
+            new_snapshot, old_snapshot = snapshots
+        else:
+            old_snapshot = store.get(old_id)
+            new_snapshot = store.get(new_id) if new_id is not None \
+                else store.latest(old_snapshot.cluster, row_class, old_snapshot.scope)[0]
+        changes = store.diff(old_snapshot, new_snapshot, row_class)
+        renderer = self.get_renderer(self.SNAPSHOT_DIFF_COLUMNS,
+                                     self.SNAPSHOT_DIFF_HEADER.format(old_snapshot.id, new_snapshot.id),
+                                     self.ROW_KINDS[row_class])
+        for change, old_row, new_row in changes:
+            row = new_row or old_row
+            if change == store.CHANGE_CHANGED:
+                fields = store.changed_fields(old_row, new_row)
+                description = ", ".join(self.STR_FIELD_CHANGE.format(*field) for field in fields)
+                record_fields = {field: {"old": old_value, "new": new_value}
+                                 for field, old_value, new_value in fields}
+            else:
+                description = ""
+                record_fields = row_to_dict(row)
+            renderer.add([change, row.namespace, row.name, description],
+                         {"change": change, "namespace": row.namespace, "name": row.name, "fields": record_fields},
+                         row.name)
+        renderer.close()
+        if not renderer.is_machine_readable:
+            counts = [sum(1 for change in changes if change[0] == kind)
+                      for kind in (store.CHANGE_ADDED, store.CHANGE_REMOVED, store.CHANGE_CHANGED)]
+            Logger.info(self.MSG_INFO_SNAPSHOT_DIFF.format(*counts, self.format_snapshot_time(old_snapshot.taken_at),
+                                                           self.format_snapshot_time(new_snapshot.taken_at)))
+        return changes
+
+    def show_snapshot_age(self, informer, renderer):
+        # a listing of a cache still holding its snapshot says how old it is
+        if informer.reconciled.is_set() or renderer.is_machine_readable:
+            return
+        message = self.MSG_WARN_OFFLINE_SNAPSHOT if self.offline else self.MSG_WARN_STALE_SNAPSHOT
+        Logger.warn(message.format(self.ROW_KINDS[informer.row_class],
+                                   self.format_snapshot_time(informer.snapshot_taken_at)))
+
+    def get_pod_index(self):
+        # PodIndex of the pods of the current scope
+        return self.get_pod_informer().index
+
+    def get_deployment_index(self):
+        # NameIndex of the deployments of the current scope
+        return self.get_deployment_informer().index
+
+    def get_renderer(self, columns, title, kind, paged=False):
+        return TableRenderer(columns, self.output_format, title, kind, paged)
+
+    def list_all_pods(self, paged=False):
+        # get all pods, paged=True sends a long table through the pager
         try:
             result_pods_list = []
-            if all_flag:
-                pods_list = self.api_instance.list_pod_for_all_namespaces(watch=False)
-            else:
-                pods_list = self.api_instance.list_namespaced_pod("default")
-            pods = pods_list.items
-            if pods is None or len(pods_list.items) == 0:
-                Logger.warn(self.MSG_WARN_NO_PODS.format("Available "))
+            informer = self.get_pod_informer(stale_ok=True)
+            pods = informer.list()
+            renderer = self.get_renderer(self.PODS_LIST_COLUMNS, self.PODS_HEADER, self.POD_KIND, paged)
+            self.show_snapshot_age(informer, renderer)
+            if len(pods) == 0:
+                if not renderer.is_machine_readable:
+                    Logger.warn(self.MSG_WARN_NO_PODS.format("Available "))
                 return result_pods_list
             else:
-                Logger.header(self.PODS_HEADER)
-                Logger.sub_info(self.PODS_LIST_HEADER_DISPLAY_FORMAT.format("Available"))
-                trunk_len_mid = 20
-                trunk_len_big = 41
                 for pod in pods:
-                    pod.metadata.name = "NA" if pod.metadata.name is None else pod.metadata.name
-                    result_pods_list.append(pod.metadata.name)
-                    pod.metadata.namespace = "NA" if pod.metadata.namespace is None else pod.metadata.namespace
-                    namespace = pod.metadata.namespace[0:trunk_len_mid] + ".." if len(
-                        pod.metadata.namespace) > trunk_len_mid else pod.metadata.namespace
-                    pod_name = pod.metadata.name[0:trunk_len_big] + ".." if len(
-                        pod.metadata.name) > trunk_len_big else pod.metadata.name
-                    nominated_node_name = "<None>" if pod.status.nominated_node_name is None else pod.status.nominated_node_name
-                    readiness_gates = "<None>" if pod.spec.readiness_gates is None else pod.spec.readiness_gates
-                    pod.status.phase = "NA" if pod.status.phase is None else pod.status.phase
-                    restart_count = pod.status.container_statuses[0].restart_count
-                    restart_count = "NA" if restart_count is None else restart_count
-                    pod.status.pod_ip = "NA" if pod.status.pod_ip is None else pod.status.pod_ip
-                    pod.spec.node_name = "NA" if pod.spec.node_name is None else pod.spec.node_name
-                    Logger.avail_info(
-                        self.PODS_LIST_DISPLAY_FORMAT.format(namespace, pod_name, pod.status.phase, restart_count
-                                                             , pod.status.pod_ip,
-                                                             pod.spec.node_name,
-                                                             nominated_node_name, readiness_gates))
+                    result_pods_list.append(self.display_pod(renderer, pod))
+                renderer.close()
         except ApiException as api_error:
             Logger.err(api_error)
-        except (NewConnectionError, MaxRetryError, ConnectTimeoutError):
-            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER)
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
         return result_pods_list
 
+    def list_pod_pages(self, page_size):
+        # generator of pod pages, fetched with limit/_continue so only one page is held at a time
+        list_func, args, selector_kwargs = self.pod_list_call()
+        _continue = None
+        while True:
+            kwargs = dict(selector_kwargs, limit=page_size, _preload_content=False)
+            if _continue:
+                kwargs["_continue"] = _continue
+            response = list_func(*args, **kwargs)
+            pods, metadata = load_rows(response, PodRow)
+            yield pods
+            _continue = metadata.get("continue")
+            if not _continue:
+                break
+
+    def stream_all_pods(self, page_size=PODS_LIST_PAGE_SIZE):
+        # get all pods page by page, rows are displayed as each page arrives and pod names are yielded
+        try:
+            renderer = self.get_renderer(self.PODS_LIST_COLUMNS, self.PODS_HEADER, self.POD_KIND)
+            displayed_rows = False
+            for pods in self.list_pod_pages(page_size):
+                displayed_rows = displayed_rows or len(pods) != 0
+                names = [self.display_pod(renderer, pod) for pod in pods]
+                renderer.flush()
+                yield from names
+            if not displayed_rows and not renderer.is_machine_readable:
+                Logger.warn(self.MSG_WARN_NO_PODS.format("Available "))
+        except ApiException as api_error:
+            Logger.err(api_error)
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
+
+    def display_pod(self, renderer, pod):
+        # add one PodRow to a renderer and return its name
+        cells, record, name = self.pod_cells(pod)
+        renderer.add(cells, record, name)
+        return name
+
+    @staticmethod
+    def pod_cells(pod):
+        # (listing cells, json record, name) of a PodRow
+        name = "NA" if pod.name is None else pod.name
+        namespace = "NA" if pod.namespace is None else pod.namespace
+        nominated_node_name = "<None>" if pod.nominated_node_name is None else pod.nominated_node_name
+        readiness_gates = "<None>" if pod.readiness_gates is None else pod.readiness_gates
+        phase = "NA" if pod.phase is None else pod.phase
+        restart_count = "NA" if pod.restart_count is None else pod.restart_count
+        pod_ip = "NA" if pod.pod_ip is None else pod.pod_ip
+        node_name = "NA" if pod.node_name is None else pod.node_name
+        return [namespace, name, phase, str(restart_count), pod_ip, node_name, nominated_node_name,
+                str(readiness_gates)], row_to_dict(pod), name
+
     def describe_k8s_pod(self, pod_name):
         # describe pod
         try:
-            api_response = self.api_instance.read_namespaced_pod(name=pod_name, namespace='default')
-            Logger.info(str(api_response))
-            event_details = self.api_instance.list_namespaced_event(namespace='default',
+            namespace = self.pod_namespace(pod_name)
+            pod = self.api_instance.read_namespaced_pod(name=pod_name, namespace=namespace)
+            event_details = self.api_instance.list_namespaced_event(namespace=namespace,
                                                                     field_selector=f'involvedObject.name={pod_name}')
-            Logger.sub_info(str(event_details))
+            Logger.info(PodDescriber.describe(pod, event_details.items))
         except ApiException as api_error:
             Logger.err(api_error)
-        except (NewConnectionError, MaxRetryError, ConnectTimeoutError):
-            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER)
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
 
-    def create_k8s_pod(self, file_name, deployment_name):
-        # create a pod using yaml file
+    def delete_k8s_pod(self, pod_name):
+        # delete pod
         try:
-            with open(path.join(path.dirname(__file__), file_name)) as f:
-                dep = yaml.safe_load(f)
-                if deployment_name is not None and len(deployment_name) != 0:
-                    dep['metadata']['name'] = deployment_name
-                resp = self.apps_api_instance.create_namespaced_deployment(
-                    body=dep, namespace="default")
-                Logger.info(self.MSG_INFO_POD_CREATED.format(resp.metadata.name))
+            self.api_instance.delete_namespaced_pod(name=pod_name, namespace=self.pod_namespace(pod_name))
+            Logger.info(self.MSG_INFO_POD_DELETED.format(pod_name))
         except ApiException as api_error:
             Logger.err(api_error)
-        except (NewConnectionError, MaxRetryError, ConnectTimeoutError):
-            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER)
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
 
-    def list_k8s_deployments(self):
-        # list deployments
+    def scale_k8s_deployment(self, deployment_name, scale_qty, wait_timeout=None):
+        # scale deployment by patching its scale subresource,
+        # with a wait_timeout waits for the rollout and returns the seconds it took (None when not ready)
+        try:
+            replicas = int(scale_qty)
+            if replicas < 0:
+                raise ValueError(scale_qty)
+        except ValueError:
+            Logger.err(self.MSG_ERR_INVALID_SCALE_QTY.format(scale_qty))
+            return
+        try:
+            resp = self.apps_api_instance.patch_namespaced_deployment_scale(
+                name=deployment_name, namespace=self.deployment_namespace(deployment_name),
+                body={"spec": {"replicas": replicas}})
+            Logger.info(self.MSG_INFO_DEPLOYMENT_SCALED.format(resp.metadata.name, resp.spec.replicas))
+            if wait_timeout is not None:
+                return self.wait_for_rollout(RolloutWatcher.KIND_DEPLOYMENT, resp.metadata.namespace,
+                                             resp.metadata.name, wait_timeout)
+        except ApiException as api_error:
+            Logger.err(api_error)
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
+
+    def create_k8s_pod(self, file_name, deployment_name, wait_timeout=None):
+        # create a pod using yaml file,
+        # with a wait_timeout waits for the rollout and returns the seconds it took (None when not ready)
+        try:
+            dep = self.render_manifest(file_name, deployment_name)
+            resp = self.create_deployment(dep)
+            Logger.info(self.MSG_INFO_POD_CREATED.format(resp.metadata.name))
+            if wait_timeout is not None:
+                return self.wait_for_rollout(RolloutWatcher.KIND_DEPLOYMENT, resp.metadata.namespace,
+                                             resp.metadata.name, wait_timeout)
+        except ApiException as api_error:
+            Logger.err(api_error)
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
+
+    def render_manifest(self, file_name, deployment_name, labels=None, replicas=None):
+        # body for one object from a cached manifest template
+        return self.manifest_cache.render(file_name, deployment_name, labels, replicas)
+
+    def create_deployment(self, body, **kwargs):
+        # create a deployment in the scope's namespace, errors are raised to the caller
+        return self.apps_api_instance.create_namespaced_deployment(body=body, namespace=self.write_namespace,
+                                                                   **kwargs)
+
+    def list_k8s_deployments(self, paged=False):
+        # list deployments, paged=True sends a long table through the pager
         try:
             result_deployment_list = []
-            deployment_list = self.apps_api_instance.list_namespaced_deployment(namespace="default")
-            deployments = deployment_list.items
-            if deployments is None or len(deployments) == 0:
-                Logger.warn(self.MSG_WARN_NO_DEPLOYMENT.format(""))
+            informer = self.get_deployment_informer(stale_ok=True)
+            deployments = informer.list()
+            renderer = self.get_renderer(self.DEPLOYMENT_LIST_COLUMNS, self.DEPLOYMENT_HEADER, self.DEPLOYMENT_KIND,
+                                         paged)
+            self.show_snapshot_age(informer, renderer)
+            if len(deployments) == 0:
+                if not renderer.is_machine_readable:
+                    Logger.warn(self.MSG_WARN_NO_DEPLOYMENT.format(""))
                 return result_deployment_list
             else:
-                Logger.header(self.DEPLOYMENT_HEADER)
-                Logger.sub_info(self.DEPLOYMENT_LIST_HEADER_DISPLAY_FORMAT.format("Available"))
-                trunk_len_big = 31
                 for deployment in deployments:
-                    deployment.metadata.name = "NA" if deployment.metadata.name is None else deployment.metadata.name
-                    result_deployment_list.append(deployment.metadata.name)
-                    deployment.status.ready_replicas = "NA" if deployment.status.ready_replicas is None else deployment.status.ready_replicas
-                    deployment.status.replicas = "NA" if deployment.status.replicas is None else deployment.status.replicas
-                    deployment.status.updated_replicas = "NA" if deployment.status.updated_replicas is None else deployment.status.updated_replicas
-                    deployment.status.available_replicas = "NA" if deployment.status.available_replicas is None else deployment.status.available_replicas
-                    deployment.metadata.name = deployment.metadata.name[0:trunk_len_big] + ".." if len(
-                        deployment.metadata.name) > trunk_len_big else deployment.metadata.name
-                    Logger.avail_info(
-                        self.DEPLOYMENT_LIST_DISPLAY_FORMAT.format(deployment.metadata.name,
-                                                                   str(deployment.status.ready_replicas) + "/" + str(
-                                                                       deployment.status.replicas),
-                                                                   deployment.status.updated_replicas,
-                                                                   deployment.status.available_replicas))
+                    cells, record, name = self.deployment_cells(deployment)
+                    result_deployment_list.append(name)
+                    renderer.add(cells, record, name)
+                renderer.close()
         except ApiException as api_error:
             Logger.err(api_error)
-        except (NewConnectionError, MaxRetryError, ConnectTimeoutError):
-            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER)
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
         return result_deployment_list
 
+    @staticmethod
+    def deployment_cells(deployment):
+        # (listing cells, json record, name) of a DeploymentRow
+        name = "NA" if deployment.name is None else deployment.name
+        ready_replicas = "NA" if deployment.ready_replicas is None else deployment.ready_replicas
+        replicas = "NA" if deployment.replicas is None else deployment.replicas
+        updated_replicas = "NA" if deployment.updated_replicas is None else deployment.updated_replicas
+        available_replicas = "NA" if deployment.available_replicas is None else deployment.available_replicas
+        return [name, str(ready_replicas) + "/" + str(replicas), str(updated_replicas),
+                str(available_replicas)], row_to_dict(deployment), name
+
+    def show_pod_summary(self, top=SUMMARY_TOP):
+        # pods per phase, namespace and node, the pods and containers restarting most, the controllers with the
+        # highest share of not-ready pods and the pod ages of the current scope, computed over columns of the
+        # pod cache (see PodAnalytics). Returns the PodSummary, None on errors
+        try:
+            informer = self.get_pod_informer(stale_ok=True)
+            rows = informer.list()
+        except ApiException as api_error:
+            Logger.err(api_error)
+            return None
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
+            return None
+        started_at = time.perf_counter()
+        summary = PodSummary(rows, top)
+        elapsed = time.perf_counter() - started_at
+        renderer = self.render_summary(self.SUMMARY_PHASES, "phase", [
+            [str(phase or self.STR_NONE), count, self.share(count, summary.count)] for phase, count in summary.phases])
+        self.show_snapshot_age(informer, renderer)
+        renderer.close()
+        for section, key, counts in ((self.SUMMARY_NAMESPACES, "namespace", summary.namespaces),
+                                     (self.SUMMARY_NODES, "node", summary.nodes)):
+            title, columns = section
+            self.render_summary((title.format(min(top, len(counts)), len(counts)), columns), key, [
+                [str(value or self.STR_NONE), count, self.share(count, summary.count)]
+                for value, count in counts[:top]]).close()
+        self.render_summary(self.SUMMARY_RESTARTING_PODS, "pod", [
+            [namespace, name, restarts, node or self.STR_NONE]
+            for namespace, name, restarts, node in summary.restarting_pods]).close()
+        self.render_summary(self.SUMMARY_RESTARTING_CONTAINERS, "container",
+                            [list(container) for container in summary.restarting_containers]).close()
+        self.render_summary(self.SUMMARY_NOT_READY, "owner", [
+            [namespace, owner, active, not_ready, self.share(not_ready, active)]
+            for namespace, owner, active, not_ready in summary.owners]).close()
+        self.render_summary(self.SUMMARY_AGES, "age", [
+            [title, count, self.share(count, summary.count)] for title, count in summary.ages]).close()
+        if not renderer.is_machine_readable:
+            Logger.info(self.MSG_INFO_SUMMARY.format(summary.count, summary.oldest or self.STR_NONE,
+                                                     elapsed * 1000))
+        return summary
+
+    def render_summary(self, section, key, rows):
+        # renderer of one summary table, not closed. The json records carry the table's key and their cells
+        # by column; the name of a row is its first cell
+        title, columns = section
+        renderer = self.get_renderer(columns, title, self.SUMMARY_KIND)
+        for row in rows:
+            record = {column_title.lower().replace(" ", "_"): cell for (column_title, _), cell in zip(columns, row)}
+            record["summary"] = key
+            renderer.add([str(cell) for cell in row], record, str(row[0]))
+        return renderer
+
+    @staticmethod
+    def share(count, total):
+        return "{:.1f}%".format(100.0 * count / total) if total else "NA"
+
     def exec_command_on_k8s_pod(self, pod_name, input_cmd):
-        # Calling exec and waiting for response
+        # Calling exec and waiting for the command to exit
         if input_cmd is not None and len(input_cmd) != 0:
             cmd = input_cmd
             Logger.info("Input CMD:" + str(cmd))
         else:
-            cmd = 'echo This message goes to stderr; echo This message goes to stdout'
+            cmd = self.DEFAULT_EXEC_CMD
             Logger.info("Default CMD:" + str(cmd))
-        # Calling exec interactively
-        exec_command = ['/bin/sh']
-        resp = stream(self.api_instance.connect_get_namespaced_pod_exec,
-                      pod_name,
-                      'default',
-                      command=exec_command,
-                      stderr=True, stdin=True,
-                      stdout=True, tty=False,
-                      _preload_content=False)
-        commands = [cmd]
-        while resp.is_open():
-            resp.update(timeout=1)
-            if resp.peek_stdout():
-                print("STDOUT: %s" % resp.read_stdout())
-            if resp.peek_stderr():
-                print("STDERR: %s" % resp.read_stderr())
-            if commands:
-                c = commands.pop(0)
-                print("Running command... %s\n" % c)
-                resp.write_stdin(c + "\n")
+        return self.exec_on_pods([(self.pod_namespace(pod_name), pod_name)], cmd)[0]
+
+    def exec_on_pods(self, pod_keys, cmd, parallelism=EXEC_PARALLELISM, timeout=EXEC_TIMEOUT_SECONDS):
+        # run a shell command on (namespace, name) pods concurrently, returns their ExecResults
+        return ExecEngine(parallelism, timeout, self.new_api_client).run(pod_keys, cmd)
+
+    def select_pods(self, name_pattern=None, label_selector=None, phase=POD_PHASE_RUNNING):
+        # sorted (namespace, name) keys of the pods of the current scope in a phase (None for any phase)
+        # matching a glob name pattern and a label selector (added to the scope's selector)
+        if label_selector:
+            list_func, args, kwargs = self.pod_list_call()
+            kwargs["label_selector"] = ",".join(filter(None, (kwargs.get("label_selector"), label_selector)))
+            if phase is not None:
+                kwargs["field_selector"] = ",".join(filter(None, (kwargs.get("field_selector"),
+                                                                  "status.phase=" + phase)))
+            pods, _ = load_rows(list_func(*args, _preload_content=False, **kwargs), PodRow)
+            return sorted((pod.namespace, pod.name) for pod in pods
+                          if name_pattern is None or fnmatch.fnmatchcase(pod.name, name_pattern))
+        pod_index = self.get_pod_index()
+        name_pattern = name_pattern or "*"
+        # only names starting with the pattern's literal prefix can match
+        prefix = re.split(r"[*?\[]", name_pattern, 1)[0]
+        keys = set()
+        for name in pod_index.prefix_matches(prefix):
+            if fnmatch.fnmatchcase(name, name_pattern):
+                keys |= pod_index.keys_of(name)
+        if phase is not None:
+            keys &= pod_index.keys_in_phase(phase)
+        return sorted(keys)
+
+    def select_deployments(self, name_pattern=None, label_selector=None):
+        # DeploymentRows of the current scope matching a glob name pattern and a label selector (added to the
+        # scope's selector), sorted by namespace and name
+        if label_selector:
+            list_func, args, kwargs = self.deployment_list_call()
+            kwargs["label_selector"] = ",".join(filter(None, (kwargs.get("label_selector"), label_selector)))
+            deployments, _ = load_rows(list_func(*args, _preload_content=False, **kwargs), DeploymentRow)
+        else:
+            deployments = self.get_cached_deployments()
+        return sorted((deployment for deployment in deployments
+                       if name_pattern is None or fnmatch.fnmatchcase(deployment.name, name_pattern)),
+                      key=lambda deployment: (deployment.namespace, deployment.name))
+
+    def delete_pod(self, namespace, name, **kwargs):
+        # raw DELETE of one pod for bulk callers, errors are raised
+        return self.api_instance.delete_namespaced_pod(name, namespace, **kwargs)
+
+    def delete_pod_collection(self, namespace, **kwargs):
+        # raw DELETE of the pods of a namespace matching the selectors in kwargs, errors are raised
+        return self.api_instance.delete_collection_namespaced_pod(namespace, **kwargs)
+
+    def patch_deployment_scale(self, namespace, name, replicas, **kwargs):
+        # raw PATCH of a deployment's scale subresource for bulk callers, errors are raised
+        return self.apps_api_instance.patch_namespaced_deployment_scale(name, namespace,
+                                                                       {"spec": {"replicas": replicas}}, **kwargs)
+
+    def follow_logs(self, deployment_name=None, label_selector=None, since_seconds=None, tail_lines=None):
+        # start following the logs of the running pods of a deployment and/or a label selector in the current scope,
+        # returns the started LogStreamer, None on errors
+        try:
+            list_func, args, kwargs = self.pod_list_call()
+            if deployment_name:
+                # a deployment's pods are in its namespace
+                list_func, args = self.api_instance.list_namespaced_pod, (self.deployment_namespace(deployment_name),)
+                label_selector = ",".join(filter(None, (self.deployment_selector(deployment_name), label_selector)))
+            kwargs["label_selector"] = ",".join(filter(None, (kwargs.get("label_selector"), label_selector)))
+            informer = Informer(list_func, PodRow, *args, page_size=PODS_LIST_PAGE_SIZE, **kwargs)
+            streamer = LogStreamer(informer, self.new_api_client, since_seconds, tail_lines, LOG_BUFFER_LINES,
+                                   LOG_MAX_STREAMS)
+            streamer.start()
+            return streamer
+        except ApiException as api_error:
+            Logger.err(api_error)
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
+        return None
+
+    def deployment_selector(self, deployment_name):
+        # label selector of a deployment's pods, e.g. "app=nginx,tier in (web,api)"
+        deployment = self.apps_api_instance.read_namespaced_deployment(
+            name=deployment_name, namespace=self.deployment_namespace(deployment_name))
+        selector = deployment.spec.selector
+        terms = ["{}={}".format(key, value) for key, value in sorted((selector.match_labels or {}).items())]
+        for expression in selector.match_expressions or []:
+            if expression.operator in ("In", "NotIn"):
+                terms.append("{} {} ({})".format(expression.key, expression.operator.lower(),
+                                                 ",".join(expression.values or [])))
+            elif expression.operator == "Exists":
+                terms.append(expression.key)
             else:
-                break
-        resp.close()
+                terms.append("!" + expression.key)
+        return ",".join(terms)
 
-    def deploy_k8s_pod(self, file_name, deployment_name):
-        # create a pod using yaml file
+    def deploy_k8s_pod(self, file_name, deployment_name, wait_timeout=None):
+        # create a pod using yaml file,
+        # with a wait_timeout waits for the rollout and returns the seconds it took (None when not ready)
         try:
-            with open(path.join(path.dirname(__file__), file_name)) as f:
-                dep = yaml.safe_load(f)
-                if deployment_name is not None and len(deployment_name) != 0:
-                    dep['metadata']['name'] = deployment_name
-                resp = self.apps_api_instance.create_namespaced_daemon_set(
-                    body=dep, namespace="default")
-                Logger.info(self.MSG_INFO_POD_DEPLOYED.format(resp.metadata.name))
+            dep = self.render_manifest(file_name, deployment_name)
+            resp = self.apps_api_instance.create_namespaced_daemon_set(
+                body=dep, namespace=self.write_namespace)
+            Logger.info(self.MSG_INFO_POD_DEPLOYED.format(resp.metadata.name))
+            if wait_timeout is not None:
+                return self.wait_for_rollout(RolloutWatcher.KIND_DAEMON_SET, resp.metadata.namespace,
+                                             resp.metadata.name, wait_timeout)
         except ApiException as api_error:
             Logger.err(api_error)
-        except (NewConnectionError, MaxRetryError, ConnectTimeoutError):
-            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER)
+        except self.CONNECTION_ERRORS as connection_error:
+            Logger.err(self.MSG_ERR_UNABLE_TO_CONNECT_TO_CLUSTER.format(ApiConnection.describe_error(connection_error)))
+
+    def wait_for_rollout(self, kind, namespace, name, timeout):
+        # wait until a deployment or daemon set (RolloutWatcher.KIND_*) is rolled out,
+        # returns the seconds it took or None on timeout, errors are raised to the caller
+        if kind == RolloutWatcher.KIND_DAEMON_SET:
+            list_func = self.apps_api_instance.list_namespaced_daemon_set
+        else:
+            list_func = self.apps_api_instance.list_namespaced_deployment
+        return RolloutWatcher(kind, list_func, namespace, name).wait(timeout)
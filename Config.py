@@ -1,3 +1,32 @@
 NGINX_DEPLOY_FILE = 'nginx-deployment.yaml'
 REDIS_DEPLOY_FILE = 'redis-deployment.yaml'
-DEPLOY_POD_FILE = 'fluentd-es-ds.yaml'
\ No newline at end of file
+DEPLOY_POD_FILE = 'fluentd-es-ds.yaml'
+PODS_LIST_PAGE_SIZE = 500
+BULK_CREATE_CONCURRENCY = 16
+BULK_CREATE_QPS = 20
+MANIFESTS = {'nginx': NGINX_DEPLOY_FILE, 'redis': REDIS_DEPLOY_FILE, 'fluentd': DEPLOY_POD_FILE}
+EXEC_PARALLELISM = 20
+EXEC_TIMEOUT_SECONDS = 60
+LOG_BUFFER_LINES = 1000
+LOG_MAX_STREAMS = 50
+ROLLOUT_TIMEOUT_SECONDS = 300
+DEFAULT_NAMESPACE = 'default'
+ALL_NAMESPACES = 'all'
+API_POOL_MAXSIZE = 32
+API_CONNECT_TIMEOUT_SECONDS = 5
+API_READ_TIMEOUT_SECONDS = 60
+API_TCP_KEEPALIVE_SECONDS = 30
+API_MAX_RETRIES = 3
+API_BACKOFF_BASE_SECONDS = 0.2
+API_BACKOFF_MAX_SECONDS = 10
+API_CIRCUIT_FAILURE_THRESHOLD = 3
+API_CIRCUIT_COOLDOWN_SECONDS = 10
+BULK_DELETE_CONCURRENCY = 16
+BULK_DELETE_QPS = 50
+BULK_SCALE_CONCURRENCY = 16
+BULK_SCALE_QPS = 50
+MULTI_CLUSTER_TIMEOUT_SECONDS = 30
+SNAPSHOT_DB_FILE = '~/.kube/kubernetes-cli-snapshots.db'
+SNAPSHOT_KEEP = 20
+SUMMARY_TOP = 10
+SUMMARY_REFRESH_SECONDS = 5
\ No newline at end of file
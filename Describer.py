@@ -0,0 +1,164 @@
+from datetime import datetime, timezone
+
+
+class PodDescriber:
+    # A class for rendering a pod and its events as readable text, laid out like `kubectl describe pod`.
+    # Works on the kubernetes client's V1Pod/V1Event models returned by read_namespaced_pod/list_namespaced_event.
+    NONE = "<none>"
+    LABEL_WIDTH = 16
+    CONTAINER_LABEL_WIDTH = 16
+    EVENTS_DISPLAY_FORMAT = "  {:<9}{:<20}{:<8}{:<24}{}"
+
+    @classmethod
+    def describe(cls, pod, events):
+        # full description text of a pod
+        lines = []
+        metadata = pod.metadata
+        spec = pod.spec
+        status = pod.status
+        cls.field(lines, "Name", metadata.name)
+        cls.field(lines, "Namespace", metadata.namespace)
+        cls.field(lines, "Priority", spec.priority)
+        node = spec.node_name
+        if node is not None and status.host_ip is not None:
+            node = node + "/" + status.host_ip
+        cls.field(lines, "Node", node)
+        cls.field(lines, "Start Time", status.start_time)
+        cls.mapping(lines, "Labels", metadata.labels)
+        cls.mapping(lines, "Annotations", metadata.annotations)
+        cls.field(lines, "Status", "Terminating" if metadata.deletion_timestamp is not None else status.phase)
+        cls.field(lines, "IP", status.pod_ip)
+        owner = next((ref for ref in metadata.owner_references or [] if ref.controller), None)
+        if owner is not None:
+            cls.field(lines, "Controlled By", owner.kind + "/" + owner.name)
+        container_statuses = {container_status.name: container_status
+                              for container_status in status.container_statuses or []}
+        lines.append("Containers:")
+        for container in spec.containers or []:
+            cls.container(lines, container, container_statuses.get(container.name))
+        lines.append("Conditions:")
+        if status.conditions:
+            lines.append("  {:<18}{}".format("Type", "Status"))
+            for condition in status.conditions:
+                lines.append("  {:<18}{}".format(condition.type, condition.status))
+        else:
+            lines.append("  " + cls.NONE)
+        lines.append("Volumes:")
+        if spec.volumes:
+            for volume in spec.volumes:
+                lines.append("  " + volume.name)
+        else:
+            lines.append("  " + cls.NONE)
+        cls.field(lines, "QoS Class", status.qos_class)
+        cls.mapping(lines, "Node-Selectors", spec.node_selector)
+        tolerations = [cls.toleration(toleration) for toleration in spec.tolerations or []]
+        cls.field(lines, "Tolerations", "\n".join(tolerations) if tolerations else None)
+        cls.events(lines, events)
+        return "\n".join(lines)
+
+    @classmethod
+    def field(cls, lines, label, value, width=LABEL_WIDTH, indent=""):
+        # "Label:   value", multi-line values are aligned under the first line
+        value = cls.NONE if value is None or value == "" else str(value)
+        prefix = "{}{:<{}}".format(indent, label + ":", width)
+        for index, line in enumerate(value.split("\n")):
+            lines.append((prefix if index == 0 else " " * len(prefix)) + line)
+
+    @classmethod
+    def mapping(cls, lines, label, values, width=LABEL_WIDTH, indent=""):
+        # labels/annotations/selectors as key=value lines
+        if values:
+            text = "\n".join("{}={}".format(key, values[key]) for key in sorted(values))
+        else:
+            text = None
+        cls.field(lines, label, text, width, indent)
+
+    @classmethod
+    def container(cls, lines, container, container_status):
+        # one container section
+        indent = "    "
+        width = cls.CONTAINER_LABEL_WIDTH
+        lines.append("  " + container.name + ":")
+        if container_status is not None:
+            cls.field(lines, "Container ID", container_status.container_id, width, indent)
+        cls.field(lines, "Image", container.image, width, indent)
+        if container_status is not None:
+            cls.field(lines, "Image ID", container_status.image_id, width, indent)
+        ports = ["{}/{}".format(port.container_port, port.protocol or "TCP") for port in container.ports or []]
+        cls.field(lines, "Port" + ("s" if len(ports) > 1 else ""), ", ".join(ports), width, indent)
+        if container_status is not None:
+            cls.state(lines, "State", container_status.state, width, indent)
+            if container_status.last_state is not None and (container_status.last_state.terminated is not None or
+                                                            container_status.last_state.waiting is not None):
+                cls.state(lines, "Last State", container_status.last_state, width, indent)
+            cls.field(lines, "Ready", container_status.ready, width, indent)
+            cls.field(lines, "Restart Count", container_status.restart_count, width, indent)
+        if container.resources is not None:
+            cls.mapping(lines, "Limits", container.resources.limits, width, indent)
+            cls.mapping(lines, "Requests", container.resources.requests, width, indent)
+        environment = ["{}: {}".format(env.name, env.value if env.value is not None else "<set from source>")
+                       for env in container.env or []]
+        cls.field(lines, "Environment", "\n".join(environment) if environment else None, width, indent)
+
+    @classmethod
+    def state(cls, lines, label, state, width, indent):
+        # container state with its details
+        if state is None:
+            cls.field(lines, label, None, width, indent)
+        elif state.running is not None:
+            cls.field(lines, label, "Running", width, indent)
+            cls.field(lines, "Started", state.running.started_at, width - 2, indent + "  ")
+        elif state.waiting is not None:
+            cls.field(lines, label, "Waiting", width, indent)
+            cls.field(lines, "Reason", state.waiting.reason, width - 2, indent + "  ")
+        elif state.terminated is not None:
+            cls.field(lines, label, "Terminated", width, indent)
+            cls.field(lines, "Reason", state.terminated.reason, width - 2, indent + "  ")
+            cls.field(lines, "Exit Code", state.terminated.exit_code, width - 2, indent + "  ")
+            cls.field(lines, "Started", state.terminated.started_at, width - 2, indent + "  ")
+            cls.field(lines, "Finished", state.terminated.finished_at, width - 2, indent + "  ")
+        else:
+            cls.field(lines, label, None, width, indent)
+
+    @staticmethod
+    def toleration(toleration):
+        # "key=value:Effect op=Exists for 300s"
+        text = toleration.key or ""
+        if toleration.value:
+            text += "=" + toleration.value
+        if toleration.effect:
+            text += ":" + toleration.effect
+        if toleration.operator == "Exists" and not toleration.value:
+            text += " op=Exists"
+        if toleration.toleration_seconds is not None:
+            text += " for {}s".format(toleration.toleration_seconds)
+        return text
+
+    @classmethod
+    def events(cls, lines, events):
+        # events table, oldest first
+        if not events:
+            cls.field(lines, "Events", None)
+            return
+        lines.append("Events:")
+        lines.append(cls.EVENTS_DISPLAY_FORMAT.format("Type", "Reason", "Age", "From", "Message"))
+        now = datetime.now(timezone.utc)
+        for event in sorted(events, key=cls.event_time):
+            source = event.source.component if event.source is not None and event.source.component else ""
+            lines.append(cls.EVENTS_DISPLAY_FORMAT.format(event.type or "", event.reason or "",
+                                                          cls.age(now, cls.event_time(event)), source,
+                                                          event.message or ""))
+
+    @staticmethod
+    def event_time(event):
+        return event.last_timestamp or event.event_time or event.first_timestamp or datetime.min.replace(
+            tzinfo=timezone.utc)
+
+    @staticmethod
+    def age(now, timestamp):
+        # short age like kubectl: 45s, 12m, 3h, 2d
+        seconds = max(int((now - timestamp).total_seconds()), 0)
+        for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+            if seconds >= size:
+                return "{}{}".format(seconds // size, unit)
+        return "{}s".format(seconds)
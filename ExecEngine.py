@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from kubernetes import client
+from kubernetes.stream import stream
+from kubernetes.stream.ws_client import STDOUT_CHANNEL, STDERR_CHANNEL, ERROR_CHANNEL
+
+from Logger import Logger
+from Renderer import TableRenderer
+from Stats import Stats
+
+
+class ExecResult:
+    # Outcome of a command on one pod: collected output, exit code and wall time
+    __slots__ = ("namespace", "name", "stdout", "stderr", "exit_code", "error", "elapsed")
+
+    def __init__(self, namespace, name):
+        self.namespace = namespace
+        self.name = name
+        self.stdout = []
+        self.stderr = []
+        self.exit_code = None
+        self.error = None
+        self.elapsed = None
+
+    @property
+    def succeeded(self):
+        return self.error is None and self.exit_code == 0
+
+
+class ExecEngine:
+    # A class for running one command on many pods concurrently.
+    # Each stream is read as its frames arrive (no polling interval) until the command exits, output is
+    # displayed line by line prefixed with the pod name and the exit code is read from the exec error channel.
+    # kubernetes.stream.stream swaps the request method of the ApiClient it is given, so every worker
+    # thread has its own ApiClient, made by new_api_client, instead of sharing the Client's.
+    SHELL = ["/bin/sh", "-c"]
+    STATUS_SUCCESS = "Success"
+    REASON_EXIT_CODE = "ExitCode"
+    MSG_TIMED_OUT = "timed out after {}s"
+    MSG_OUTPUT = "{} | {}"
+    MSG_RESULT = "{}: exit code {} in {}"
+    MSG_RESULT_ERROR = "{}: {} after {}"
+    MSG_SUMMARY = "Ran on {} pods in {:.2f}s: succeeded {}, failed {}"
+    MSG_TIMINGS = "Per-pod time p50={} p99={} max={}"
+    SUMMARY_COLUMNS = (("POD", 43), ("EXIT", None), ("TIME", None), ("ERROR", None))
+
+    def __init__(self, parallelism, timeout, new_api_client, show_output=True):
+        self.parallelism = max(int(parallelism), 1)
+        self.timeout = timeout
+        self.new_api_client = new_api_client
+        self.show_output = show_output
+        self.local = threading.local()
+        self.output_lock = threading.Lock()
+
+    def get_api(self):
+        # CoreV1Api of the calling thread
+        api = getattr(self.local, "api", None)
+        if api is None:
+            api = self.local.api = client.CoreV1Api(self.new_api_client())
+        return api
+
+    def run(self, pod_keys, command):
+        # run command on every (namespace, name) pod, display a summary and return the ExecResults in input order
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.parallelism, max(len(pod_keys), 1))) as executor:
+            results = list(executor.map(lambda key: self.run_one(key[0], key[1], command), pod_keys))
+        self.show_summary(results, time.monotonic() - started_at)
+        return results
+
+    def run_one(self, namespace, pod_name, command):
+        # run command on one pod and wait for its exit status
+        result = ExecResult(namespace, pod_name)
+        started_at = time.monotonic()
+        resp = None
+        try:
+            resp = stream(self.get_api().connect_get_namespaced_pod_exec, pod_name, namespace,
+                          command=self.SHELL + [command], stderr=True, stdin=False, stdout=True, tty=False,
+                          _preload_content=False)
+            pending = {STDOUT_CHANNEL: "", STDERR_CHANNEL: ""}
+            deadline = started_at + self.timeout
+            while resp.is_open():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    result.error = self.MSG_TIMED_OUT.format(self.timeout)
+                    break
+                # blocks until a frame arrives, reads at most one frame
+                resp.update(timeout=remaining)
+                self.collect(result, resp, pending, final=False)
+            self.collect(result, resp, pending, final=True)
+            if result.error is None:
+                result.exit_code, result.error = self.exit_status(resp.read_channel(ERROR_CHANNEL))
+        except Exception as err:
+            result.error = str(err)
+        finally:
+            if resp is not None:
+                # do not wait for the server's close frame, it is not sent before a timed out command ends
+                resp.close(timeout=0)
+            result.elapsed = time.monotonic() - started_at
+        return result
+
+    def collect(self, result, resp, pending, final):
+        # move complete lines of stdout and stderr into the result, final=True also takes unterminated lines
+        for channel, lines in ((STDOUT_CHANNEL, result.stdout), (STDERR_CHANNEL, result.stderr)):
+            data = pending[channel] + resp.read_channel(channel)
+            complete = data.split("\n")
+            pending[channel] = "" if final else complete.pop()
+            if final and complete[-1] == "":
+                complete.pop()
+            if len(complete) != 0:
+                lines.extend(complete)
+                self.display(result.name, channel, complete)
+
+    def display(self, pod_name, channel, lines):
+        if not self.show_output:
+            return
+        log = Logger.info if channel == STDOUT_CHANNEL else Logger.warn
+        with self.output_lock:
+            for line in lines:
+                log(self.MSG_OUTPUT.format(pod_name, line))
+
+    @classmethod
+    def exit_status(cls, error_channel):
+        # (exit code, error) from the Status object sent on the error channel when the command ends
+        if not error_channel:
+            return None, "connection closed without exit status"
+        try:
+            status = json.loads(error_channel)
+        except ValueError:
+            return None, error_channel
+        if status.get("status") == cls.STATUS_SUCCESS:
+            return 0, None
+        for cause in (status.get("details") or {}).get("causes") or []:
+            if cause.get("reason") == cls.REASON_EXIT_CODE:
+                return int(cause.get("message")), None
+        return None, status.get("message") or error_channel
+
+    def show_summary(self, results, elapsed):
+        if len(results) == 1:
+            result = results[0]
+            if result.error is None:
+                Logger.info(self.MSG_RESULT.format(result.name, result.exit_code, Stats.format_ms(result.elapsed)))
+            else:
+                Logger.err(self.MSG_RESULT_ERROR.format(result.name, result.error, Stats.format_ms(result.elapsed)))
+            return
+        renderer = TableRenderer(self.SUMMARY_COLUMNS)
+        for result in results:
+            renderer.add([result.name, "NA" if result.exit_code is None else str(result.exit_code),
+                          Stats.format_ms(result.elapsed), result.error or ""], None, result.name)
+        renderer.close()
+        succeeded = sum(1 for result in results if result.succeeded)
+        Logger.info(self.MSG_SUMMARY.format(len(results), elapsed, succeeded, len(results) - succeeded))
+        timings = [result.elapsed for result in results]
+        Logger.info(self.MSG_TIMINGS.format(Stats.format_ms(Stats.percentile(timings, 50)),
+                                            Stats.format_ms(Stats.percentile(timings, 99)),
+                                            Stats.format_ms(max(timings) if timings else None)))
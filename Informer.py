@@ -0,0 +1,219 @@
+import json
+import threading
+from bisect import bisect_left
+
+from kubernetes.watch.watch import iter_resp_lines
+
+from Logger import Logger
+from Rows import load_rows
+
+
+class Informer:
+    # A class for keeping a local cache of Kubernetes objects in sync with the API server.
+    # The cache is filled by one initial LIST, then kept current by a WATCH started from the
+    # LIST's resourceVersion. When the resourceVersion has expired (410 Gone) the cache is relisted by sync().
+    # Responses are read raw (_preload_content=False) and projected into compact rows (see Rows.py).
+    # A cache preloaded from a saved snapshot (see Snapshots.py) is served at once and reconciled by a
+    # LIST in the informer thread; callers that must not see stale rows call sync() first.
+    HTTP_STATUS_GONE = 410
+    WATCH_TIMEOUT_SECONDS = 300
+    RETRY_DELAY_SECONDS = 2
+    STOP_TIMEOUT_SECONDS = 2
+    EVENT_ADDED = "ADDED"
+    EVENT_MODIFIED = "MODIFIED"
+    EVENT_DELETED = "DELETED"
+    EVENT_BOOKMARK = "BOOKMARK"
+    EVENT_ERROR = "ERROR"
+    MSG_WARN_WATCH_FAILED = "Watch on {} failed, retrying: {}"
+
+    def __init__(self, list_func, row_class, *args, page_size=None, index=None, **kwargs):
+        # list_func is a CoreV1Api/AppsV1Api list_* method, args/kwargs are passed to every LIST and WATCH.
+        # row_class (PodRow/DeploymentRow) projects each object, page_size splits the (re)list into chunks,
+        # index (a NameIndex) is kept up to date with the cache
+        self.list_func = list_func
+        self.row_class = row_class
+        self.args = args
+        self.kwargs = kwargs
+        self.page_size = page_size
+        self.store = {}
+        # keys of the store in (namespace, name) order, kept sorted as events are applied, and the rows in
+        # that order, built on the first read after a change
+        self.keys = []
+        self.rows = None
+        self.lock = threading.RLock()
+        self.resource_version = None
+        self.handlers = []
+        self.index = index
+        if index is not None:
+            self.add_handler(index)
+        self.thread = None
+        # the response of the running watch, closed by stop()
+        self.response = None
+        self.stopped = threading.Event()
+        # set once the cache holds a LIST of the API server, not only a snapshot
+        self.reconciled = threading.Event()
+        self.relist_lock = threading.Lock()
+        # time.time() of the preloaded snapshot
+        self.snapshot_taken_at = None
+
+    @staticmethod
+    def key_of(row):
+        # cache key of a row
+        return row.namespace or "", row.name or ""
+
+    def add_handler(self, handler):
+        # handler.reset(rows) is called after each (re)list and handler.update(old_row, new_row) for each event,
+        # both under the cache lock. Add handlers before start()
+        self.handlers.append(handler)
+
+    def has_synced(self):
+        return self.resource_version is not None
+
+    def preload(self, rows, resource_version, taken_at):
+        # fill the cache with the rows of a snapshot, before start()
+        store = {self.key_of(row): row for row in rows}
+        with self.lock:
+            self.replace_store(store)
+            self.resource_version = resource_version
+            self.snapshot_taken_at = taken_at
+            for handler in self.handlers:
+                handler.reset(store.values())
+
+    def start(self):
+        # initial LIST is done in the caller's thread so errors surface to the caller, a preloaded cache is
+        # relisted in the informer thread instead
+        if self.thread is not None:
+            return
+        if self.snapshot_taken_at is None:
+            self.relist()
+        self.thread = threading.Thread(target=self.run, name="informer-" + self.list_func.__name__, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # end the running watch, so the informer thread and its connection do not outlive the informer
+        self.stopped.set()
+        response = self.response
+        if response is not None:
+            # shutdown() (urllib3 2.3+) also wakes up a read blocked in the informer thread, close() may not
+            getattr(response, "shutdown", response.close)()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(self.STOP_TIMEOUT_SECONDS)
+
+    def sync(self):
+        # relist a preloaded cache in the caller's thread unless it is already reconciled, a relist under way
+        # in the informer thread is waited for
+        with self.relist_lock:
+            if not self.reconciled.is_set():
+                self.relist()
+
+    def relist(self):
+        # replace the cache content with a fresh LIST
+        store = {}
+        _continue = None
+        while True:
+            kwargs = dict(self.kwargs)
+            if self.page_size:
+                kwargs["limit"] = self.page_size
+            if _continue:
+                kwargs["_continue"] = _continue
+            rows, metadata = load_rows(self.list_func(*self.args, _preload_content=False, **kwargs), self.row_class)
+            for row in rows:
+                store[self.key_of(row)] = row
+            _continue = metadata.get("continue")
+            if not _continue:
+                break
+        with self.lock:
+            self.replace_store(store)
+            self.resource_version = metadata.get("resourceVersion")
+            for handler in self.handlers:
+                handler.reset(store.values())
+        self.reconciled.set()
+
+    def replace_store(self, store):
+        # under the cache lock
+        self.store = store
+        self.keys = sorted(store)
+        self.rows = None
+
+    def run(self):
+        # watch loop, runs in the informer thread
+        while not self.stopped.is_set():
+            try:
+                self.sync()
+                error_code = self.watch()
+            except Exception as err:
+                error_code = self.HTTP_STATUS_GONE if getattr(err, "status", None) == self.HTTP_STATUS_GONE else err
+            if error_code == self.HTTP_STATUS_GONE:
+                # resourceVersion expired, the next sync() relists, under relist_lock like a caller's sync()
+                self.reconciled.clear()
+            elif error_code is not None:
+                self.wait_before_retry(error_code)
+
+    def wait_before_retry(self, err):
+        if not self.stopped.is_set():
+            Logger.warn(self.MSG_WARN_WATCH_FAILED.format(self.list_func.__name__, err))
+            self.stopped.wait(self.RETRY_DELAY_SECONDS)
+
+    def watch(self):
+        # stream events from the last seen resourceVersion until the server closes the watch,
+        # returns the error code of an ERROR event
+        response = self.list_func(*self.args, watch=True, _preload_content=False,
+                                  resource_version=self.resource_version,
+                                  allow_watch_bookmarks=True,
+                                  timeout_seconds=self.WATCH_TIMEOUT_SECONDS,
+                                  **self.kwargs)
+        self.response = response
+        try:
+            if self.stopped.is_set():
+                return None
+            for line in iter_resp_lines(response):
+                event = json.loads(line)
+                if event["type"] == self.EVENT_ERROR:
+                    return event["object"].get("code")
+                self.apply(event["type"], event["object"])
+                if self.stopped.is_set():
+                    break
+        finally:
+            self.response = None
+            response.release_conn()
+        return None
+
+    def apply(self, event_type, obj):
+        # apply one watch event to the cache
+        with self.lock:
+            if event_type in (self.EVENT_ADDED, self.EVENT_MODIFIED):
+                row = self.row_class.from_dict(obj)
+                key = self.key_of(row)
+                old_row = self.store.get(key)
+                self.notify(old_row, row)
+                self.store[key] = row
+                if old_row is None:
+                    self.keys.insert(bisect_left(self.keys, key), key)
+                self.rows = None
+            elif event_type == self.EVENT_DELETED:
+                key = self.key_of(self.row_class.from_dict(obj))
+                old_row = self.store.pop(key, None)
+                self.notify(old_row, None)
+                if old_row is not None:
+                    del self.keys[bisect_left(self.keys, key)]
+                    self.rows = None
+            self.resource_version = (obj.get("metadata") or {}).get("resourceVersion", self.resource_version)
+
+    def notify(self, old_row, new_row):
+        if old_row is None and new_row is None:
+            return
+        for handler in self.handlers:
+            handler.update(old_row, new_row)
+
+    def snapshot(self):
+        # (rows, resourceVersion) of the cache, for saving it
+        with self.lock:
+            return self.list(), self.resource_version
+
+    def list(self):
+        # snapshot of the cached rows, ordered like an API LIST (namespace, name); a copy, so callers may
+        # keep or change it
+        with self.lock:
+            if self.rows is None:
+                self.rows = list(map(self.store.__getitem__, self.keys))
+            return list(self.rows)
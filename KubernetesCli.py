@@ -1,10 +1,24 @@
+import argparse
 import os
-import subprocess
+import sys
+import time
 from menu import Menu
 
-from Config import NGINX_DEPLOY_FILE, REDIS_DEPLOY_FILE, DEPLOY_POD_FILE
+try:
+    import readline
+except ImportError:
+    # no tab completion, e.g. on Windows
+    readline = None
+
+from Config import NGINX_DEPLOY_FILE, REDIS_DEPLOY_FILE, DEPLOY_POD_FILE, PODS_LIST_PAGE_SIZE, \
+    BULK_CREATE_CONCURRENCY, BULK_CREATE_QPS, EXEC_PARALLELISM, ROLLOUT_TIMEOUT_SECONDS, DEFAULT_NAMESPACE, \
+    ALL_NAMESPACES, BULK_DELETE_CONCURRENCY, BULK_DELETE_QPS, BULK_SCALE_CONCURRENCY, BULK_SCALE_QPS, \
+    MULTI_CLUSTER_TIMEOUT_SECONDS, SNAPSHOT_DB_FILE, SNAPSHOT_KEEP, SUMMARY_TOP, SUMMARY_REFRESH_SECONDS
+from BatchRunner import BatchRunner, BatchOperations, Operation
 from Logger import Logger
-import Client
+from Metrics import Metrics
+from Renderer import TableRenderer
+from Stats import Stats
 
 # -----Constants--------------#
 # String constants
@@ -13,13 +27,21 @@ STR_FOOTER = "------------------------------------------------------------------
 STR_PROMPT = ">>"
 STR_SUFFIX = ": "
 # Kubernetes Basic Operations Menu Items
-K8S_BASIC_MENU_ITEM1 = "List all pods[namespace={}]"
+K8S_BASIC_MENU_ITEM1 = "List all pods[{}]"
 K8S_BASIC_MENU_ITEM2 = "Describe a specific pod"
 K8S_BASIC_MENU_ITEM3 = "Create a pod['nginx' or 'redis']"
 K8S_BASIC_MENU_ITEM4 = "Scale pods['nginx' or 'redis']"
 K8S_BASIC_MENU_ITEM5 = "Execute a command on a pod"
 K8S_BASIC_MENU_ITEM6 = "Deploy a pod to every node"
 K8S_BASIC_MENU_ITEM7 = "Delete a specific pod"
+K8S_BASIC_MENU_ITEM8 = "List all pods page by page[{}, page size={}]"
+K8S_BASIC_MENU_ITEM9 = "Set namespace and selectors[{}]"
+K8S_BASIC_MENU_ITEM10 = "Execute a command on many pods"
+K8S_BASIC_MENU_ITEM11 = "Follow logs of a deployment or selector"
+K8S_BASIC_MENU_ITEM12 = "Show API call and timing statistics"
+K8S_BASIC_MENU_ITEM13 = "Delete pods by name pattern or selector"
+K8S_BASIC_MENU_ITEM14 = "Scale deployments by name pattern or selector"
+K8S_BASIC_MENU_ITEM15 = "Show pod health summary"
 # BACK
 COMMON_MENU_BACK = "Go back"
 # "Docker Compose Demo" Menu Items
@@ -39,9 +61,68 @@ MSG_PROMPT_INPUT_IMAGE_NAME = "Select Image 'nginx' or 'redis'[N or R](Press Ent
 MSG_ERR_INVALID_POD_NAME = "Invalid pod name: {}"
 MSG_ERR_INVALID_DEPLOYMENT_NAME = "Invalid pod name: {}"
 MSG_ERR_WRONG_INPUT = "Wrong Input:{}"
+MSG_INFO_DID_YOU_MEAN = "Did you mean: {}"
 MSG_PROMPT_INPUT_NAME = "Input {} Name(Press Enter for back)"
 MSG_PROMPT_INPUT_SCALE_QTY = "Input scale quantity(Press Enter for back)"
 MSG_PROMPT_INPUT_CMD = "Input CMD(Optional)"
+MSG_PROMPT_INPUT_COUNT = "Input number of deployments(Press Enter for back)"
+MSG_PROMPT_INPUT_NAME_PATTERN = "Input name pattern, '{{}}' is replaced by 1..N(Default '{}')"
+MSG_PROMPT_INPUT_CONCURRENCY = "Input concurrency(Default {})"
+MSG_PROMPT_INPUT_QPS = "Input QPS limit(Default {})"
+MSG_PROMPT_INPUT_NAMESPACE = "Input namespace, 'all' for all namespaces(Current '{}', Press Enter to keep)"
+MSG_PROMPT_INPUT_LABEL_SELECTOR = "Input label selector, e.g. app=nginx(Current '{}', Press Enter to keep, '-' to clear)"
+MSG_PROMPT_INPUT_FIELD_SELECTOR = "Input field selector, e.g. status.phase=Running,spec.nodeName=node-1" \
+                                  "(Current '{}', Press Enter to keep, '-' to clear)"
+MSG_PROMPT_INPUT_POD_PATTERN = "Input pod name pattern, e.g. web-*(Press Enter for all pods)"
+MSG_PROMPT_INPUT_POD_SELECTOR = "Input label selector, e.g. app=nginx(Optional)"
+MSG_PROMPT_INPUT_PARALLELISM = "Input parallelism(Default {})"
+MSG_INFO_SELECTED_PODS = "Selected {} running pods"
+MSG_WARN_NO_MATCHING_PODS = "There is no running pod matching '{}'"
+MSG_WARN_NO_MATCHING_OBJECTS = "There is no {} matching '{}'"
+MSG_PROMPT_INPUT_POD_PATTERN_ALL = "Input pod name pattern, e.g. web-*(Press Enter for all pods of the scope)"
+MSG_PROMPT_INPUT_DEPLOYMENT_PATTERN = "Input deployment name pattern, e.g. web-*" \
+                                      "(Press Enter for all deployments of the scope)"
+MSG_PROMPT_INPUT_DEPLOYMENT_SELECTOR = "Input deployment label selector, e.g. app=nginx(Optional)"
+MSG_PROMPT_INPUT_GRACE_PERIOD = "Input grace period seconds, 0 to delete at once(Press Enter for the pods' own)"
+MSG_PROMPT_CONFIRM_DELETE = "Delete these {} pods? [y/N]"
+MSG_PROMPT_CONFIRM_SCALE = "Scale these {} deployments to {}? [y/N]"
+MSG_PROMPT_INPUT_DEPLOYMENT_OPTIONAL = "Input Deployment Name(Press Enter for pods by selector)"
+MSG_PROMPT_INPUT_SINCE = "Input since seconds(Optional)"
+MSG_PROMPT_INPUT_TAIL = "Input tail lines(Optional)"
+MSG_INFO_FOLLOWING_LOGS = "Following logs, press Enter to stop.."
+MSG_PROMPT_INPUT_TOP = "Input number of top entries(Default {})"
+MSG_INFO_SUMMARY_REFRESH = "Refreshing every {:g}s, press Ctrl-C to stop.."
+MSG_PROMPT_INPUT_WAIT = "Wait until ready? Input timeout seconds or 'y' for {}s(Press Enter to not wait)"
+MSG_INFO_PROFILE_SAVED = "Profile of {} saved to {}"
+MSG_WARN_NO_STATS = "No API calls or timings recorded yet"
+MSG_INFO_STATS_TOTAL = "{} API calls in {:.2f}s, {} bytes, {} errors"
+TITLE_STATS = "<API Calls and Phases>"
+# (title, width) of the statistics columns, see TableRenderer
+STATS_COLUMNS = (("OPERATION", 70), ("KIND", None), ("COUNT", None), ("ERRORS", None), ("BYTES", None),
+                 ("TOTAL", None), ("P50", None), ("P90", None), ("P99", None), ("MAX", None),
+                 ("HISTOGRAM " + "/".join(Metrics.LATENCY_BUCKET_TITLES), None))
+STATS_KIND = "operation"
+# timing of menu actions and their cProfile output
+PHASE_MENU_ACTION = "menu {}"
+PROFILE_FILE_NAME = "profile-{:03d}-{}.prof"
+PROFILE_TOP_FUNCTIONS = 20
+STR_CLEAR = "-"
+STR_YES = "y"
+# non-interactive subcommands, see add_batch_commands(). Their arguments are the operation's parameters,
+# except for those renamed here: -l/--selector is the listing scope, not the pods or deployments operated on
+COMMAND_PLAN = "plan"
+COMMAND_SNAPSHOT = "snapshot"
+COMMAND_SUMMARY = "summary"
+COMMANDS = tuple(BatchOperations.PARAMETERS) + (COMMAND_PLAN, COMMAND_SNAPSHOT)
+SNAPSHOT_SAVE = "save"
+SNAPSHOT_LIST = "list"
+SNAPSHOT_DIFF = "diff"
+SNAPSHOT_ACTIONS = (SNAPSHOT_SAVE, SNAPSHOT_LIST, SNAPSHOT_DIFF)
+MSG_ERR_SNAPSHOTS_DISABLED = "Snapshots are disabled by --no-snapshots"
+MSG_ERR_SAVE_OFFLINE = "Nothing to save in offline mode"
+COMMAND_ARGUMENTS = {"selector": "target_selector"}
+# exit status of a command killed by SIGPIPE (128 + 13), e.g. when its output is piped into head
+EXIT_STATUS_BROKEN_PIPE = 141
 
 
 class KubernetesCli:
@@ -50,34 +131,39 @@ class KubernetesCli:
     # Please refer the below link for more details about Menu package
     # https://pypi.org/project/Menu/#description
 
-    def __init__(self):
-        # init
-        self.k8s_client = None
-        self.display_all_namespace_pods = False
-        self.namespace = "all" if self.display_all_namespace_pods else "default"
+    def __init__(self, namespace=DEFAULT_NAMESPACE, label_selector=None, field_selector=None,
+                 output_format=TableRenderer.FORMAT_TABLE, profile_dir=None, contexts=None,
+                 snapshot_file=SNAPSHOT_DB_FILE, offline=False, save_on_exit=False):
+        # init, the listing scope and output format are applied to the client when it is created,
+        # with a profile_dir every menu action is run under cProfile and its profile saved there.
+        # contexts are kubeconfig context names: operations use the first, listings merge all of them.
+        # The pod and deployment caches are kept in snapshot_file (None for no snapshots): the menus start
+        # from these snapshots and save them on exit, other commands only with save_on_exit; offline the
+        # snapshots are all that is shown
+        self.client = None
+        self.clusters = None
+        self.contexts = contexts or [None]
+        self.scope = (namespace, label_selector, field_selector)
+        self.output_format = output_format
+        self.profile_dir = profile_dir
+        self.profile_count = 0
+        self.snapshot_file = snapshot_file
+        self.snapshot_store = None
+        self.offline = offline
+        self.save_on_exit = save_on_exit
+        self.warm_start = False
 
         # -------------Kubernetes Basic Operations-------------
-        # Options of  Kubernetes Basic Operations Menu
-        self.k8s_basic_op_menu_options = [
-            (K8S_BASIC_MENU_ITEM1.format(self.namespace), self.list_pods),
-            (K8S_BASIC_MENU_ITEM2, self.describe_pod),
-            (K8S_BASIC_MENU_ITEM3, self.create_pod),
-            (K8S_BASIC_MENU_ITEM4, self.scale_pods),
-            (K8S_BASIC_MENU_ITEM5, self.execute_cmd_on_pod),
-            (K8S_BASIC_MENU_ITEM6, self.deploy_pod),
-            (K8S_BASIC_MENU_ITEM7, self.delete_pod),
-            (COMMON_MENU_BACK, Menu.CLOSE)
-        ]
-        # Kubernetes Basic Operations Menu
+        # Kubernetes Basic Operations Menu, options are set on refresh as they show the current scope
         self.k8s_basic_op_menu = Menu(
-            options=self.k8s_basic_op_menu_options,
             title=TITLE_K8S_BASIC_MENU,
+            refresh=self.set_k8s_basic_menu_options,
             auto_clear=False
         )
         # -------------Create Multiple Pods Demo-------------
         # Options of "Create multiple pods" Menu
         self.k8s_create_multiple_pods_menu_options = [
-            (K8S_CREATE_MULTIPLE_PODS_DEMO_MENU_ITEM, self.create_multiple_pods),
+            (K8S_CREATE_MULTIPLE_PODS_DEMO_MENU_ITEM, self.action(self.create_multiple_pods)),
             (COMMON_MENU_BACK, Menu.CLOSE)
         ]
         # "Create multiple pods" Menu
@@ -101,31 +187,183 @@ class KubernetesCli:
             auto_clear=False)
         self.main_menu.set_prompt(STR_PROMPT)
 
+    @property
+    def k8s_client(self):
+        # the Client is created on first use: importing the kubernetes package and loading kubeconfig take
+        # most of the startup time and the main menu needs neither
+        if self.client is None:
+            self.client = self.new_client(self.contexts[0])
+        return self.client
+
+    @property
+    def listing_client(self):
+        # client of the pod and deployment listings, a MultiClusterClient when several contexts are given
+        if len(self.contexts) == 1:
+            return self.k8s_client
+        if self.clusters is None:
+            from MultiCluster import MultiClusterClient
+            self.clusters = MultiClusterClient([self.k8s_client] + [self.new_client(context)
+                                                                    for context in self.contexts[1:]],
+                                               MULTI_CLUSTER_TIMEOUT_SECONDS)
+        return self.clusters
+
+    def new_client(self, context):
+        from Client import Client
+        k8s_client = Client(context)
+        k8s_client.set_scope(*self.scope)
+        k8s_client.output_format = self.output_format
+        if self.snapshot_file is not None:
+            if self.snapshot_store is None:
+                from Snapshots import SnapshotStore
+                self.snapshot_store = SnapshotStore(self.snapshot_file, SNAPSHOT_KEEP)
+            k8s_client.use_snapshots(self.snapshot_store, self.warm_start, self.offline)
+        return k8s_client
+
+    def created_clients(self):
+        # the Clients created so far, none when no action needed one
+        if self.clusters is not None:
+            return self.clusters.clients
+        return [] if self.client is None else [self.client]
+
+    def save_snapshots(self):
+        # save the caches of every cluster, for the next start; one-shot commands leave the snapshots alone
+        # unless asked to, caches that were never synced are skipped by the Client
+        if not (self.warm_start or self.save_on_exit):
+            return
+        for k8s_client in self.created_clients():
+            k8s_client.save_snapshots()
+
     def set_main_menu_options(self):
         # Method will display main menu
         self.main_menu.set_options(self.main_menu_options)
 
+    def set_k8s_basic_menu_options(self):
+        # Options of Kubernetes Basic Operations Menu
+        scope = self.listing_client.scope_description()
+        self.k8s_basic_op_menu.set_options([
+            (K8S_BASIC_MENU_ITEM1.format(scope), self.action(self.list_pods)),
+            (K8S_BASIC_MENU_ITEM2, self.action(self.describe_pod)),
+            (K8S_BASIC_MENU_ITEM3, self.action(self.create_pod)),
+            (K8S_BASIC_MENU_ITEM4, self.action(self.scale_pods)),
+            (K8S_BASIC_MENU_ITEM5, self.action(self.execute_cmd_on_pod)),
+            (K8S_BASIC_MENU_ITEM6, self.action(self.deploy_pod)),
+            (K8S_BASIC_MENU_ITEM7, self.action(self.delete_pod)),
+            (K8S_BASIC_MENU_ITEM8.format(scope, PODS_LIST_PAGE_SIZE), self.action(self.list_pods_page_by_page)),
+            (K8S_BASIC_MENU_ITEM9.format(scope), self.action(self.set_scope)),
+            (K8S_BASIC_MENU_ITEM10, self.action(self.execute_cmd_on_pods)),
+            (K8S_BASIC_MENU_ITEM11, self.action(self.follow_logs)),
+            (K8S_BASIC_MENU_ITEM12, self.show_stats),
+            (K8S_BASIC_MENU_ITEM13, self.action(self.delete_pods)),
+            (K8S_BASIC_MENU_ITEM14, self.action(self.scale_deployments)),
+            (K8S_BASIC_MENU_ITEM15, self.action(self.show_pod_summary)),
+            (COMMON_MENU_BACK, Menu.CLOSE)
+        ])
+
+    def action(self, method):
+        # menu option running method timed as a phase (see Metrics), under cProfile when profiling
+        def run_action():
+            with Metrics.timed(PHASE_MENU_ACTION.format(method.__name__)):
+                if self.profile_dir is None:
+                    return method()
+                return self.run_profiled(method)
+        return run_action
+
+    def run_profiled(self, method):
+        # run method under cProfile, show its most expensive functions and save the profile for pstats/snakeviz
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(method)
+        finally:
+            self.profile_count += 1
+            profile_path = os.path.join(self.profile_dir, PROFILE_FILE_NAME.format(self.profile_count,
+                                                                                   method.__name__))
+            profiler.dump_stats(profile_path)
+            pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+            Logger.info(MSG_INFO_PROFILE_SAVED.format(method.__name__, profile_path))
+
+    def show_stats(self):
+        # count, bytes, percentiles and a latency histogram per API operation and phase
+        Logger.header(STR_HEADER)
+        snapshot = Metrics.snapshot()
+        renderer = TableRenderer(STATS_COLUMNS, self.output_format, TITLE_STATS, STATS_KIND)
+        if len(snapshot) == 0:
+            if not renderer.is_machine_readable:
+                Logger.warn(MSG_WARN_NO_STATS)
+        for operation, stats in snapshot.items():
+            renderer.add([operation, stats["kind"], str(stats["count"]), str(stats["errors"]),
+                          str(stats["response_bytes"]), Stats.format_ms(stats["total_seconds"]),
+                          Stats.format_ms(stats["p50_seconds"]), Stats.format_ms(stats["p90_seconds"]),
+                          Stats.format_ms(stats["p99_seconds"]), Stats.format_ms(stats["max_seconds"]),
+                          "/".join(str(count) for count in stats["histogram"].values())],
+                         dict(stats, operation=operation), operation)
+        renderer.close()
+        api_stats = [stats for stats in snapshot.values() if stats["kind"] == Metrics.KIND_API]
+        if len(api_stats) != 0 and not renderer.is_machine_readable:
+            Logger.info(MSG_INFO_STATS_TOTAL.format(sum(stats["count"] for stats in api_stats),
+                                                    sum(stats["total_seconds"] for stats in api_stats),
+                                                    sum(stats["response_bytes"] for stats in api_stats),
+                                                    sum(stats["errors"] for stats in api_stats)))
+        Logger.header(STR_FOOTER)
+
     def list_pods(self):
         # List all pods
         Logger.header(STR_HEADER)
-        self.k8s_client.list_all_pods(self.display_all_namespace_pods)
+        self.listing_client.list_all_pods(paged=True)
         Logger.header(STR_FOOTER)
 
+    def list_pods_page_by_page(self):
+        # List all pods, rows are displayed as each page arrives
+        Logger.header(STR_HEADER)
+        for _ in self.k8s_client.stream_all_pods(PODS_LIST_PAGE_SIZE):
+            pass
+        Logger.header(STR_FOOTER)
+
+    def set_scope(self):
+        # set namespace, label selector and field selector used by all listings
+        try:
+            Logger.header(STR_HEADER)
+            namespace = input(MSG_PROMPT_INPUT_NAMESPACE.format(
+                self.k8s_client.namespace or ALL_NAMESPACES) + STR_SUFFIX)
+            label_selector = input(MSG_PROMPT_INPUT_LABEL_SELECTOR.format(
+                self.k8s_client.label_selector or "") + STR_SUFFIX)
+            field_selector = input(MSG_PROMPT_INPUT_FIELD_SELECTOR.format(
+                self.k8s_client.field_selector or "") + STR_SUFFIX)
+            self.listing_client.set_scope(
+                namespace or self.k8s_client.namespace,
+                self.get_selector_input(label_selector, self.k8s_client.label_selector),
+                self.get_selector_input(field_selector, self.k8s_client.field_selector))
+            Logger.info(self.listing_client.scope_description())
+            Logger.header(STR_FOOTER)
+        except Exception as err:
+            Logger.err(err)
+
+    @staticmethod
+    def get_selector_input(input_selector, current_selector):
+        # Enter keeps the current selector, '-' clears it
+        if input_selector is None or len(input_selector) == 0:
+            return current_selector
+        return None if input_selector == STR_CLEAR else input_selector
+
     def describe_pod(self):
         # describe pod
         try:
             while True:
                 Logger.header(STR_HEADER)
-                pod_list = self.k8s_client.list_all_pods(self.display_all_namespace_pods)
+                pod_list = self.k8s_client.list_all_pods()
                 if len(pod_list) > 0:
-                    pod_name = input(MSG_PROMPT_INPUT_NAME_LIST.format("Pod") + STR_SUFFIX)
+                    pod_index = self.k8s_client.get_pod_index()
+                    pod_name = self.input_name(MSG_PROMPT_INPUT_NAME_LIST.format("Pod") + STR_SUFFIX, pod_index)
                     if pod_name is not None and len(pod_name) != 0:
-                        if any(pod.startswith(pod_name) for pod in pod_list):
-                            # self.k8s_client.describe_k8s_pod(pod_name)
-                            # Using "subprocess" as python client's Return response is not is a good readable format.
-                            self.describe_pod_via_subprocess(pod_name)
+                        # like `kubectl describe pod`, an exact name wins, otherwise every pod with the prefix
+                        matched_pods = [pod_name] if pod_index.contains(pod_name) else pod_index.prefix_matches(
+                            pod_name)
+                        if len(matched_pods) > 0:
+                            for matched_pod in matched_pods:
+                                self.k8s_client.describe_k8s_pod(matched_pod)
                         else:
-                            Logger.err(MSG_ERR_INVALID_POD_NAME.format(pod_name))
+                            self.show_invalid_name(MSG_ERR_INVALID_POD_NAME, pod_name, pod_index)
                     else:
                         break
                 else:
@@ -140,17 +378,11 @@ class KubernetesCli:
             while True:
                 Logger.header(STR_HEADER)
                 input_image_name = input(MSG_PROMPT_INPUT_IMAGE_NAME + STR_SUFFIX)
-                file_name = None
                 if input_image_name is not None and len(input_image_name) > 0:
-                    if input_image_name == 'R' or input_image_name == 'r' or input_image_name == 'REDIS' or input_image_name == 'redis':
-                        file_name = REDIS_DEPLOY_FILE
-                    elif input_image_name == 'N' or input_image_name == 'n' or input_image_name == 'NGINX' or input_image_name == 'nginx':
-                        file_name = NGINX_DEPLOY_FILE
-                    else:
-                        Logger.warn(MSG_ERR_WRONG_INPUT.format(input_image_name))
-                    if file_name is not None and (file_name == REDIS_DEPLOY_FILE or file_name == NGINX_DEPLOY_FILE):
+                    file_name = self.get_image_file_name(input_image_name)
+                    if file_name is not None:
                         input_pod_name = input(MSG_PROMPT_INPUT_NAME.format("Pod") + STR_SUFFIX)
-                        self.k8s_client.create_k8s_pod(file_name, input_pod_name)
+                        self.k8s_client.create_k8s_pod(file_name, input_pod_name, self.input_wait_timeout())
                 else:
                     break;
             Logger.header(STR_FOOTER)
@@ -164,14 +396,17 @@ class KubernetesCli:
                 Logger.header(STR_HEADER)
                 deployments_list = self.k8s_client.list_k8s_deployments()
                 if len(deployments_list) > 0:
-                    dep_name = input(MSG_PROMPT_INPUT_NAME_LIST.format("Deployment") + STR_SUFFIX)
+                    deployment_index = self.k8s_client.get_deployment_index()
+                    dep_name = self.input_name(MSG_PROMPT_INPUT_NAME_LIST.format("Deployment") + STR_SUFFIX,
+                                               deployment_index)
                     if dep_name is not None and len(dep_name) != 0:
-                        if dep_name in deployments_list:
+                        if deployment_index.contains(dep_name):
                             scale_qty = input(MSG_PROMPT_INPUT_SCALE_QTY + STR_SUFFIX)
                             if scale_qty is not None and len(scale_qty) != 0:
-                                self.scale_deployment_via_subprocess(dep_name, scale_qty)
+                                self.k8s_client.scale_k8s_deployment(dep_name, scale_qty,
+                                                                     self.input_wait_timeout())
                         else:
-                            Logger.err(MSG_ERR_INVALID_DEPLOYMENT_NAME.format(dep_name))
+                            self.show_invalid_name(MSG_ERR_INVALID_DEPLOYMENT_NAME, dep_name, deployment_index)
                     else:
                         break
                 else:
@@ -185,15 +420,16 @@ class KubernetesCli:
         try:
             while True:
                 Logger.header(STR_HEADER)
-                pod_list = self.k8s_client.list_all_pods(self.display_all_namespace_pods)
+                pod_list = self.k8s_client.list_all_pods()
                 if len(pod_list) > 0:
-                    pod_name = input(MSG_PROMPT_INPUT_NAME_LIST.format("Pod") + STR_SUFFIX)
+                    pod_index = self.k8s_client.get_pod_index()
+                    pod_name = self.input_name(MSG_PROMPT_INPUT_NAME_LIST.format("Pod") + STR_SUFFIX, pod_index)
                     if pod_name is not None and len(pod_name) != 0:
-                        if pod_name in pod_list:
+                        if pod_index.contains(pod_name):
                             input_cmd = input(MSG_PROMPT_INPUT_CMD + STR_SUFFIX)
                             self.k8s_client.exec_command_on_k8s_pod(pod_name,input_cmd)
                         else:
-                            Logger.err(MSG_ERR_INVALID_POD_NAME.format(pod_name))
+                            self.show_invalid_name(MSG_ERR_INVALID_POD_NAME, pod_name, pod_index)
                     else:
                         break
                 else:
@@ -202,6 +438,48 @@ class KubernetesCli:
         except Exception as err:
             Logger.err(err)
 
+    def execute_cmd_on_pods(self):
+        # execute a command on every running pod matching a name pattern and/or a label selector
+        try:
+            Logger.header(STR_HEADER)
+            name_pattern = self.input_name(MSG_PROMPT_INPUT_POD_PATTERN + STR_SUFFIX, self.k8s_client.get_pod_index())
+            label_selector = input(MSG_PROMPT_INPUT_POD_SELECTOR + STR_SUFFIX)
+            pod_keys = self.k8s_client.select_pods(name_pattern or None, label_selector or None)
+            if len(pod_keys) == 0:
+                Logger.warn(MSG_WARN_NO_MATCHING_PODS.format(
+                    " ".join(filter(None, (name_pattern, label_selector))) or "*"))
+            else:
+                Logger.info(MSG_INFO_SELECTED_PODS.format(len(pod_keys)))
+                input_cmd = input(MSG_PROMPT_INPUT_CMD + STR_SUFFIX)
+                parallelism = input(MSG_PROMPT_INPUT_PARALLELISM.format(EXEC_PARALLELISM) + STR_SUFFIX)
+                self.k8s_client.exec_on_pods(pod_keys, input_cmd or self.k8s_client.DEFAULT_EXEC_CMD,
+                                             int(parallelism) if parallelism.isdigit() else EXEC_PARALLELISM)
+            Logger.header(STR_FOOTER)
+        except Exception as err:
+            Logger.err(err)
+
+    def follow_logs(self):
+        # follow the logs of every pod of a deployment or a label selector until Enter is pressed
+        try:
+            Logger.header(STR_HEADER)
+            deployment_name = self.input_name(MSG_PROMPT_INPUT_DEPLOYMENT_OPTIONAL + STR_SUFFIX,
+                                              self.k8s_client.get_deployment_index())
+            label_selector = input(MSG_PROMPT_INPUT_POD_SELECTOR + STR_SUFFIX)
+            since_seconds = input(MSG_PROMPT_INPUT_SINCE + STR_SUFFIX)
+            tail_lines = input(MSG_PROMPT_INPUT_TAIL + STR_SUFFIX)
+            streamer = self.k8s_client.follow_logs(deployment_name or None, label_selector or None,
+                                                   int(since_seconds) if since_seconds.isdigit() else None,
+                                                   int(tail_lines) if tail_lines.isdigit() else None)
+            if streamer is not None:
+                Logger.info(MSG_INFO_FOLLOWING_LOGS)
+                try:
+                    input()
+                finally:
+                    streamer.stop()
+            Logger.header(STR_FOOTER)
+        except Exception as err:
+            Logger.err(err)
+
     def deploy_pod(self):
         # deploy pod
         try:
@@ -209,7 +487,7 @@ class KubernetesCli:
                 Logger.header(STR_HEADER)
                 input_pod_name = input(MSG_PROMPT_INPUT_NAME.format("Pod") + STR_SUFFIX)
                 if input_pod_name is not None and len(input_pod_name) != 0:
-                        self.k8s_client.deploy_k8s_pod(DEPLOY_POD_FILE, input_pod_name)
+                        self.k8s_client.deploy_k8s_pod(DEPLOY_POD_FILE, input_pod_name, self.input_wait_timeout())
                 else:
                     break;
             Logger.header(STR_FOOTER)
@@ -221,14 +499,15 @@ class KubernetesCli:
         try:
             while True:
                 Logger.header(STR_HEADER)
-                pod_list = self.k8s_client.list_all_pods(self.display_all_namespace_pods)
+                pod_list = self.k8s_client.list_all_pods()
                 if len(pod_list) > 0:
-                    pod_name = input(MSG_PROMPT_INPUT_NAME_LIST.format("Pod") + STR_SUFFIX)
+                    pod_index = self.k8s_client.get_pod_index()
+                    pod_name = self.input_name(MSG_PROMPT_INPUT_NAME_LIST.format("Pod") + STR_SUFFIX, pod_index)
                     if pod_name is not None and len(pod_name) != 0:
-                        if pod_name in pod_list:
-                            self.delete_pod_via_subprocess(pod_name)
+                        if pod_index.contains(pod_name):
+                            self.k8s_client.delete_k8s_pod(pod_name)
                         else:
-                            Logger.err(MSG_ERR_INVALID_POD_NAME.format(pod_name))
+                            self.show_invalid_name(MSG_ERR_INVALID_POD_NAME, pod_name, pod_index)
                     else:
                         break
                 else:
@@ -237,41 +516,159 @@ class KubernetesCli:
         except Exception as err:
             Logger.err(err)
 
+    def delete_pods(self):
+        # delete every pod matching a name pattern and/or a label selector once the previewed list is confirmed
+        try:
+            Logger.header(STR_HEADER)
+            name_pattern = self.input_name(MSG_PROMPT_INPUT_POD_PATTERN_ALL + STR_SUFFIX,
+                                           self.k8s_client.get_pod_index())
+            label_selector = input(MSG_PROMPT_INPUT_POD_SELECTOR + STR_SUFFIX)
+            grace_period = input(MSG_PROMPT_INPUT_GRACE_PERIOD + STR_SUFFIX)
+            # urllib3, used for the retry decisions, is only needed once something is deleted
+            from BulkOperations import BulkDeleter
+            bulk_deleter = BulkDeleter(self.k8s_client, BULK_DELETE_CONCURRENCY, BULK_DELETE_QPS,
+                                       int(grace_period) if grace_period.isdigit() else None)
+            pod_keys = bulk_deleter.preview(name_pattern or None, label_selector or None)
+            if len(pod_keys) == 0:
+                Logger.warn(MSG_WARN_NO_MATCHING_OBJECTS.format(
+                    "pod", " ".join(filter(None, (name_pattern, label_selector))) or "*"))
+            elif self.confirm(MSG_PROMPT_CONFIRM_DELETE.format(len(pod_keys))):
+                bulk_deleter.delete(name_pattern or None, label_selector or None)
+            Logger.header(STR_FOOTER)
+        except Exception as err:
+            Logger.err(err)
+
+    def scale_deployments(self):
+        # scale every deployment matching a name pattern and/or a label selector once the previewed list is
+        # confirmed
+        try:
+            Logger.header(STR_HEADER)
+            name_pattern = self.input_name(MSG_PROMPT_INPUT_DEPLOYMENT_PATTERN + STR_SUFFIX,
+                                           self.k8s_client.get_deployment_index())
+            label_selector = input(MSG_PROMPT_INPUT_DEPLOYMENT_SELECTOR + STR_SUFFIX)
+            scale_qty = input(MSG_PROMPT_INPUT_SCALE_QTY + STR_SUFFIX)
+            if not scale_qty.isdigit():
+                if len(scale_qty) != 0:
+                    Logger.warn(MSG_ERR_WRONG_INPUT.format(scale_qty))
+            else:
+                from BulkOperations import BulkScaler
+                bulk_scaler = BulkScaler(self.k8s_client, BULK_SCALE_CONCURRENCY, BULK_SCALE_QPS)
+                deployments = bulk_scaler.preview(int(scale_qty), name_pattern or None, label_selector or None)
+                if len(deployments) == 0:
+                    Logger.warn(MSG_WARN_NO_MATCHING_OBJECTS.format(
+                        "deployment", " ".join(filter(None, (name_pattern, label_selector))) or "*"))
+                elif self.confirm(MSG_PROMPT_CONFIRM_SCALE.format(len(deployments), scale_qty)):
+                    bulk_scaler.scale(int(scale_qty), name_pattern or None, label_selector or None)
+            Logger.header(STR_FOOTER)
+        except Exception as err:
+            Logger.err(err)
+
+    def show_pod_summary(self):
+        # pod health summary of the current scope
+        try:
+            Logger.header(STR_HEADER)
+            input_top = input(MSG_PROMPT_INPUT_TOP.format(SUMMARY_TOP) + STR_SUFFIX)
+            self.k8s_client.show_pod_summary(int(input_top) if input_top.isdigit() else SUMMARY_TOP)
+            Logger.header(STR_FOOTER)
+        except Exception as err:
+            Logger.err(err)
+
+    def watch_pod_summary(self, top, interval):
+        # redraw the pod summary every interval seconds until interrupted, the informer keeps the pods current
+        # in between so a refresh only recomputes the summary. Returns the exit status
+        try:
+            while True:
+                self.clear_console()
+                self.k8s_client.show_pod_summary(top)
+                Logger.info(MSG_INFO_SUMMARY_REFRESH.format(interval))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            return 0
+
     def create_multiple_pods(self):
-        # create multiple pods
-        self.k8s_client
-        Logger.header(STR_HEADER)
-        Logger.info("Not Implemented..")
-        Logger.header(STR_FOOTER)
+        # create multiple pods concurrently
+        try:
+            while True:
+                Logger.header(STR_HEADER)
+                input_image_name = input(MSG_PROMPT_INPUT_IMAGE_NAME + STR_SUFFIX)
+                if input_image_name is not None and len(input_image_name) > 0:
+                    file_name = self.get_image_file_name(input_image_name)
+                    if file_name is None:
+                        continue
+                    input_count = input(MSG_PROMPT_INPUT_COUNT + STR_SUFFIX)
+                    if input_count is None or len(input_count) == 0:
+                        continue
+                    if not input_count.isdigit() or int(input_count) == 0:
+                        Logger.warn(MSG_ERR_WRONG_INPUT.format(input_count))
+                        continue
+                    default_name_pattern = ("redis" if file_name == REDIS_DEPLOY_FILE else "nginx") + "-bulk-{}"
+                    name_pattern = input(MSG_PROMPT_INPUT_NAME_PATTERN.format(default_name_pattern) + STR_SUFFIX)
+                    concurrency = input(MSG_PROMPT_INPUT_CONCURRENCY.format(BULK_CREATE_CONCURRENCY) + STR_SUFFIX)
+                    qps = input(MSG_PROMPT_INPUT_QPS.format(BULK_CREATE_QPS) + STR_SUFFIX)
+                    # urllib3, used for the retry decisions, is only needed once something is created
+                    from BulkOperations import BulkCreator
+                    bulk_creator = BulkCreator(self.k8s_client,
+                                               int(concurrency) if concurrency.isdigit() else BULK_CREATE_CONCURRENCY,
+                                               float(qps) if qps.replace(".", "", 1).isdigit() else BULK_CREATE_QPS)
+                    names = BulkCreator.names_for(name_pattern or default_name_pattern, int(input_count))
+                    bulk_creator.create(file_name, names)
+                else:
+                    break
+            Logger.header(STR_FOOTER)
+        except Exception as err:
+            Logger.err(err)
 
     @staticmethod
-    def delete_pod_via_subprocess(pod_name):
-        # delete pod using subprocess
-        try:
-            output = subprocess.check_output("kubectl delete pod " + pod_name ,shell=True)
-            Logger.info(output.decode("utf-8"))
-        except subprocess.CalledProcessError as err:
-            Logger.err(err.output.decode("utf-8"))
+    def get_image_file_name(input_image_name):
+        # manifest file of an image answer, None (with a warning) for a wrong input
+        if input_image_name == 'R' or input_image_name == 'r' or input_image_name == 'REDIS' or input_image_name == 'redis':
+            return REDIS_DEPLOY_FILE
+        elif input_image_name == 'N' or input_image_name == 'n' or input_image_name == 'NGINX' or input_image_name == 'nginx':
+            return NGINX_DEPLOY_FILE
+        Logger.warn(MSG_ERR_WRONG_INPUT.format(input_image_name))
+        return None
+
+    @staticmethod
+    def confirm(prompt):
+        # True for a 'y' answer
+        return input(prompt + STR_SUFFIX).strip().lower() == STR_YES
 
     @staticmethod
-    def scale_deployment_via_subprocess(dep_name, scale_qty):
-        # scale deployment using subprocess
+    def input_wait_timeout():
+        # rollout wait timeout in seconds, None for not waiting
+        input_wait = input(MSG_PROMPT_INPUT_WAIT.format(ROLLOUT_TIMEOUT_SECONDS) + STR_SUFFIX)
+        if input_wait is None or len(input_wait) == 0:
+            return None
+        if input_wait.lower() == STR_YES:
+            return ROLLOUT_TIMEOUT_SECONDS
         try:
-            output = subprocess.check_output("kubectl scale deployments/" + dep_name + " --replicas=" + scale_qty,
-                                             shell=True)
-            Logger.info(output.decode("utf-8"))
-        except subprocess.CalledProcessError as err:
-            Logger.err(err.output.decode("utf-8"))
+            return float(input_wait)
+        except ValueError:
+            Logger.warn(MSG_ERR_WRONG_INPUT.format(input_wait))
+            return None
 
     @staticmethod
-    def describe_pod_via_subprocess(pod_name):
-        # Describe pod using subprocess
+    def input_name(prompt, name_index):
+        # input() with tab completion of the names in name_index when readline is available
+        if readline is None:
+            return input(prompt)
+        previous_completer = readline.get_completer()
+        readline.set_completer(name_index.completer())
+        # pod names contain '-' and '.', only split words on whitespace
+        readline.set_completer_delims(" \t\n")
+        readline.parse_and_bind("tab: complete")
         try:
-            output = subprocess.check_output("kubectl describe pod " + pod_name, shell=True)
-            Logger.info(output.decode("utf-8"))
-        except subprocess.CalledProcessError as err:
-            Logger.err(err.output.decode("utf-8"))
+            return input(prompt)
+        finally:
+            readline.set_completer(previous_completer)
 
+    @staticmethod
+    def show_invalid_name(message, name, name_index):
+        # error for an unknown name, with close matches
+        Logger.err(message.format(name))
+        suggestions = name_index.suggestions(name)
+        if len(suggestions) > 0:
+            Logger.warn(MSG_INFO_DID_YOU_MEAN.format(", ".join(suggestions)))
 
     @staticmethod
     def clear_console():
@@ -280,14 +677,211 @@ class KubernetesCli:
     def run(self):
         # Main method
         self.clear_console()
-        self.k8s_client = Client.Client()
+        if self.profile_dir is not None:
+            os.makedirs(self.profile_dir, exist_ok=True)
+        # listings of the menus show the saved snapshots at once, while they are reconciled
+        self.warm_start = True
         self.main_menu.open()
 
+    def run_batch(self, args):
+        # run the operation of a subcommand, or the operations of a plan file, without prompts.
+        # Returns the exit status: 0 when every operation succeeded
+        if args.batch_command == COMMAND_SNAPSHOT:
+            return self.run_snapshot_command(args)
+        if args.batch_command == COMMAND_SUMMARY and args.watch:
+            return self.watch_pod_summary(args.top, args.watch)
+        batch_runner = BatchRunner(self.k8s_client, self.listing_client)
+        if args.batch_command == COMMAND_PLAN:
+            started_at = time.perf_counter()
+            operations, concurrency = BatchRunner.load_plan(args.plan_file)
+            # no progress lines between the JSON objects or names of machine readable output
+            show_progress = self.output_format in (TableRenderer.FORMAT_TABLE, TableRenderer.FORMAT_WIDE)
+            results = batch_runner.run(operations, args.concurrency or concurrency or BatchRunner.DEFAULT_CONCURRENCY,
+                                       show_progress)
+            batch_runner.show_results(results, self.output_format, time.perf_counter() - started_at)
+        else:
+            required, optional = BatchOperations.PARAMETERS[args.batch_command]
+            values = {name: getattr(args, COMMAND_ARGUMENTS.get(name, name), None) for name in required + optional}
+            params = {name: value for name, value in values.items() if value is not None}
+            operation = Operation(args.batch_command, args.batch_command, params)
+            BatchOperations.validate(operation.op, operation.params)
+            results = batch_runner.run([operation], 1)
+        if args.results:
+            BatchRunner.write_results(results, args.results)
+        return 0 if all(result.succeeded for result in results) else 1
+
+    def run_snapshot_command(self, args):
+        # save, list or diff snapshots of the first context, returns the exit status
+        from Rows import PodRow, DeploymentRow
+        if self.snapshot_file is None:
+            Logger.err(MSG_ERR_SNAPSHOTS_DISABLED)
+            return 1
+        k8s_client = self.k8s_client
+        try:
+            if args.snapshot_action == SNAPSHOT_SAVE:
+                if self.offline:
+                    Logger.err(MSG_ERR_SAVE_OFFLINE)
+                    return 1
+                k8s_client.take_snapshots()
+            elif args.snapshot_action == SNAPSHOT_LIST:
+                k8s_client.list_snapshots()
+            else:
+                row_class = DeploymentRow if args.kind == BatchOperations.KIND_DEPLOYMENTS else PodRow
+                k8s_client.diff_snapshots(row_class, *args.snapshot_ids[:2])
+        except k8s_client.CONNECTION_ERRORS + k8s_client.snapshot_store.ERRORS as error:
+            Logger.err(k8s_client.connection.describe_error(error))
+            return 1
+        return 0
+
+
+def parse_args():
+    # command line flags
+    parser = argparse.ArgumentParser(description="Kubernetes CLI")
+    parser.add_argument("-n", "--namespace", default=DEFAULT_NAMESPACE,
+                        help="namespace of the listings and operations")
+    parser.add_argument("-A", "--all-namespaces", action="store_true", help="list pods across all namespaces")
+    parser.add_argument("-l", "--selector", help="label selector, e.g. app=nginx,tier!=dev")
+    parser.add_argument("--field-selector", help="pod field selector, e.g. status.phase=Running")
+    parser.add_argument("--phase", help="only pods in this phase (field selector status.phase)")
+    parser.add_argument("--node", help="only pods on this node (field selector spec.nodeName)")
+    parser.add_argument("-o", "--output", choices=TableRenderer.FORMATS, default=TableRenderer.FORMAT_TABLE,
+                        help="output format of the listings")
+    parser.add_argument("--metrics-file", help="write the API call and timing statistics as JSON here on exit")
+    parser.add_argument("--profile", nargs="?", const=".", metavar="DIR",
+                        help="run every menu action under cProfile and save the profiles in DIR (default .)")
+    parser.add_argument("--context", action="append", dest="contexts", metavar="CONTEXT",
+                        help="kubeconfig context, repeat it to list pods and deployments of several clusters "
+                             "at once; other operations use the first (default: the current context)")
+    parser.add_argument("--all-contexts", action="store_true",
+                        help="list pods and deployments of every kubeconfig context")
+    parser.add_argument("--snapshot-file", metavar="FILE",
+                        help="SQLite file the pod and deployment snapshots are kept in (default {}); given, "
+                             "subcommands save their caches to it on exit too".format(SNAPSHOT_DB_FILE))
+    parser.add_argument("--no-snapshots", action="store_true",
+                        help="neither start from nor save snapshots")
+    parser.add_argument("--offline", action="store_true",
+                        help="browse the latest snapshots without contacting the cluster")
+    add_batch_commands(parser)
+    args = parser.parse_args()
+    if args.offline and args.no_snapshots:
+        parser.error("--offline needs the snapshots")
+    # the menus always save their caches on exit, subcommands only to an explicitly given file
+    args.save_on_exit = args.snapshot_file is not None
+    if args.no_snapshots:
+        args.snapshot_file = None
+    elif args.snapshot_file is None:
+        args.snapshot_file = SNAPSHOT_DB_FILE
+    if args.all_contexts:
+        # reading the kubeconfig needs the kubernetes package, only imported for this flag
+        from Client import Client
+        try:
+            args.contexts = Client.kube_contexts()
+        except Exception as err:
+            parser.error("unable to read the kubeconfig contexts: {}".format(err))
+    field_selectors = [args.field_selector] if args.field_selector else []
+    if args.phase:
+        field_selectors.append("status.phase=" + args.phase)
+    if args.node:
+        field_selectors.append("spec.nodeName=" + args.node)
+    args.namespace = ALL_NAMESPACES if args.all_namespaces else args.namespace
+    args.field_selector = ",".join(field_selectors) or None
+    return args
+
+
+def add_batch_commands(parser):
+    # subcommands running one operation, or a plan of many, and exiting. Without one the menus are opened
+    commands = parser.add_subparsers(dest="batch_command", metavar="COMMAND",
+                                     help="run without the menus: " + ", ".join(COMMANDS))
+    wait_kwargs = dict(nargs="?", type=float, const=ROLLOUT_TIMEOUT_SECONDS, metavar="SECONDS",
+                       help="wait until ready, at most SECONDS (default {})".format(ROLLOUT_TIMEOUT_SECONDS))
+    command = commands.add_parser("list", help="list pods or deployments")
+    command.add_argument("kind", nargs="?", choices=BatchOperations.KINDS, default=BatchOperations.KIND_PODS)
+    command = commands.add_parser("describe", help="describe pods by name or name prefix")
+    command.add_argument("name", nargs="+")
+    command = commands.add_parser("create", help="create a deployment from a manifest")
+    command.add_argument("image", help="'nginx', 'redis' or a manifest file")
+    command.add_argument("name")
+    command.add_argument("--wait", **wait_kwargs)
+    command = commands.add_parser("scale", help="scale a deployment")
+    command.add_argument("deployment")
+    command.add_argument("replicas", type=int)
+    command.add_argument("--wait", **wait_kwargs)
+    command = commands.add_parser("exec", help="run a command on running pods")
+    command.add_argument("command", nargs="?", help="shell command (default: an echo to stdout and stderr)")
+    command.add_argument("--pattern", help="pod name pattern, e.g. web-*")
+    command.add_argument("--pod-selector", dest="target_selector", help="label selector of the pods")
+    command.add_argument("--parallelism", type=int, default=EXEC_PARALLELISM)
+    command = commands.add_parser("delete", help="delete pods")
+    command.add_argument("name", nargs="+")
+    command = commands.add_parser("deploy", help="deploy a DaemonSet pod to every node")
+    command.add_argument("name")
+    command.add_argument("--manifest", default=DEPLOY_POD_FILE)
+    command.add_argument("--wait", **wait_kwargs)
+    command = commands.add_parser("bulk-delete", help="delete the pods matching a name pattern and/or a selector, "
+                                                      "all pods of the scope without either")
+    command.add_argument("--pattern", help="pod name pattern, e.g. web-*")
+    command.add_argument("--pod-selector", dest="target_selector", help="label selector of the pods")
+    command.add_argument("--grace-period", type=int, metavar="SECONDS",
+                         help="seconds the pods get to terminate, 0 to delete at once (default: the pods' own)")
+    command.add_argument("--dry-run", action="store_true", help="only list the pods that would be deleted")
+    command.add_argument("--concurrency", type=int, default=BULK_DELETE_CONCURRENCY)
+    command = commands.add_parser("bulk-scale", help="scale the deployments matching a name pattern and/or a "
+                                                     "selector, all deployments of the scope without either")
+    command.add_argument("replicas", type=int)
+    command.add_argument("--pattern", help="deployment name pattern, e.g. web-*")
+    command.add_argument("--deployment-selector", dest="target_selector", help="label selector of the deployments")
+    command.add_argument("--dry-run", action="store_true", help="only list the deployments that would be scaled")
+    command.add_argument("--concurrency", type=int, default=BULK_SCALE_CONCURRENCY)
+    command = commands.add_parser(COMMAND_SUMMARY, help="pods per phase, namespace and node, the most restarting "
+                                                        "pods and containers, not-ready controllers and pod ages")
+    command.add_argument("--top", type=int, default=SUMMARY_TOP, help="entries of the rankings (default {})".format(
+        SUMMARY_TOP))
+    command.add_argument("--watch", nargs="?", type=float, const=SUMMARY_REFRESH_SECONDS, metavar="SECONDS",
+                         help="redraw every SECONDS (default {}) until Ctrl-C".format(SUMMARY_REFRESH_SECONDS))
+    command = commands.add_parser(COMMAND_PLAN, help="run the operations of a YAML or JSON plan file")
+    command.add_argument("plan_file", metavar="FILE")
+    command.add_argument("--concurrency", type=int,
+                         help="operations run at a time (default: the plan's, else {})".format(
+                             BatchRunner.DEFAULT_CONCURRENCY))
+    for command in commands.choices.values():
+        command.add_argument("--results", metavar="FILE", help="write the operation results as JSON here")
+    command = commands.add_parser(COMMAND_SNAPSHOT, help="save the pods and deployments of the scope as a snapshot, "
+                                                         "list the snapshots or diff two of them")
+    command.add_argument("snapshot_action", metavar="ACTION", choices=SNAPSHOT_ACTIONS,
+                         help=", ".join(SNAPSHOT_ACTIONS))
+    command.add_argument("snapshot_ids", nargs="*", type=int, metavar="ID",
+                         help="diff: old and new snapshot (default: the two newest of the scope, "
+                              "or the newest after the old one's)")
+    command.add_argument("--kind", choices=BatchOperations.KINDS, default=BatchOperations.KIND_PODS,
+                         help="kind of the snapshots to diff")
+
 
 if __name__ == "__main__":
+    cli_args = parse_args()
+    exit_status = 0
+    kubernetes_cli = None
     try:
-        KubernetesCli().run()
+        Logger.disable_color_if_not_tty()
+        kubernetes_cli = KubernetesCli(cli_args.namespace, cli_args.selector, cli_args.field_selector,
+                                       cli_args.output, cli_args.profile, cli_args.contexts, cli_args.snapshot_file,
+                                       cli_args.offline, cli_args.save_on_exit)
+        if cli_args.batch_command is None:
+            kubernetes_cli.run()
+        else:
+            exit_status = kubernetes_cli.run_batch(cli_args)
     except KeyboardInterrupt as error:
         Logger.err(str(error))
+        exit_status = 1
+    except BrokenPipeError:
+        # the reader of the output has gone, e.g. head: exit quietly, writes and the flush at exit go to devnull
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        exit_status = EXIT_STATUS_BROKEN_PIPE
     except Exception as e:
         Logger.err(str(e))
+        exit_status = 1
+    finally:
+        if kubernetes_cli is not None:
+            kubernetes_cli.save_snapshots()
+        if cli_args.metrics_file:
+            Metrics.dump(cli_args.metrics_file)
+    sys.exit(exit_status)
@@ -0,0 +1,167 @@
+import collections
+import socket
+import sys
+import threading
+
+from kubernetes import client
+from kubernetes.watch.watch import iter_resp_lines
+
+from Logger import Logger
+
+
+class LogStream:
+    # Log lines of one pod waiting to be printed, held in a ring buffer: when the printer falls behind
+    # the oldest lines are dropped (and counted) instead of blocking the reader or growing without bound
+    __slots__ = ("namespace", "name", "color", "lines", "dropped", "response", "stopped")
+
+    def __init__(self, namespace, name, color, buffer_lines):
+        self.namespace = namespace
+        self.name = name
+        self.color = color
+        self.lines = collections.deque(maxlen=buffer_lines)
+        self.dropped = 0
+        self.response = None
+        self.stopped = False
+
+    def append(self, line):
+        # called by the reader thread only
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(line)
+
+
+class LogStreamer:
+    # A class for following the logs of every running pod of an Informer at once, merged into one output.
+    # Each pod is read by its own thread into a LogStream; a single printer thread drains all streams in
+    # batches, so a slow terminal never stalls the readers. As an Informer handler it starts following
+    # pods that appear or become Running while streaming, e.g. during a rollout.
+    POD_PHASE_RUNNING = "Running"
+    PREFIX_COLORS = ("CYAN", "OK_GREEN", "YELLOW", "MAGENTA", "HEADER")
+    FLUSH_INTERVAL_SECONDS = 0.1
+    MSG_LINE = "{}{}{} | {}"
+    MSG_DROPPED = "{} | ... {} lines dropped"
+    MSG_STREAM_FAILED = "{} | log stream failed: {}"
+    MSG_WARN_TOO_MANY_STREAMS = "Not following {}: already following {} pods"
+
+    def __init__(self, informer, new_api_client, since_seconds=None, tail_lines=None, buffer_lines=1000,
+                 max_streams=50):
+        # new_api_client(pool_maxsize) makes the ApiClient of the log requests
+        self.informer = informer
+        self.since_seconds = since_seconds
+        self.tail_lines = tail_lines
+        self.buffer_lines = buffer_lines
+        self.max_streams = max_streams
+        # follow requests hold a connection each, the pool is sized so they are all kept
+        self.api = client.CoreV1Api(new_api_client(max_streams))
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.data_ready = threading.Event()
+        self.stopped = threading.Event()
+        self.printer = None
+
+    # ---------------- Informer handler interface ----------------
+    def reset(self, rows):
+        for row in rows:
+            self.follow(row)
+
+    def update(self, old_row, new_row):
+        if new_row is not None:
+            self.follow(new_row)
+
+    # ---------------- streaming ----------------
+    def start(self):
+        # start the printer, then the informer, whose initial listing starts the first streams
+        self.printer = threading.Thread(target=self.print_loop, name="log-printer", daemon=True)
+        self.printer.start()
+        self.informer.add_handler(self)
+        self.informer.start()
+
+    def stop(self):
+        # stop following, print what was read and return once the printer is done
+        self.informer.stop()
+        self.stopped.set()
+        with self.lock:
+            streams = list(self.streams.values())
+        for log_stream in streams:
+            self.close(log_stream)
+        self.data_ready.set()
+        if self.printer is not None:
+            self.printer.join()
+
+    def follow(self, row):
+        # start reading a running pod that is not followed yet
+        if row.phase != self.POD_PHASE_RUNNING or self.stopped.is_set():
+            return
+        key = (row.namespace, row.name)
+        with self.lock:
+            if key in self.streams:
+                return
+            if len(self.streams) >= self.max_streams:
+                Logger.warn(self.MSG_WARN_TOO_MANY_STREAMS.format(row.name, len(self.streams)))
+                return
+            color = self.PREFIX_COLORS[len(self.streams) % len(self.PREFIX_COLORS)]
+            log_stream = self.streams[key] = LogStream(row.namespace, row.name, color, self.buffer_lines)
+        threading.Thread(target=self.read, args=(log_stream,), name="log-" + row.name, daemon=True).start()
+
+    def read(self, log_stream):
+        # reader thread of one pod, ends when the container's log ends or the stream is closed
+        kwargs = {}
+        if self.since_seconds is not None:
+            kwargs["since_seconds"] = self.since_seconds
+        if self.tail_lines is not None:
+            kwargs["tail_lines"] = self.tail_lines
+        try:
+            log_stream.response = self.api.read_namespaced_pod_log(log_stream.name, log_stream.namespace,
+                                                                   follow=True, _preload_content=False, **kwargs)
+            if log_stream.stopped:
+                return
+            for line in iter_resp_lines(log_stream.response):
+                log_stream.append(line)
+                self.data_ready.set()
+        except Exception as err:
+            if not log_stream.stopped:
+                log_stream.append(self.MSG_STREAM_FAILED.format(log_stream.name, err))
+                self.data_ready.set()
+        finally:
+            if log_stream.response is not None:
+                # the connection still has the rest of the log stream on it, it can not be reused
+                log_stream.response.close()
+                log_stream.response.release_conn()
+
+    @staticmethod
+    def close(log_stream):
+        # unblock a reader waiting for the next line: closing the response from another thread can deadlock
+        # on the reader's buffer lock, shutting the socket down makes the pending read return instead
+        log_stream.stopped = True
+        connection = getattr(log_stream.response, "connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def print_loop(self):
+        # printer thread, writes the lines of all streams in batches
+        while True:
+            self.data_ready.wait(self.FLUSH_INTERVAL_SECONDS)
+            self.data_ready.clear()
+            stopping = self.stopped.is_set()
+            self.print_pending()
+            if stopping:
+                break
+
+    def print_pending(self):
+        with self.lock:
+            streams = list(self.streams.values())
+        output = []
+        for log_stream in streams:
+            color = getattr(Logger, log_stream.color)
+            while len(log_stream.lines) != 0:
+                output.append(self.MSG_LINE.format(color, log_stream.name, Logger.END_C, log_stream.lines.popleft()))
+            if log_stream.dropped != 0:
+                dropped, log_stream.dropped = log_stream.dropped, 0
+                output.append(Logger.WARNING + self.MSG_DROPPED.format(log_stream.name, dropped) + Logger.END_C)
+        if len(output) != 0:
+            sys.stdout.write("\n".join(output) + "\n")
+            sys.stdout.flush()
@@ -1,3 +1,9 @@
+import contextlib
+import os
+import sys
+import threading
+
+
 class Logger:
     HEADER = '\033[96m'
     MAGENTA = '\033[95m'
@@ -8,6 +14,8 @@ class Logger:
     END_C = '\033[0m'
     BOLD = "\033[1m"
     WARNING = "\033[33m"
+    # errors of the calling thread collected by capture_errors()
+    captured = threading.local()
 
     @classmethod
     def disable_color(cls):
@@ -21,6 +29,12 @@ class Logger:
         cls.BOLD = ''
         cls.WARNING = ''
 
+    @classmethod
+    def disable_color_if_not_tty(cls):
+        # no escape codes when stdout is piped or redirected, or when NO_COLOR is set
+        if not sys.stdout.isatty() or os.environ.get("NO_COLOR"):
+            cls.disable_color()
+
     @classmethod
     def enable_color(cls):
         cls.HEADER = '\033[96m'
@@ -55,4 +69,33 @@ class Logger:
 
     @classmethod
     def err(cls, message):
+        # a closed stdout is not an error to report, writing about it would fail again: it ends the program
+        if isinstance(message, BrokenPipeError):
+            raise message
         print(cls.FAIL + str(message) + cls.END_C)
+        errors = getattr(cls.captured, "errors", None)
+        if errors is not None:
+            errors.append(message)
+
+    @classmethod
+    @contextlib.contextmanager
+    def capture_errors(cls):
+        # collect the messages of err() called by this thread in the with statement, as passed (exceptions stay
+        # exceptions), they are still printed.
+        # Lets callers of methods that report failures through err() tell whether they failed
+        previous = getattr(cls.captured, "errors", None)
+        errors = cls.captured.errors = []
+        try:
+            yield errors
+        finally:
+            cls.captured.errors = previous
+
+    @classmethod
+    def progress(cls, message, done=False):
+        # rewrite the current line in place, done=True ends the line. When stdout is piped or redirected the
+        # updates would pile up on one line, only the final one is printed
+        if not sys.stdout.isatty():
+            if done and message:
+                print(cls.CYAN + message + cls.END_C, flush=True)
+            return
+        print("\r" + cls.CYAN + message + cls.END_C, end="\n" if done else "", flush=True)
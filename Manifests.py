@@ -0,0 +1,74 @@
+import os
+import threading
+
+import yaml
+
+try:
+    # libyaml based loader, several times faster than the pure Python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+from Config import MANIFESTS
+from Metrics import Metrics
+
+
+class ManifestCache:
+    # A class for parsing each yaml manifest once and stamping out per-name bodies from it.
+    # A template is re-parsed only when its file's mtime changes. Manifests are looked up by a
+    # registered name (see MANIFESTS in Config.py), whose files are in this directory, or by the path of any
+    # other file, relative to the current directory as with kubectl.
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    PHASE_PARSE = "parse manifest"
+
+    def __init__(self):
+        self.registry = dict(MANIFESTS)
+        self.templates = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, file_name):
+        # make a manifest available under a name
+        self.registry[name] = file_name
+
+    def path_of(self, name_or_file):
+        file_name = self.registry.get(name_or_file, name_or_file)
+        if file_name in self.registry.values():
+            return os.path.join(self.BASE_DIR, file_name)
+        return os.path.abspath(file_name)
+
+    def get_template(self, name_or_file):
+        # parsed manifest, shared: never modify the returned object, use render()
+        file_path = self.path_of(name_or_file)
+        mtime = os.stat(file_path).st_mtime_ns
+        with self.lock:
+            cached = self.templates.get(file_path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        with open(file_path) as f, Metrics.timed(self.PHASE_PARSE):
+            template = yaml.load(f, Loader=SafeLoader)
+        with self.lock:
+            self.templates[file_path] = (mtime, template)
+        return template
+
+    def render(self, name_or_file, name=None, labels=None, replicas=None):
+        # a fresh body from the template with the name and optionally labels and replicas applied
+        body = self.clone(self.get_template(name_or_file))
+        if name is not None and len(name) != 0:
+            body['metadata']['name'] = name
+        if labels:
+            body['metadata'].setdefault('labels', {}).update(labels)
+            pod_template = body.get('spec', {}).get('template')
+            if pod_template is not None:
+                pod_template.setdefault('metadata', {}).setdefault('labels', {}).update(labels)
+        if replicas is not None:
+            body['spec']['replicas'] = replicas
+        return body
+
+    @classmethod
+    def clone(cls, value):
+        # deep copy of a yaml tree (dicts, lists and scalars), much cheaper than copy.deepcopy
+        if isinstance(value, dict):
+            return {key: cls.clone(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [cls.clone(item) for item in value]
+        return value
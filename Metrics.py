@@ -0,0 +1,167 @@
+import collections
+import contextlib
+import json
+import threading
+import time
+
+from Stats import Stats
+
+
+class OperationStats:
+    # Counters of one operation, with its most recent durations kept for percentiles
+    __slots__ = ("kind", "count", "errors", "total_seconds", "response_bytes", "samples")
+
+    def __init__(self, kind, sample_limit):
+        self.kind = kind
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.response_bytes = 0
+        self.samples = collections.deque(maxlen=sample_limit)
+
+
+class Metrics:
+    # Process-wide timings of API calls and of the phases around them (deserialize, render, write,
+    # manifest parsing, menu actions).
+    # API calls are timed by wrapping ApiClient.call_api of every ApiClient the CLI creates (see instrument()),
+    # the time includes deserializing a preloaded body into models. Streamed responses (_preload_content=False:
+    # listings, watches, log follows, exec) are timed until their headers arrive, reading the body is part of
+    # the phase that reads it. Operations are named by method and path template, e.g.
+    # "GET /api/v1/namespaces/{namespace}/pods".
+    KIND_API = "api"
+    KIND_PHASE = "phase"
+    SAMPLE_LIMIT = 10000
+    # upper bounds of the latency histogram buckets, the last bucket is open
+    LATENCY_BUCKETS = (0.01, 0.1, 1.0)
+    LATENCY_BUCKET_TITLES = ("<10ms", "<100ms", "<1s", ">=1s")
+    operations = {}
+    lock = threading.Lock()
+    # response size of the calling thread's last request, passed from request() to call_api()
+    local = threading.local()
+
+    @classmethod
+    def record(cls, operation, seconds, response_bytes=None, error=False, kind=KIND_PHASE):
+        with cls.lock:
+            stats = cls.operations.get(operation)
+            if stats is None:
+                stats = cls.operations[operation] = OperationStats(kind, cls.SAMPLE_LIMIT)
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.samples.append(seconds)
+            if error:
+                stats.errors += 1
+            if response_bytes:
+                stats.response_bytes += response_bytes
+
+    @classmethod
+    @contextlib.contextmanager
+    def timed(cls, operation, kind=KIND_PHASE):
+        # time the body of a with statement, an exception is counted as an error and raised on
+        started_at = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            cls.record(operation, time.perf_counter() - started_at, error=error, kind=kind)
+
+    @classmethod
+    def instrument(cls, api_client):
+        # time every call_api of an ApiClient, returns the ApiClient
+        call_api = api_client.call_api
+        request = api_client.request
+        if getattr(call_api, "instrumented", False):
+            return api_client
+
+        def timed_call_api(resource_path, method, path_params=None, query_params=None, *args, **kwargs):
+            operation = cls.api_operation(method, resource_path, query_params)
+            cls.local.response_bytes = None
+            started_at = time.perf_counter()
+            error = False
+            try:
+                return call_api(resource_path, method, path_params, query_params, *args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                cls.record(operation, time.perf_counter() - started_at, cls.local.response_bytes, error,
+                           cls.KIND_API)
+
+        def sized_request(*args, **kwargs):
+            # kubernetes.stream swaps request for the websocket one while connecting an exec, that call has no size
+            response = request(*args, **kwargs)
+            cls.local.response_bytes = cls.response_size(response)
+            return response
+
+        timed_call_api.instrumented = True
+        api_client.call_api = timed_call_api
+        api_client.request = sized_request
+        return api_client
+
+    @staticmethod
+    def api_operation(method, resource_path, query_params):
+        # e.g. "GET /api/v1/pods", "WATCH /api/v1/pods"
+        for key, value in query_params or ():
+            if key == "watch" and value:
+                method = "WATCH"
+            elif key == "follow" and value:
+                method = "FOLLOW"
+        return method + " " + resource_path
+
+    @staticmethod
+    def response_size(response):
+        # bytes of a response when known before its body is read: the body of a preloaded response,
+        # Content-Length of a streamed one (reading .data of a streamed response would consume it).
+        # A preloaded response is a kubernetes.client.rest.RESTResponse, recognized by its attribute so that
+        # importing this module does not import the kubernetes package
+        if hasattr(response, "urllib3_response"):
+            return len(response.data) if response.data is not None else None
+        getheader = getattr(response, "getheader", None)
+        if getheader is not None:
+            content_length = getheader("Content-Length")
+            if content_length is not None and content_length.isdigit():
+                return int(content_length)
+        return None
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.operations = {}
+
+    @classmethod
+    def snapshot(cls):
+        # {operation: summary dict}, API calls first, each group sorted by total time
+        with cls.lock:
+            operations = [(operation, stats.kind, stats.count, stats.errors, stats.total_seconds,
+                           stats.response_bytes, list(stats.samples)) for operation, stats in cls.operations.items()]
+        operations.sort(key=lambda item: (item[1] != cls.KIND_API, -item[4]))
+        summary = collections.OrderedDict()
+        for operation, kind, count, errors, total_seconds, response_bytes, samples in operations:
+            summary[operation] = {
+                "kind": kind, "count": count, "errors": errors, "total_seconds": round(total_seconds, 6),
+                "response_bytes": response_bytes,
+                "p50_seconds": Stats.percentile(samples, 50), "p90_seconds": Stats.percentile(samples, 90),
+                "p99_seconds": Stats.percentile(samples, 99), "max_seconds": max(samples) if samples else None,
+                "histogram": dict(zip(cls.LATENCY_BUCKET_TITLES, cls.histogram(samples))),
+            }
+        return summary
+
+    @classmethod
+    def histogram(cls, samples):
+        # number of samples per LATENCY_BUCKETS bucket
+        counts = [0] * (len(cls.LATENCY_BUCKETS) + 1)
+        for seconds in samples:
+            position = 0
+            while position < len(cls.LATENCY_BUCKETS) and seconds >= cls.LATENCY_BUCKETS[position]:
+                position += 1
+            counts[position] += 1
+        return counts
+
+    @classmethod
+    def dump(cls, path):
+        # write the snapshot as JSON
+        with open(path, "w") as f:
+            json.dump(cls.snapshot(), f, indent=2)
+            f.write("\n")
@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+
+from Logger import Logger
+from Renderer import TableRenderer
+from Stats import Stats
+
+
+class ClusterResult:
+    # Outcome of fetching one cluster's rows, elapsed is None while the fetch has not finished
+    __slots__ = ("context", "rows", "error", "elapsed")
+    STATUS_OK = "ok"
+    STATUS_FAILED = "failed"
+    STATUS_TIMED_OUT = "timeout"
+
+    def __init__(self, context, rows=None, error=None, elapsed=None):
+        self.context = context
+        self.rows = rows
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def status(self):
+        if self.elapsed is None:
+            return self.STATUS_TIMED_OUT
+        return self.STATUS_FAILED if self.error is not None else self.STATUS_OK
+
+
+class MultiClusterClient:
+    # A class for listing pods and deployments of several kubeconfig contexts at once.
+    # Each context has its own Client, so its own connection pool, circuit breaker and informer caches.
+    # A listing fetches every cluster concurrently and adds each cluster's rows to one table, with a CLUSTER
+    # column, as soon as they arrive; clusters that fail are reported and the ones not answering within
+    # timeout seconds are left out, their fetch goes on in the background and fills their cache for the
+    # next listing. A per-cluster status and latency table follows the listing.
+    CLUSTER_COLUMN = ("CLUSTER", 20)
+    CLUSTERS_TITLE = "<Clusters>"
+    CLUSTERS_COLUMNS = (("CLUSTER", 20), ("STATUS", 8), ("ROWS", None), ("TIME", None), ("ERROR", None))
+    MSG_ERR_CLUSTER = "{}: {}"
+    MSG_WARN_TIMED_OUT = "{}: no answer within {:.0f}s"
+
+    def __init__(self, clients, timeout):
+        # clients is a list of Clients of different contexts, the first one is the primary
+        self.clients = clients
+        self.timeout = timeout
+
+    @property
+    def contexts(self):
+        return [k8s_client.context for k8s_client in self.clients]
+
+    @property
+    def output_format(self):
+        return self.clients[0].output_format
+
+    def set_scope(self, namespace, label_selector=None, field_selector=None):
+        for k8s_client in self.clients:
+            k8s_client.set_scope(namespace, label_selector, field_selector)
+
+    def scope_description(self):
+        return "{} clusters, {}".format(len(self.clients), self.clients[0].scope_description())
+
+    def fetch(self, get_rows):
+        # yield a ClusterResult per cluster as each fetch finishes, get_rows(client) returns the rows of a
+        # cluster; after timeout seconds the clusters still fetching are yielded without rows
+        results = queue.Queue()
+        for k8s_client in self.clients:
+            threading.Thread(target=self.fetch_one, args=(k8s_client, get_rows, results),
+                             name="cluster-" + str(k8s_client.context), daemon=True).start()
+        deadline = time.monotonic() + self.timeout
+        pending = set(self.contexts)
+        while pending:
+            try:
+                result = results.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            pending.discard(result.context)
+            yield result
+        for context in self.contexts:
+            if context in pending:
+                yield ClusterResult(context)
+
+    @staticmethod
+    def fetch_one(k8s_client, get_rows, results):
+        started_at = time.perf_counter()
+        try:
+            rows = get_rows(k8s_client)
+        except Exception as err:
+            results.put(ClusterResult(k8s_client.context, error=k8s_client.connection.describe_error(err),
+                                      elapsed=time.perf_counter() - started_at))
+            return
+        results.put(ClusterResult(k8s_client.context, rows, elapsed=time.perf_counter() - started_at))
+
+    def list_all_pods(self, paged=False):
+        # pods of every cluster in one table, returns (cluster, name) pairs
+        primary = self.clients[0]
+        # a cluster's snapshot, when warm starting, is listed until its cache is reconciled
+        return self.list_merged(lambda k8s_client: k8s_client.get_cached_pods(stale_ok=True), primary.pod_cells,
+                                primary.PODS_LIST_COLUMNS, primary.PODS_HEADER, primary.POD_KIND, paged)
+
+    def list_k8s_deployments(self, paged=False):
+        # deployments of every cluster in one table, returns (cluster, name) pairs
+        primary = self.clients[0]
+        return self.list_merged(lambda k8s_client: k8s_client.get_cached_deployments(stale_ok=True),
+                                primary.deployment_cells,
+                                primary.DEPLOYMENT_LIST_COLUMNS, primary.DEPLOYMENT_HEADER,
+                                primary.DEPLOYMENT_KIND, paged)
+
+    def list_merged(self, get_rows, row_cells, columns, title, kind, paged):
+        renderer = TableRenderer((self.CLUSTER_COLUMN,) + tuple(columns), self.output_format, title, kind, paged)
+        names = []
+        results = []
+        for result in self.fetch(get_rows):
+            results.append(result)
+            if result.status == ClusterResult.STATUS_FAILED:
+                Logger.err(self.MSG_ERR_CLUSTER.format(result.context, result.error))
+            elif result.status == ClusterResult.STATUS_TIMED_OUT:
+                Logger.warn(self.MSG_WARN_TIMED_OUT.format(result.context, self.timeout))
+            for row in result.rows or ():
+                cells, record, name = row_cells(row)
+                renderer.add([result.context] + cells, dict(record, cluster=result.context), name)
+                names.append((result.context, name))
+            # a table is written cluster by cluster, widening its columns as needed
+            renderer.flush()
+        renderer.close()
+        if not renderer.is_machine_readable:
+            self.show_clusters(results)
+        return names
+
+    def show_clusters(self, results):
+        # status, row count and fetch latency of every cluster
+        renderer = TableRenderer(self.CLUSTERS_COLUMNS, self.output_format, self.CLUSTERS_TITLE)
+        for result in sorted(results, key=lambda result: self.contexts.index(result.context)):
+            renderer.add([result.context, result.status, "NA" if result.rows is None else str(len(result.rows)),
+                          Stats.format_ms(result.elapsed), result.error or ""], None, result.context)
+        renderer.close()
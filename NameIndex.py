@@ -0,0 +1,150 @@
+import bisect
+import difflib
+import threading
+
+
+class NameIndex:
+    # A sorted index of object names for exact and prefix lookups in O(log n), kept up to date by an Informer.
+    # Names are shared by objects in different namespaces, so each name maps to the set of its (namespace, name) keys.
+    SUGGESTION_LIMIT = 5
+    SUGGESTION_CANDIDATES = 100
+
+    def __init__(self):
+        self.names = []
+        self.keys_by_name = {}
+        self.lock = threading.RLock()
+
+    # ---------------- Informer handler interface ----------------
+    def reset(self, rows):
+        # rebuild from a full listing
+        with self.lock:
+            self.keys_by_name = {}
+            self.clear_secondary()
+            for row in rows:
+                self.index(row)
+            self.names = sorted(self.keys_by_name)
+
+    def update(self, old_row, new_row):
+        # apply one change, old_row is None for an add and new_row is None for a delete
+        with self.lock:
+            if old_row is not None:
+                self.unindex(old_row)
+            if new_row is not None and self.index(new_row):
+                bisect.insort(self.names, new_row.name)
+
+    def index(self, row):
+        # index a row, returns True when its name was not indexed yet
+        keys = self.keys_by_name.get(row.name)
+        is_new_name = keys is None
+        if is_new_name:
+            keys = self.keys_by_name[row.name] = set()
+        keys.add((row.namespace, row.name))
+        return is_new_name
+
+    def unindex(self, row):
+        keys = self.keys_by_name.get(row.name)
+        if keys is None:
+            return
+        keys.discard((row.namespace, row.name))
+        if not keys:
+            del self.keys_by_name[row.name]
+            position = bisect.bisect_left(self.names, row.name)
+            if position < len(self.names) and self.names[position] == row.name:
+                del self.names[position]
+
+    def clear_secondary(self):
+        # hook for subclasses keeping more indexes
+        pass
+
+    # ---------------- lookups ----------------
+    def __len__(self):
+        with self.lock:
+            return len(self.keys_by_name)
+
+    def contains(self, name):
+        with self.lock:
+            return name in self.keys_by_name
+
+    def keys_of(self, name):
+        # (namespace, name) keys of the objects with a name
+        with self.lock:
+            return set(self.keys_by_name.get(name, ()))
+
+    def prefix_matches(self, prefix, limit=None):
+        # sorted names starting with prefix
+        with self.lock:
+            start = bisect.bisect_left(self.names, prefix)
+            matches = []
+            for position in range(start, len(self.names)):
+                name = self.names[position]
+                if not name.startswith(prefix) or (limit is not None and len(matches) >= limit):
+                    break
+                matches.append(name)
+            return matches
+
+    def suggestions(self, name):
+        # "did you mean" candidates for a name that is not in the index
+        matches = self.prefix_matches(name, self.SUGGESTION_LIMIT)
+        if matches:
+            return matches
+        # rank only the names sharing the longest prefix with the input instead of every name
+        for length in range(len(name) - 1, 0, -1):
+            candidates = self.prefix_matches(name[:length], self.SUGGESTION_CANDIDATES)
+            if candidates:
+                return difflib.get_close_matches(name, candidates, n=self.SUGGESTION_LIMIT, cutoff=0.6)
+        return []
+
+    def completer(self):
+        # readline completer function over the indexed names
+        def complete(text, state):
+            if state == 0:
+                complete.matches = self.prefix_matches(text)
+            return complete.matches[state] if state < len(complete.matches) else None
+        complete.matches = []
+        return complete
+
+
+class PodIndex(NameIndex):
+    # A NameIndex over PodRows with secondary indexes of pod keys by namespace, node and phase
+
+    def __init__(self):
+        self.by_namespace = {}
+        self.by_node = {}
+        self.by_phase = {}
+        super().__init__()
+
+    def clear_secondary(self):
+        self.by_namespace = {}
+        self.by_node = {}
+        self.by_phase = {}
+
+    def index(self, row):
+        is_new_name = super().index(row)
+        key = (row.namespace, row.name)
+        self.by_namespace.setdefault(row.namespace, set()).add(key)
+        self.by_node.setdefault(row.node_name, set()).add(key)
+        self.by_phase.setdefault(row.phase, set()).add(key)
+        return is_new_name
+
+    def unindex(self, row):
+        super().unindex(row)
+        key = (row.namespace, row.name)
+        for secondary, value in ((self.by_namespace, row.namespace), (self.by_node, row.node_name),
+                                 (self.by_phase, row.phase)):
+            keys = secondary.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del secondary[value]
+
+    def keys_in_namespace(self, namespace):
+        with self.lock:
+            return set(self.by_namespace.get(namespace, ()))
+
+    def keys_on_node(self, node_name):
+        with self.lock:
+            return set(self.by_node.get(node_name, ()))
+
+    def keys_in_phase(self, phase):
+        with self.lock:
+            return set(self.by_phase.get(phase, ()))
@@ -0,0 +1,133 @@
+import heapq
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from functools import partial
+from itertools import chain, compress, repeat
+from operator import add, and_, attrgetter, itemgetter, mul, not_
+
+from Metrics import Metrics
+
+
+class Column:
+    # A dictionary encoded column: values holds each distinct value once, codes the value's position per row
+    __slots__ = ("values", "codes")
+
+    def __init__(self, items):
+        # items is a list, it is read twice
+        self.values = list(dict.fromkeys(items))
+        positions = {value: position for position, value in enumerate(self.values)}
+        self.codes = array("l", map(positions.__getitem__, items))
+
+    def counts(self, selected=None):
+        # [(value, count)] by descending count, of the rows whose selected flag is set (all rows without flags)
+        codes = self.codes if selected is None else compress(self.codes, selected)
+        return [(self.values[code], count) for code, count in Counter(codes).most_common()]
+
+
+class PodColumns:
+    # The pods of a listing as columns, for aggregating without per-pod Python objects: namespace, node, phase
+    # and owner are dictionary encoded, restarts and the not-ready and active flags are arrays, creation times
+    # are kept as their sortable RFC 3339 strings. The containers of the pods with restarts get columns of
+    # their own, container_pods holding the row of each container's pod; a container restarts no more than its
+    # pod, so the others can not rank. Columns are built with map() and friends, which loop in C
+    PHASES_DONE = ("Succeeded", "Failed")
+
+    def __init__(self, rows):
+        self.names = list(map(attrgetter("name"), rows))
+        self.namespaces = Column(list(map(attrgetter("namespace"), rows)))
+        self.nodes = Column(list(map(attrgetter("node_name"), rows)))
+        self.phases = Column(list(map(attrgetter("phase"), rows)))
+        self.owners = Column(list(map(attrgetter("owner"), rows)))
+        # pods of a controller are grouped per namespace: group = namespace code * owner count + owner code
+        self.owner_groups = array("l", map(add, map(mul, self.namespaces.codes, repeat(len(self.owners.values))),
+                                           self.owners.codes))
+        self.restarts = array("l", [restarts or 0 for restarts in map(attrgetter("restart_count"), rows)])
+        # pods that are meant to be ready: not completed, not failed
+        active_phases = [phase not in self.PHASES_DONE for phase in self.phases.values]
+        self.active = array("b", map(active_phases.__getitem__, self.phases.codes))
+        self.not_ready = array("b", map(and_, self.active, map(not_, map(attrgetter("ready"), rows))))
+        self.created = [created for created in map(attrgetter("created"), rows) if created]
+        restarting = list(compress(range(len(rows)), self.restarts))
+        containers = [rows[position].containers or () for position in restarting]
+        self.container_pods = array("l", chain.from_iterable(map(repeat, restarting, map(len, containers))))
+        containers = list(chain.from_iterable(containers))
+        self.container_names = list(map(itemgetter(0), containers))
+        self.container_restarts = array("l", map(itemgetter(1), containers))
+
+    def __len__(self):
+        return len(self.names)
+
+    def owner_of_group(self, group):
+        # (namespace, owner) of an owner group
+        namespace_code, owner_code = divmod(group, len(self.owners.values))
+        return self.namespaces.values[namespace_code], self.owners.values[owner_code]
+
+
+class PodSummary:
+    # Aggregates of a pod listing: pods per phase, node and namespace, the pods and containers restarting most,
+    # the not-ready share of each controller's active pods and the distribution of pod ages
+    PHASE_SUMMARY = "pod summary"
+    # (title, seconds) of the age buckets, a pod is in the first bucket it is younger than
+    AGE_BUCKETS = (("<1h", 3600), ("1h-1d", 86400), ("1d-7d", 7 * 86400), ("7d-30d", 30 * 86400),
+                   (">30d", None))
+    TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+    def __init__(self, rows, top, now=None):
+        # summary of PodRows, the per node and per namespace counts and the restart and readiness rankings
+        # keep their top entries
+        with Metrics.timed(self.PHASE_SUMMARY):
+            columns = PodColumns(rows)
+            self.count = len(columns)
+            self.phases = columns.phases.counts()
+            self.nodes = columns.nodes.counts()
+            self.namespaces = columns.namespaces.counts()
+            self.restarting_pods = self.top_restarting_pods(columns, top)
+            self.restarting_containers = self.top_restarting_containers(columns, top)
+            self.owners = self.top_not_ready_owners(columns, top)
+            self.ages = self.age_distribution(columns.created, time.time() if now is None else now)
+            self.oldest = min(columns.created) if columns.created else None
+
+    @staticmethod
+    def top_restarting_pods(columns, top):
+        # [(namespace, name, restarts, node)] of the top pods with restarts, most restarts first
+        restarts = columns.restarts
+        positions = heapq.nlargest(top, range(len(restarts)), key=restarts.__getitem__)
+        return [(columns.namespaces.values[columns.namespaces.codes[position]], columns.names[position],
+                 restarts[position], columns.nodes.values[columns.nodes.codes[position]])
+                for position in positions if restarts[position] > 0]
+
+    @staticmethod
+    def top_restarting_containers(columns, top):
+        # [(namespace, pod, container, restarts)] of the top containers with restarts, most restarts first
+        restarts = columns.container_restarts
+        indexes = heapq.nlargest(top, range(len(restarts)), key=restarts.__getitem__)
+        result = []
+        for index in indexes:
+            if restarts[index] == 0:
+                break
+            position = columns.container_pods[index]
+            result.append((columns.namespaces.values[columns.namespaces.codes[position]], columns.names[position],
+                           columns.container_names[index], restarts[index]))
+        return result
+
+    @staticmethod
+    def top_not_ready_owners(columns, top):
+        # [(namespace, owner, active pods, not ready pods)] of the top controllers with not-ready pods, highest
+        # not-ready share first; pods without an owner are left out
+        active = Counter(compress(columns.owner_groups, columns.active))
+        not_ready = Counter(compress(columns.owner_groups, columns.not_ready))
+        owners = [columns.owner_of_group(group) + (active[group], count) for group, count in not_ready.items()]
+        return heapq.nlargest(top, (owner for owner in owners if owner[1] is not None),
+                              key=lambda owner: (owner[3] / owner[2], owner[3]))
+
+    @classmethod
+    def age_distribution(cls, created, now):
+        # [(bucket title, pods)] of the creation times: the buckets' bounds are formatted as timestamps and
+        # compared as strings, so the times are not parsed
+        bounds = [time.strftime(cls.TIMESTAMP_FORMAT, time.gmtime(now - seconds))
+                  for _, seconds in reversed(cls.AGE_BUCKETS) if seconds is not None]
+        # bucket position from the oldest (0) to the youngest
+        counts = Counter(map(partial(bisect_right, bounds), created))
+        return [(title, counts[len(bounds) - position]) for position, (title, _) in enumerate(cls.AGE_BUCKETS)]
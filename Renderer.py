@@ -0,0 +1,139 @@
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+
+from Logger import Logger
+from Metrics import Metrics
+
+
+class TableRenderer:
+    # A class for displaying rows in one of the output formats:
+    #   table - buffered, column widths sized from the data, written in large chunks and paged when long
+    #   wide  - like table but untruncated and streamed one row at a time
+    #   json  - one JSON object per line, streamed
+    #   name  - "kind/name" per line, streamed
+    # Columns are (title, width) pairs: in a table cells longer than width are truncated with "..",
+    # in wide output width is the minimum width of the column.
+    FORMAT_TABLE = "table"
+    FORMAT_WIDE = "wide"
+    FORMAT_JSON = "json"
+    FORMAT_NAME = "name"
+    FORMATS = (FORMAT_TABLE, FORMAT_WIDE, FORMAT_JSON, FORMAT_NAME)
+    INDENT = "  "
+    COLUMN_GAP = "   "
+    TRUNCATION_MARK = ".."
+    CHUNK_SIZE = 64 * 1024
+    DEFAULT_PAGER = "less -FRX"
+    PHASE_RENDER = "render table"
+    PHASE_WRITE = "write output"
+
+    def __init__(self, columns, output_format=FORMAT_TABLE, title=None, kind=None, paged=False):
+        self.columns = columns
+        self.output_format = output_format
+        self.title = title
+        self.kind = kind
+        self.paged = paged
+        self.rows = []
+        self.widths = [len(column_title) for column_title, _ in columns]
+        self.displayed_header = False
+
+    @property
+    def is_machine_readable(self):
+        # json and name output carry no headers or messages, so they can be piped into other tools
+        return self.output_format in (self.FORMAT_JSON, self.FORMAT_NAME)
+
+    @property
+    def is_streamed(self):
+        return self.output_format != self.FORMAT_TABLE
+
+    def add(self, cells, record, name):
+        # add one row: display cells, a dict for json output and the object name
+        if self.output_format == self.FORMAT_TABLE:
+            self.rows.append(cells)
+        elif self.output_format == self.FORMAT_WIDE:
+            if not self.displayed_header:
+                self.write(self.header_lines(self.widths))
+            self.write([self.colored(Logger.OK_GREEN, self.format_line(cells, self.widths))])
+        elif self.output_format == self.FORMAT_JSON:
+            sys.stdout.write(json.dumps(record) + "\n")
+        else:
+            sys.stdout.write(self.kind + "/" + name + "\n")
+
+    def flush(self):
+        # write the rows added so far, a table keeps the column widths of earlier flushes and only widens them
+        if self.output_format == self.FORMAT_TABLE and len(self.rows) != 0:
+            self.write(self.table_lines())
+        sys.stdout.flush()
+
+    def close(self):
+        # write the remaining rows, a table written in one go goes through the pager when longer than the terminal
+        if self.output_format == self.FORMAT_TABLE and len(self.rows) != 0:
+            lines = self.table_lines()
+            if not self.paged or not self.page(lines):
+                self.write(lines)
+        sys.stdout.flush()
+
+    def table_lines(self):
+        with Metrics.timed(self.PHASE_RENDER):
+            return self.format_rows()
+
+    def format_rows(self):
+        for cells in self.rows:
+            for position, cell in enumerate(cells):
+                width = self.columns[position][1]
+                if width is not None and len(cell) > width:
+                    cells[position] = cell = cell[:width - len(self.TRUNCATION_MARK)] + self.TRUNCATION_MARK
+                if len(cell) > self.widths[position]:
+                    self.widths[position] = len(cell)
+        lines = self.header_lines(self.widths) if not self.displayed_header else []
+        for cells in self.rows:
+            lines.append(self.colored(Logger.OK_GREEN, self.format_line(cells, self.widths)))
+        self.rows = []
+        return lines
+
+    def header_lines(self, widths):
+        self.displayed_header = True
+        if self.output_format == self.FORMAT_WIDE:
+            # rows are not seen ahead of time, the columns get their minimum widths
+            for position, (_, width) in enumerate(self.columns):
+                widths[position] = max(widths[position], width or 0)
+        lines = [] if self.title is None else [self.colored(Logger.HEADER, self.title)]
+        lines.append(self.colored(Logger.MAGENTA, self.format_line([title for title, _ in self.columns], widths)))
+        return lines
+
+    def format_line(self, cells, widths):
+        last = len(cells) - 1
+        return self.INDENT + self.COLUMN_GAP.join(cell if position == last else cell.ljust(widths[position])
+                                                  for position, cell in enumerate(cells))
+
+    @staticmethod
+    def colored(color, text):
+        return color + text + Logger.END_C
+
+    def write(self, lines):
+        # one write per chunk instead of one per line
+        if len(lines) == 0:
+            return
+        with Metrics.timed(self.PHASE_WRITE):
+            text = "\n".join(lines) + "\n"
+            for start in range(0, len(text), self.CHUNK_SIZE):
+                sys.stdout.write(text[start:start + self.CHUNK_SIZE])
+
+    def page(self, lines):
+        # show lines in $PAGER (default less) when stdout is a terminal and they do not fit on it,
+        # returns False when the lines should be written directly instead
+        if not sys.stdout.isatty() or len(lines) < shutil.get_terminal_size().lines:
+            return False
+        pager = shlex.split(os.environ.get("PAGER") or self.DEFAULT_PAGER)
+        if len(pager) == 0 or shutil.which(pager[0]) is None:
+            return False
+        sys.stdout.flush()
+        try:
+            # the pager exits early when it is quit before reading everything
+            subprocess.run(pager, input=("\n".join(lines) + "\n").encode(), check=False)
+        except OSError:
+            return False
+        return True
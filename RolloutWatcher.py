@@ -0,0 +1,136 @@
+import json
+import math
+import time
+
+from kubernetes.watch.watch import iter_resp_lines
+from urllib3.exceptions import ReadTimeoutError, ProtocolError
+
+from Logger import Logger
+
+
+class RolloutWatcher:
+    # A class for waiting until a Deployment or DaemonSet reports its target ready/updated/available counts.
+    # The object is LISTed once by name (field selector metadata.name) and then followed by a WATCH from the
+    # LIST's resourceVersion, so progress is shown as the controller updates the status, without polling.
+    KIND_DEPLOYMENT = "deployment.apps"
+    KIND_DAEMON_SET = "daemonset.apps"
+    HTTP_STATUS_GONE = 410
+    EVENT_DELETED = "DELETED"
+    EVENT_BOOKMARK = "BOOKMARK"
+    EVENT_ERROR = "ERROR"
+    MSG_PROGRESS = "{}: {}  {:.1f}s"
+    MSG_READY = "{} ready in {:.2f}s"
+    MSG_ERR_TIMED_OUT = "{} not ready after {}s: {}"
+    MSG_ERR_NOT_FOUND = "{} not found"
+    MSG_ERR_DELETED = "{} was deleted while waiting"
+    MSG_DEPLOYMENT_STATUS = "updated {}/{} ready {}/{} available {}/{}"
+    MSG_DAEMON_SET_STATUS = "scheduled {}/{} updated {}/{} ready {}/{} available {}/{}"
+
+    def __init__(self, kind, list_func, namespace, name):
+        # list_func is the list_namespaced_* method of the object's kind
+        self.kind = kind
+        self.list_func = list_func
+        self.namespace = namespace
+        self.name = name
+        self.description = kind + "/" + name
+        self.status = "waiting"
+        self.elapsed = None
+
+    def wait(self, timeout):
+        # block until the rollout is complete, returns the seconds it took or None on timeout or deletion
+        started_at = time.monotonic()
+        deadline = started_at + timeout
+        resource_version = None
+        while time.monotonic() < deadline:
+            if resource_version is None:
+                obj, resource_version = self.get()
+                if obj is None:
+                    return self.fail(self.MSG_ERR_NOT_FOUND.format(self.description))
+                if self.update(obj, started_at):
+                    return self.succeed(started_at)
+            remaining = deadline - time.monotonic()
+            response = self.list_func(self.namespace, field_selector="metadata.name=" + self.name, watch=True,
+                                      resource_version=resource_version, allow_watch_bookmarks=True,
+                                      timeout_seconds=max(int(math.ceil(remaining)), 1), _preload_content=False,
+                                      _request_timeout=remaining)
+            try:
+                for line in iter_resp_lines(response):
+                    event = json.loads(line)
+                    if event["type"] == self.EVENT_ERROR:
+                        if event["object"].get("code") == self.HTTP_STATUS_GONE:
+                            # resourceVersion expired, start over from a fresh LIST
+                            resource_version = None
+                            break
+                        return self.fail(event["object"].get("message"))
+                    resource_version = event["object"]["metadata"]["resourceVersion"]
+                    if event["type"] == self.EVENT_DELETED:
+                        return self.fail(self.MSG_ERR_DELETED.format(self.description))
+                    if event["type"] != self.EVENT_BOOKMARK and self.update(event["object"], started_at):
+                        return self.succeed(started_at)
+                    if time.monotonic() >= deadline:
+                        break
+            except (ReadTimeoutError, ProtocolError):
+                # the server did not end the watch in time, the deadline is checked by the loop
+                pass
+            finally:
+                response.release_conn()
+        return self.fail(self.MSG_ERR_TIMED_OUT.format(self.description, timeout, self.status))
+
+    def get(self):
+        # (object or None, resourceVersion to watch from)
+        response = self.list_func(self.namespace, field_selector="metadata.name=" + self.name,
+                                  _preload_content=False)
+        object_list = json.loads(response.data)
+        items = object_list.get("items") or []
+        return (items[0] if items else None), object_list["metadata"]["resourceVersion"]
+
+    def update(self, obj, started_at):
+        # show the progress of an object, returns whether its rollout is complete
+        if self.kind == self.KIND_DAEMON_SET:
+            done, self.status = self.daemon_set_status(obj)
+        else:
+            done, self.status = self.deployment_status(obj)
+        Logger.progress(self.MSG_PROGRESS.format(self.description, self.status, time.monotonic() - started_at))
+        return done
+
+    def succeed(self, started_at):
+        self.elapsed = time.monotonic() - started_at
+        Logger.progress(self.MSG_PROGRESS.format(self.description, self.status, self.elapsed), done=True)
+        Logger.info(self.MSG_READY.format(self.description, self.elapsed))
+        return self.elapsed
+
+    def fail(self, message):
+        Logger.progress("", done=True)
+        Logger.err(message)
+        return None
+
+    @staticmethod
+    def observed(obj):
+        # the controller has seen the latest spec
+        return ((obj.get("status") or {}).get("observedGeneration") or 0) >= \
+            ((obj.get("metadata") or {}).get("generation") or 0)
+
+    @classmethod
+    def deployment_status(cls, deployment):
+        # complete when every replica is updated, ready and available and no old replica is left
+        target = (deployment.get("spec") or {}).get("replicas", 1)
+        status = deployment.get("status") or {}
+        replicas = status.get("replicas") or 0
+        updated = status.get("updatedReplicas") or 0
+        ready = status.get("readyReplicas") or 0
+        available = status.get("availableReplicas") or 0
+        done = cls.observed(deployment) and replicas == updated == ready == available == target
+        return done, cls.MSG_DEPLOYMENT_STATUS.format(updated, target, ready, target, available, target)
+
+    @classmethod
+    def daemon_set_status(cls, daemon_set):
+        # complete when the pod of every scheduled node is updated and available
+        status = daemon_set.get("status") or {}
+        desired = status.get("desiredNumberScheduled") or 0
+        scheduled = status.get("currentNumberScheduled") or 0
+        updated = status.get("updatedNumberScheduled") or 0
+        ready = status.get("numberReady") or 0
+        available = status.get("numberAvailable") or 0
+        done = cls.observed(daemon_set) and scheduled == updated == ready == available == desired
+        return done, cls.MSG_DAEMON_SET_STATUS.format(scheduled, desired, updated, desired, ready, desired,
+                                                      available, desired)
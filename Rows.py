@@ -0,0 +1,122 @@
+import json
+import time
+
+from Metrics import Metrics
+
+PHASE_READ = "read {} list"
+PHASE_DESERIALIZE = "deserialize {} list"
+
+
+class PodRow:
+    # A compact record of the pod fields used by the pod listing, the name checks and the pod summary.
+    # Built straight from the API's JSON, skipping the kubernetes client's V1Pod model construction.
+    # restart_count is the sum over the containers (None before any container status), containers holds
+    # [name, restart count, ready] per container status, owner is "kind/name" of the controller with a
+    # ReplicaSet of a Deployment resolved to the Deployment, created is the creationTimestamp as sent
+    # (RFC 3339 in UTC, so it sorts chronologically)
+    __slots__ = ("namespace", "name", "phase", "restart_count", "pod_ip", "node_name", "nominated_node_name",
+                 "readiness_gates", "ready", "containers", "owner", "created", "resource_version")
+    OWNER_FORMAT = "{}/{}"
+    KIND_REPLICA_SET = "ReplicaSet"
+    KIND_DEPLOYMENT = "Deployment"
+    # label a Deployment puts on its ReplicaSets' pods, the ReplicaSet is named <deployment>-<hash>
+    LABEL_POD_TEMPLATE_HASH = "pod-template-hash"
+    CONDITION_READY = "Ready"
+
+    def __init__(self, namespace, name, phase, restart_count, pod_ip, node_name, nominated_node_name,
+                 readiness_gates, ready, containers, owner, created, resource_version):
+        self.namespace = namespace
+        self.name = name
+        self.phase = phase
+        self.restart_count = restart_count
+        self.pod_ip = pod_ip
+        self.node_name = node_name
+        self.nominated_node_name = nominated_node_name
+        self.readiness_gates = readiness_gates
+        self.ready = ready
+        self.containers = containers
+        self.owner = owner
+        self.created = created
+        self.resource_version = resource_version
+
+    @classmethod
+    def from_dict(cls, pod):
+        # project a pod JSON object
+        metadata = pod.get("metadata") or {}
+        spec = pod.get("spec") or {}
+        status = pod.get("status") or {}
+        container_statuses = status.get("containerStatuses")
+        containers = None
+        restart_count = None
+        if container_statuses:
+            containers = [[container.get("name"), container.get("restartCount") or 0, bool(container.get("ready"))]
+                          for container in container_statuses]
+            restart_count = sum(container[1] for container in containers)
+        ready = None
+        for condition in status.get("conditions") or ():
+            if condition.get("type") == cls.CONDITION_READY:
+                ready = condition.get("status") == "True"
+        readiness_gates = spec.get("readinessGates")
+        if readiness_gates is not None:
+            # same shape as the V1PodReadinessGate models' repr
+            readiness_gates = [{"condition_type": gate.get("conditionType")} for gate in readiness_gates]
+        return cls(metadata.get("namespace"), metadata.get("name"), status.get("phase"), restart_count,
+                   status.get("podIP"), spec.get("nodeName"), status.get("nominatedNodeName"), readiness_gates,
+                   ready, containers, cls.owner_of(metadata), metadata.get("creationTimestamp"),
+                   metadata.get("resourceVersion"))
+
+    @classmethod
+    def owner_of(cls, metadata):
+        # "kind/name" of the controlling owner, None for a bare pod
+        for reference in metadata.get("ownerReferences") or ():
+            if not reference.get("controller"):
+                continue
+            kind, name = reference.get("kind"), reference.get("name") or ""
+            pod_template_hash = (metadata.get("labels") or {}).get(cls.LABEL_POD_TEMPLATE_HASH)
+            if kind == cls.KIND_REPLICA_SET and pod_template_hash and name.endswith("-" + pod_template_hash):
+                kind, name = cls.KIND_DEPLOYMENT, name[:-len(pod_template_hash) - 1]
+            return cls.OWNER_FORMAT.format(kind.lower(), name)
+        return None
+
+
+class DeploymentRow:
+    # A compact record of the deployment fields used by the deployment listing and the name checks.
+    __slots__ = ("namespace", "name", "replicas", "ready_replicas", "updated_replicas", "available_replicas",
+                 "resource_version")
+
+    def __init__(self, namespace, name, replicas, ready_replicas, updated_replicas, available_replicas,
+                 resource_version):
+        self.namespace = namespace
+        self.name = name
+        self.replicas = replicas
+        self.ready_replicas = ready_replicas
+        self.updated_replicas = updated_replicas
+        self.available_replicas = available_replicas
+        self.resource_version = resource_version
+
+    @classmethod
+    def from_dict(cls, deployment):
+        # project a deployment JSON object
+        metadata = deployment.get("metadata") or {}
+        status = deployment.get("status") or {}
+        return cls(metadata.get("namespace"), metadata.get("name"), status.get("replicas"),
+                   status.get("readyReplicas"), status.get("updatedReplicas"), status.get("availableReplicas"),
+                   metadata.get("resourceVersion"))
+
+
+def load_rows(response, row_class):
+    # parse a LIST response fetched with _preload_content=False into rows, returns (rows, list metadata);
+    # reading the body and parsing it are timed apart, see Metrics
+    started_at = time.perf_counter()
+    data = response.data
+    read_at = time.perf_counter()
+    Metrics.record(PHASE_READ.format(row_class.__name__), read_at - started_at, len(data))
+    with Metrics.timed(PHASE_DESERIALIZE.format(row_class.__name__)):
+        object_list = json.loads(data)
+        rows = [row_class.from_dict(obj) for obj in object_list.get("items") or []]
+    return rows, object_list.get("metadata") or {}
+
+
+def row_to_dict(row):
+    # plain dict of a row, e.g. for json output
+    return {field: getattr(row, field) for field in row.__slots__}
@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import time
+
+from Metrics import Metrics
+
+
+class SnapshotError(Exception):
+    # no snapshot to show, e.g. in offline mode before anything was saved
+    pass
+
+
+class Snapshot:
+    # One saved state of an informer cache: its rows at resource_version, taken_at is a time.time()
+    __slots__ = ("id", "cluster", "kind", "layout", "scope", "resource_version", "taken_at", "count")
+
+    def __init__(self, snapshot_id, cluster, kind, layout, scope, resource_version, taken_at, count):
+        self.id = snapshot_id
+        self.cluster = cluster
+        self.kind = kind
+        self.layout = layout
+        self.scope = scope
+        self.resource_version = resource_version
+        self.taken_at = taken_at
+        self.count = count
+
+
+class SnapshotStore:
+    # A class for keeping informer caches (see Informer) in a SQLite file, so a later start can show them at
+    # once and reconcile in the background, and they can be browsed without the API server.
+    # A snapshot is keyed by cluster (API server URL), row kind (PodRow/DeploymentRow) and scope (the LIST
+    # call and selectors of the informer) and records the resourceVersion the rows were current at. Rows are
+    # stored as JSON arrays of the row's fields, keyed by namespace and name so two snapshots are diffed
+    # with indexed joins. The field names are the snapshot's layout: snapshots of another layout, saved before
+    # a row class changed, are not loaded. The newest keep snapshots of each cluster, kind and scope are kept.
+    PHASE_LOAD = "load {} snapshot"
+    PHASE_SAVE = "save {} snapshot"
+    PHASE_DIFF = "diff snapshots"
+    CHANGE_ADDED = "added"
+    CHANGE_REMOVED = "removed"
+    CHANGE_CHANGED = "changed"
+    MSG_ERR_NO_SNAPSHOT = "No snapshot {}"
+    MSG_ERR_WRONG_LAYOUT = "Snapshot {} does not hold {}s of the current layout"
+    MSG_ERR_NOT_COMPARABLE = "Snapshots {} and {} are of different kinds or row layouts"
+    # a corrupt or unwritable store
+    ERRORS = (sqlite3.Error, OSError, ValueError)
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cluster TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            layout TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            resource_version TEXT,
+            taken_at REAL NOT NULL,
+            count INTEGER NOT NULL);
+        CREATE INDEX IF NOT EXISTS snapshots_by_key ON snapshots (cluster, kind, scope, id);
+        CREATE TABLE IF NOT EXISTS snapshot_rows (
+            snapshot_id INTEGER NOT NULL,
+            namespace TEXT NOT NULL,
+            name TEXT NOT NULL,
+            resource_version TEXT,
+            fields TEXT NOT NULL,
+            PRIMARY KEY (snapshot_id, namespace, name)) WITHOUT ROWID;
+    """
+
+    def __init__(self, path, keep):
+        self.path = os.path.expanduser(path)
+        self.keep = keep
+        self.initialized = False
+
+    def connect(self):
+        # a connection per call, so the store can be used from any thread
+        if not self.initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self.initialized:
+            connection.executescript(self.SCHEMA)
+            self.initialized = True
+        return connection
+
+    @staticmethod
+    def layout_of(row_class):
+        return ",".join(row_class.__slots__)
+
+    def save(self, cluster, row_class, scope, rows, resource_version):
+        # store rows as a new snapshot and drop the oldest ones beyond keep, returns the new Snapshot
+        kind = row_class.__name__
+        layout = self.layout_of(row_class)
+        taken_at = time.time()
+        with Metrics.timed(self.PHASE_SAVE.format(kind)):
+            connection = self.connect()
+            try:
+                with connection:
+                    snapshot_id = connection.execute(
+                        "INSERT INTO snapshots (cluster, kind, layout, scope, resource_version, taken_at, count) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (cluster, kind, layout, scope, resource_version, taken_at, len(rows))).lastrowid
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO snapshot_rows VALUES (?, ?, ?, ?, ?)",
+                        ((snapshot_id, row.namespace or "", row.name or "", row.resource_version,
+                          json.dumps(self.fields_of(row), separators=(",", ":"))) for row in rows))
+                    self.prune(connection, cluster, kind, scope)
+            finally:
+                connection.close()
+        return Snapshot(snapshot_id, cluster, kind, layout, scope, resource_version, taken_at, len(rows))
+
+    def prune(self, connection, cluster, kind, scope):
+        old_ids = [(snapshot_id,) for snapshot_id, in connection.execute(
+            "SELECT id FROM snapshots WHERE cluster = ? AND kind = ? AND scope = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (cluster, kind, scope, self.keep))]
+        connection.executemany("DELETE FROM snapshot_rows WHERE snapshot_id = ?", old_ids)
+        connection.executemany("DELETE FROM snapshots WHERE id = ?", old_ids)
+
+    def latest(self, cluster, row_class, scope, count=1):
+        # newest count Snapshots of a cluster, kind and scope in row_class's layout, newest first
+        connection = self.connect()
+        try:
+            return [Snapshot(*row) for row in connection.execute(
+                "SELECT * FROM snapshots WHERE cluster = ? AND kind = ? AND scope = ? AND layout = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (cluster, row_class.__name__, scope, self.layout_of(row_class), count))]
+        finally:
+            connection.close()
+
+    def get(self, snapshot_id):
+        connection = self.connect()
+        try:
+            row = connection.execute("SELECT * FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            raise SnapshotError(self.MSG_ERR_NO_SNAPSHOT.format(snapshot_id))
+        return Snapshot(*row)
+
+    def list(self, cluster=None, kind=None):
+        # Snapshots, newest first
+        query = "SELECT * FROM snapshots WHERE (? IS NULL OR cluster = ?) AND (? IS NULL OR kind = ?) ORDER BY id DESC"
+        connection = self.connect()
+        try:
+            return [Snapshot(*row) for row in connection.execute(query, (cluster, cluster, kind, kind))]
+        finally:
+            connection.close()
+
+    def load(self, snapshot, row_class):
+        # rows of a snapshot, ordered by namespace and name
+        if snapshot.kind != row_class.__name__ or snapshot.layout != self.layout_of(row_class):
+            raise SnapshotError(self.MSG_ERR_WRONG_LAYOUT.format(snapshot.id, row_class.__name__))
+        with Metrics.timed(self.PHASE_LOAD.format(row_class.__name__)):
+            connection = self.connect()
+            try:
+                return [row_class(*json.loads(fields)) for fields, in connection.execute(
+                    "SELECT fields FROM snapshot_rows WHERE snapshot_id = ? ORDER BY namespace, name",
+                    (snapshot.id,))]
+            finally:
+                connection.close()
+
+    def diff(self, old_snapshot, new_snapshot, row_class):
+        # (change, old_row, new_row) of every object added, removed or changed between two snapshots,
+        # ordered by namespace and name; unchanged objects are skipped in SQL by their resourceVersion
+        layout = self.layout_of(row_class)
+        if not old_snapshot.kind == new_snapshot.kind == row_class.__name__ \
+                or not old_snapshot.layout == new_snapshot.layout == layout:
+            raise SnapshotError(self.MSG_ERR_NOT_COMPARABLE.format(old_snapshot.id, new_snapshot.id))
+        with Metrics.timed(self.PHASE_DIFF):
+            connection = self.connect()
+            try:
+                rows = connection.execute(
+                    "SELECT old.fields, new.fields FROM snapshot_rows new "
+                    "LEFT JOIN snapshot_rows old ON old.snapshot_id = ? AND old.namespace = new.namespace "
+                    "AND old.name = new.name "
+                    "WHERE new.snapshot_id = ? AND (old.name IS NULL OR old.resource_version IS NOT new.resource_version) "
+                    "UNION ALL "
+                    "SELECT old.fields, NULL FROM snapshot_rows old "
+                    "WHERE old.snapshot_id = ? AND NOT EXISTS (SELECT 1 FROM snapshot_rows new WHERE "
+                    "new.snapshot_id = ? AND new.namespace = old.namespace AND new.name = old.name)",
+                    (old_snapshot.id, new_snapshot.id, old_snapshot.id, new_snapshot.id)).fetchall()
+            finally:
+                connection.close()
+            changes = []
+            for old_fields, new_fields in rows:
+                old_row = None if old_fields is None else row_class(*json.loads(old_fields))
+                new_row = None if new_fields is None else row_class(*json.loads(new_fields))
+                if old_row is None:
+                    changes.append((self.CHANGE_ADDED, None, new_row))
+                elif new_row is None:
+                    changes.append((self.CHANGE_REMOVED, old_row, None))
+                elif self.changed_fields(old_row, new_row):
+                    changes.append((self.CHANGE_CHANGED, old_row, new_row))
+            changes.sort(key=lambda change: ((change[2] or change[1]).namespace or "",
+                                             (change[2] or change[1]).name or ""))
+            return changes
+
+    @staticmethod
+    def fields_of(row):
+        return [getattr(row, field) for field in row.__slots__]
+
+    @staticmethod
+    def changed_fields(old_row, new_row):
+        # [(field, old value, new value)] of the fields that differ, the resourceVersion aside
+        return [(field, getattr(old_row, field), getattr(new_row, field)) for field in old_row.__slots__
+                if field != "resource_version" and getattr(old_row, field) != getattr(new_row, field)]
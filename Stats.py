@@ -0,0 +1,19 @@
+import math
+
+
+class Stats:
+    # Small helpers for latency statistics
+
+    @staticmethod
+    def percentile(values, percent):
+        # nearest-rank percentile of a list of numbers, None when empty
+        if not values:
+            return None
+        ordered = sorted(values)
+        rank = max(int(math.ceil(percent / 100.0 * len(ordered))), 1)
+        return ordered[rank - 1]
+
+    @staticmethod
+    def format_ms(seconds):
+        # seconds as a millisecond string
+        return "NA" if seconds is None else "{:.1f}ms".format(seconds * 1000)
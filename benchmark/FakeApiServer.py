@@ -0,0 +1,568 @@
+import base64
+import bisect
+import hashlib
+import itertools
+import json
+import re
+import struct
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeHttpServer(ThreadingHTTPServer):
+    # many clients connect at once during bulk runs, the default backlog of 5 drops connections
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class FakeApiServer:
+    # A local stand-in for the Kubernetes API server, serving synthetic pods and deployments.
+    # Supports LIST (limit/continue, label and field selectors), WATCH, GET, create, delete,
+    # delete-collection, scale, pod logs (with follow) and exec on an in-memory store.
+    # Latency can be injected per request. Created deployments and daemon sets are rolled out
+    # step by step by a pretend controller, exec runs the command locally.
+    NODES = 50
+    NAMESPACES = ("default", "kube-system", "monitoring", "payments")
+    PHASES = ("Running", "Running", "Running", "Pending", "Succeeded", "Failed")
+    WATCH_HISTORY = 10000
+    SETTLE_STEP_SECONDS = 0.05
+    DAEMONSET_STEP = 10
+    LOG_INTERVAL_SECONDS = 0.05
+    KUBECONFIG = """apiVersion: v1
+kind: Config
+clusters:
+- name: fake
+  cluster: {{server: {server}}}
+contexts:
+- name: fake
+  context: {{cluster: fake, user: fake}}
+current-context: fake
+users:
+- name: fake
+  user: {{token: fake}}
+"""
+
+    def __init__(self, pods=1000, deployments=100, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.lock = threading.Condition()
+        self.resource_version = 1
+        self.events = []
+        self.call_counts = {}
+        self.store = {"pods": {}, "deployments": {}, "daemonsets": {}, "events": {}}
+        # sorted store keys per kind, dropped when a key is added or removed
+        self.sorted_keys = {}
+        self.populate(pods, deployments)
+        self.httpd = FakeHttpServer((host, port), self.handler_class())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def write_kubeconfig(self, path):
+        # kubeconfig with a context "fake" pointing at this server
+        with open(path, "w") as f:
+            f.write(self.KUBECONFIG.format(server=self.url))
+
+    def reset_counts(self):
+        # returns the API call counts so far and starts counting from zero
+        with self.lock:
+            call_counts, self.call_counts = self.call_counts, {}
+        return call_counts
+
+    def checkpoint(self):
+        # keys of every stored object, for restore()
+        with self.lock:
+            return {kind: set(objects) for kind, objects in self.store.items()}
+
+    def restore(self, checkpoint):
+        # remove the objects created since a checkpoint
+        with self.lock:
+            for kind, objects in self.store.items():
+                for key in set(objects) - checkpoint[kind]:
+                    self.remove(kind, key)
+
+    def count(self, op):
+        with self.lock:
+            self.call_counts[op] = self.call_counts.get(op, 0) + 1
+
+    def next_rv(self):
+        self.resource_version += 1
+        return str(self.resource_version)
+
+    # ---------------- synthetic data ----------------
+    def populate(self, pods, deployments):
+        for i in range(deployments):
+            namespace = self.NAMESPACES[i % len(self.NAMESPACES)]
+            self.put("deployments", self.make_deployment(namespace, "app-{:05d}".format(i), 3), record=False)
+        for i in range(pods):
+            namespace = self.NAMESPACES[i % len(self.NAMESPACES)]
+            app = "app-{:05d}".format(i % max(deployments, 1))
+            self.put("pods", self.make_pod(namespace, "{}-7d9f8b6c5d-{:06x}".format(app, i), app, i), record=False)
+
+    def make_pod(self, namespace, name, app, seed=0):
+        phase = self.PHASES[seed % len(self.PHASES)]
+        ready = phase == "Running" and seed % 7 != 0
+        return {
+            "apiVersion": "v1", "kind": "Pod",
+            "metadata": {"name": name, "namespace": namespace, "labels": {"app": app},
+                         "uid": "uid-" + name, "creationTimestamp": "2026-01-01T00:00:00Z",
+                         "ownerReferences": [{"apiVersion": "apps/v1", "kind": "ReplicaSet",
+                                              "name": app + "-7d9f8b6c5d", "uid": "rs-" + app,
+                                              "controller": True}]},
+            "spec": {"nodeName": "node-{:03d}".format(seed % self.NODES),
+                     "containers": [{"name": "main", "image": "nginx:1.19"},
+                                    {"name": "sidecar", "image": "busybox"}]},
+            "status": {"phase": phase, "podIP": "10.0.{}.{}".format(seed // 250 % 250, seed % 250),
+                       "hostIP": "192.168.0.{}".format(seed % self.NODES),
+                       "startTime": "2026-01-01T00:00:05Z",
+                       "conditions": [{"type": "Ready", "status": "True" if ready else "False"}],
+                       "containerStatuses": [
+                           {"name": "main", "ready": ready, "restartCount": seed % 5, "image": "nginx:1.19",
+                            "imageID": "", "state": {"running": {"startedAt": "2026-01-01T00:00:05Z"}}},
+                           {"name": "sidecar", "ready": ready, "restartCount": seed % 3, "image": "busybox",
+                            "imageID": "", "state": {"running": {"startedAt": "2026-01-01T00:00:05Z"}}}]},
+        }
+
+    @staticmethod
+    def make_deployment(namespace, name, replicas):
+        return {
+            "apiVersion": "apps/v1", "kind": "Deployment",
+            "metadata": {"name": name, "namespace": namespace, "labels": {"app": name}, "generation": 1},
+            "spec": {"replicas": replicas, "selector": {"matchLabels": {"app": name}},
+                     "template": {"metadata": {"labels": {"app": name}},
+                                  "spec": {"containers": [{"name": "main", "image": "nginx:1.19"}]}}},
+            "status": {"replicas": replicas, "readyReplicas": replicas, "updatedReplicas": replicas,
+                       "availableReplicas": replicas, "observedGeneration": 1},
+        }
+
+    def put(self, kind, obj, record=True):
+        with self.lock:
+            meta = obj["metadata"]
+            key = self.key_of(obj)
+            event_type = "MODIFIED" if key in self.store[kind] else "ADDED"
+            if event_type == "ADDED":
+                self.sorted_keys.pop(kind, None)
+            meta["resourceVersion"] = self.next_rv()
+            self.store[kind][key] = obj
+            if record:
+                self.record(kind, event_type, obj)
+            return obj
+
+    def remove(self, kind, key):
+        with self.lock:
+            obj = self.store[kind].pop(key, None)
+            if obj is not None:
+                self.sorted_keys.pop(kind, None)
+                obj["metadata"]["resourceVersion"] = self.next_rv()
+                self.record(kind, "DELETED", obj)
+            return obj
+
+    def record(self, kind, event_type, obj):
+        self.events.append((int(obj["metadata"]["resourceVersion"]), kind, event_type, json.loads(json.dumps(obj))))
+        del self.events[:-self.WATCH_HISTORY]
+        self.lock.notify_all()
+
+    def settle_deployment(self, key):
+        # pretend the controller rolls the deployment out one replica per SETTLE_STEP_SECONDS
+        self.settle("deployments", key)
+
+    def settle(self, kind, key):
+        def step():
+            while True:
+                time.sleep(self.SETTLE_STEP_SECONDS)
+                with self.lock:
+                    obj = self.store[kind].get(key)
+                    if obj is None:
+                        return
+                    status = obj["status"]
+                    generation = obj["metadata"].get("generation", 1)
+                    if kind == "deployments":
+                        target = obj["spec"].get("replicas", 1)
+                        current = status.get("readyReplicas") or 0
+                        current = current + 1 if current < target else max(current - 1, target)
+                        status.update({"replicas": current, "readyReplicas": current, "updatedReplicas": current,
+                                       "availableReplicas": current, "observedGeneration": generation})
+                    else:
+                        target = self.NODES
+                        current = min((status.get("numberReady") or 0) + self.DAEMONSET_STEP, target)
+                        status.update({"desiredNumberScheduled": target, "currentNumberScheduled": current,
+                                       "updatedNumberScheduled": current, "numberReady": current,
+                                       "numberAvailable": current, "observedGeneration": generation})
+                    self.put(kind, obj)
+                    if current == target:
+                        return
+        threading.Thread(target=step, daemon=True).start()
+
+    # ---------------- query helpers ----------------
+    @staticmethod
+    def field_value(obj, path):
+        value = obj
+        for part in path.split("."):
+            value = value.get(part, {}) if isinstance(value, dict) else {}
+        return value if isinstance(value, str) else ""
+
+    FIELD_PATHS = {"metadata.name": "metadata.name", "metadata.namespace": "metadata.namespace",
+                   "status.phase": "status.phase", "spec.nodeName": "spec.nodeName",
+                   "involvedObject.name": "involvedObject.name"}
+
+    def matches(self, obj, label_selector, field_selector):
+        labels = obj["metadata"].get("labels") or {}
+        for term in filter(None, (label_selector or "").split(",")):
+            if "!=" in term:
+                k, v = term.split("!=", 1)
+                if labels.get(k) == v:
+                    return False
+            elif "=" in term:
+                k, v = term.replace("==", "=").split("=", 1)
+                if labels.get(k) != v:
+                    return False
+            elif labels.get(term) is None:
+                return False
+        for term in filter(None, (field_selector or "").split(",")):
+            negate = "!=" in term
+            k, v = term.replace("==", "=").split("!=" if negate else "=", 1)
+            actual = self.field_value(obj, self.FIELD_PATHS.get(k, k))
+            if (actual == v) == negate:
+                return False
+        return True
+
+    def select(self, kind, namespace, query, start_after=None, limit=0):
+        # matching objects in key order after the start_after key, at most limit of them,
+        # and whether more are left; a page costs its own size, not the size of the store
+        label_selector = query.get("labelSelector")
+        field_selector = query.get("fieldSelector")
+        items = []
+        with self.lock:
+            keys = self.sorted_keys.get(kind)
+            if keys is None:
+                keys = self.sorted_keys[kind] = sorted(self.store[kind])
+            position = 0 if start_after is None else bisect.bisect_right(keys, start_after)
+            for key in itertools.islice(keys, position, None):
+                obj = self.store[kind][key]
+                if (namespace is None or key[0] == namespace) and self.matches(obj, label_selector, field_selector):
+                    if limit and len(items) == limit:
+                        return items, True
+                    items.append(obj)
+        return items, False
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.dispatch(self, "GET")
+
+            def do_POST(self):
+                server.dispatch(self, "POST")
+
+            def do_DELETE(self):
+                server.dispatch(self, "DELETE")
+
+            def do_PATCH(self):
+                server.dispatch(self, "PATCH")
+
+            def do_PUT(self):
+                server.dispatch(self, "PUT")
+
+        return Handler
+
+    # ---------------- exec over websocket (v4.channel.k8s.io), the command runs locally ----------------
+    @staticmethod
+    def ws_frame(opcode, payload):
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 65536:
+            header += bytes([126]) + struct.pack(">H", len(payload))
+        else:
+            header += bytes([127]) + struct.pack(">Q", len(payload))
+        return header + payload
+
+    def serve_exec(self, handler, ns, name, command):
+        if (ns, name) not in self.store["pods"]:
+            return self.send_json(handler, 404, self.status(404, "NotFound", name))
+        accept = base64.b64encode(hashlib.sha1((handler.headers["Sec-WebSocket-Key"] +
+                                               "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode()).digest()).decode()
+        handler.send_response(101)
+        handler.send_header("Upgrade", "websocket")
+        handler.send_header("Connection", "Upgrade")
+        handler.send_header("Sec-WebSocket-Accept", accept)
+        handler.send_header("Sec-WebSocket-Protocol", "v4.channel.k8s.io")
+        handler.end_headers()
+        write_lock = threading.Lock()
+
+        def send(channel, data):
+            with write_lock:
+                handler.wfile.write(self.ws_frame(0x2, bytes([channel]) + data))
+                handler.wfile.flush()
+        env = dict(POD_NAME=name, POD_NAMESPACE=ns, PATH="/usr/bin:/bin")
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+
+        def pump(pipe, channel):
+            for chunk in iter(lambda: pipe.read1(4096), b""):
+                send(channel, chunk)
+        pumps = [threading.Thread(target=pump, args=(process.stdout, 1)),
+                 threading.Thread(target=pump, args=(process.stderr, 2))]
+        for t in pumps:
+            t.start()
+        for t in pumps:
+            t.join()
+        code = process.wait()
+        if code == 0:
+            status = {"metadata": {}, "status": "Success"}
+        else:
+            status = {"metadata": {}, "status": "Failure", "message": "command terminated with non-zero exit code",
+                      "reason": "NonZeroExitCode", "details": {"causes": [{"reason": "ExitCode", "message": str(code)}]}}
+        send(3, json.dumps(status).encode())
+        with write_lock:
+            handler.wfile.write(self.ws_frame(0x8, struct.pack(">H", 1000)))
+            handler.wfile.flush()
+        handler.close_connection = True
+
+    ROUTES = [
+        (r"^/api/v1/pods$", "pods", None),
+        (r"^/api/v1/namespaces/(?P<ns>[^/]+)/pods$", "pods", None),
+        (r"^/api/v1/namespaces/(?P<ns>[^/]+)/pods/(?P<name>[^/]+)$", "pods", None),
+        (r"^/api/v1/namespaces/(?P<ns>[^/]+)/pods/(?P<name>[^/]+)/log$", "pods", "log"),
+        (r"^/api/v1/namespaces/(?P<ns>[^/]+)/events$", "events", None),
+        (r"^/api/v1/events$", "events", None),
+        (r"^/apis/apps/v1/deployments$", "deployments", None),
+        (r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/deployments$", "deployments", None),
+        (r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/deployments/(?P<name>[^/]+)$", "deployments", None),
+        (r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/deployments/(?P<name>[^/]+)/scale$", "deployments", "scale"),
+        (r"^/apis/apps/v1/daemonsets$", "daemonsets", None),
+        (r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/daemonsets$", "daemonsets", None),
+        (r"^/apis/apps/v1/namespaces/(?P<ns>[^/]+)/daemonsets/(?P<name>[^/]+)$", "daemonsets", None),
+    ]
+
+    def dispatch(self, handler, method):
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = urlparse(handler.path)
+        exec_match = re.match(r"^/api/v1/namespaces/(?P<ns>[^/]+)/pods/(?P<name>[^/]+)/exec$", parsed.path)
+        if exec_match is not None:
+            self.count("EXEC pods")
+            return self.serve_exec(handler, exec_match.group("ns"), exec_match.group("name"),
+                                   parse_qs(parsed.query).get("command", []))
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        body = None
+        length = int(handler.headers.get("Content-Length") or 0)
+        if length:
+            body = json.loads(handler.rfile.read(length) or b"null")
+        for pattern, kind, sub in self.ROUTES:
+            match = re.match(pattern, parsed.path)
+            if match is None:
+                continue
+            ns = match.groupdict().get("ns")
+            name = match.groupdict().get("name")
+            op = "{} {}{}{}".format(method, kind, "/" + sub if sub else "", "" if name else " (collection)")
+            if method == "GET" and str(query.get("watch")).lower() in ("true", "1"):
+                op = "WATCH " + kind
+            self.count(op)
+            return self.route(handler, method, kind, sub, ns, name, query, body)
+        self.send_json(handler, 404, self.status(404, "NotFound", parsed.path))
+
+    def route(self, handler, method, kind, sub, ns, name, query, body):
+        if method == "GET" and name is None:
+            if str(query.get("watch")).lower() in ("true", "1"):
+                return self.serve_watch(handler, kind, ns, query)
+            return self.serve_list(handler, kind, ns, query)
+        key = (ns, name)
+        if method == "GET" and sub == "log" and str(query.get("follow")).lower() == "true":
+            return self.serve_log_follow(handler, name, query)
+        if method == "GET" and sub == "log":
+            return self.send_text(handler, "".join("log line {} from {}\n".format(i, name) for i in range(10)))
+        if method == "GET":
+            obj = self.store[kind].get(key)
+            if obj is None:
+                return self.send_json(handler, 404, self.status(404, "NotFound", name))
+            if sub == "scale":
+                return self.send_json(handler, 200, self.scale_of(obj))
+            return self.send_json(handler, 200, obj)
+        if method == "POST":
+            body["metadata"]["namespace"] = ns
+            body_key = (ns, body["metadata"]["name"])
+            if body_key in self.store[kind]:
+                return self.send_json(handler, 409, self.status(409, "AlreadyExists", body_key[1]))
+            body.setdefault("status", {})
+            if kind == "daemonsets":
+                for field in ("currentNumberScheduled", "desiredNumberScheduled", "numberMisscheduled", "numberReady"):
+                    body["status"].setdefault(field, 0)
+            body["metadata"].setdefault("generation", 1)
+            if query.get("dryRun") != "All":
+                self.put(kind, body)
+                if kind in ("deployments", "daemonsets"):
+                    self.settle(kind, body_key)
+            return self.send_json(handler, 201, body)
+        if method == "DELETE" and name is None:
+            items, _ = self.select(kind, ns, query)
+            if query.get("dryRun") != "All":
+                for obj in items:
+                    self.remove(kind, (ns, obj["metadata"]["name"]))
+            return self.send_json(handler, 200, {"kind": "PodList", "apiVersion": "v1",
+                                                 "metadata": {"resourceVersion": str(self.resource_version)},
+                                                 "items": items})
+        if method == "DELETE":
+            obj = self.store[kind].get(key)
+            if obj is None:
+                return self.send_json(handler, 404, self.status(404, "NotFound", name))
+            if query.get("dryRun") != "All":
+                self.remove(kind, key)
+            return self.send_json(handler, 200, obj)
+        if method in ("PATCH", "PUT"):
+            with self.lock:
+                obj = self.store[kind].get(key)
+                if obj is None:
+                    return self.send_json(handler, 404, self.status(404, "NotFound", name))
+                if sub == "scale":
+                    obj["spec"]["replicas"] = body["spec"]["replicas"]
+                    obj["metadata"]["generation"] = obj["metadata"].get("generation", 1) + 1
+                    self.put(kind, obj)
+                    self.settle_deployment(key)
+                    return self.send_json(handler, 200, self.scale_of(obj))
+                obj.update(body)
+                self.put(kind, obj)
+            return self.send_json(handler, 200, obj)
+        self.send_json(handler, 405, self.status(405, "MethodNotAllowed", method))
+
+    @staticmethod
+    def scale_of(obj):
+        return {"apiVersion": "autoscaling/v1", "kind": "Scale",
+                "metadata": {"name": obj["metadata"]["name"], "namespace": obj["metadata"]["namespace"],
+                             "resourceVersion": obj["metadata"]["resourceVersion"]},
+                "spec": {"replicas": obj["spec"].get("replicas", 0)},
+                "status": {"replicas": obj["status"].get("replicas", 0)}}
+
+    def serve_list(self, handler, kind, ns, query):
+        # the continue token is the "namespace/name" key of the last object sent
+        start_after = tuple(query["continue"].split("/", 1)) if query.get("continue") else None
+        items, more = self.select(kind, ns, query, start_after, int(query.get("limit") or 0))
+        metadata = {"resourceVersion": str(self.resource_version)}
+        if more:
+            metadata["continue"] = "/".join(self.key_of(items[-1]))
+        if "as=Table" in (handler.headers.get("Accept") or ""):
+            return self.send_json(handler, 200, self.table_of(items, metadata))
+        self.send_json(handler, 200, {"kind": kind.capitalize()[:-1] + "List", "apiVersion": "v1",
+                                      "metadata": metadata, "items": items})
+
+    @staticmethod
+    def key_of(obj):
+        return obj["metadata"].get("namespace", ""), obj["metadata"]["name"]
+
+    @staticmethod
+    def table_of(items, metadata):
+        return {"kind": "Table", "apiVersion": "meta.k8s.io/v1", "metadata": metadata,
+                "columnDefinitions": [], "rows": [{"cells": [], "object": obj} for obj in items]}
+
+    def serve_log_follow(self, handler, name, query):
+        # 10 past lines (tailLines applies), then a line every LOG_INTERVAL_SECONDS, or as fast as possible for
+        # pods with "noisy" in the name, until the client goes away
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/plain")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        past = ["log line {} from {}".format(i, name) for i in range(10)]
+        if query.get("tailLines") is not None:
+            past = past[len(past) - int(query["tailLines"]):] if int(query["tailLines"]) else []
+        number = 10
+        try:
+            if past:
+                self.write_raw_chunk(handler, ("\n".join(past) + "\n").encode())
+            while True:
+                if "noisy" in name:
+                    self.write_raw_chunk(handler, "".join("flood line {} from {}\n".format(number + i, name)
+                                                          for i in range(100)).encode())
+                    number += 100
+                else:
+                    time.sleep(self.LOG_INTERVAL_SECONDS)
+                    self.write_raw_chunk(handler, "log line {} from {}\n".format(number, name).encode())
+                    number += 1
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            handler.close_connection = True
+
+    @staticmethod
+    def write_raw_chunk(handler, data):
+        handler.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        handler.wfile.flush()
+
+    def serve_watch(self, handler, kind, ns, query):
+        since = int(query.get("resourceVersion") or 0)
+        timeout = float(query.get("timeoutSeconds") or 30)
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        deadline = time.time() + timeout
+        try:
+            with self.lock:
+                oldest = self.events[0][0] if self.events else self.resource_version + 1
+                if since and since < oldest - 1 and len(self.events) >= self.WATCH_HISTORY:
+                    self.write_chunk(handler, {"type": "ERROR", "object": self.status(410, "Expired", "too old")})
+                    return self.end_chunks(handler)
+            while time.time() < deadline:
+                with self.lock:
+                    pending = [e for e in self.events if e[0] > since and e[1] == kind
+                               and (ns is None or e[3]["metadata"].get("namespace") == ns)
+                               and self.matches(e[3], query.get("labelSelector"), query.get("fieldSelector"))]
+                    if not pending:
+                        self.lock.wait(min(0.5, max(deadline - time.time(), 0)))
+                        continue
+                for rv, _, event_type, obj in pending:
+                    self.write_chunk(handler, {"type": event_type, "object": obj})
+                    since = rv
+            self.end_chunks(handler)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    @staticmethod
+    def write_chunk(handler, event):
+        data = (json.dumps(event) + "\n").encode()
+        handler.wfile.write(("%x\r\n" % len(data)).encode() + data + b"\r\n")
+        handler.wfile.flush()
+
+    @staticmethod
+    def end_chunks(handler):
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+    @staticmethod
+    def status(code, reason, message):
+        return {"kind": "Status", "apiVersion": "v1", "status": "Failure", "code": code,
+                "reason": reason, "message": str(message)}
+
+    @staticmethod
+    def send_json(handler, code, payload):
+        data = json.dumps(payload).encode()
+        handler.send_response(code)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    @staticmethod
+    def send_text(handler, text):
+        data = text.encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/plain")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
@@ -0,0 +1,271 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from FakeApiServer import FakeApiServer
+
+
+class BenchmarkSuite:
+    # A class for benchmarking the Client against a local FakeApiServer.
+    # Every scenario runs in a fresh interpreter so its peak RSS is its own, the server stays in this
+    # process and counts the API calls the scenario made. A scenario is run several times, against the
+    # same objects each time, and the run with the median wall time is kept. Results are compared against
+    # a stored baseline: wall time and peak RSS may grow by the tolerance, API calls may not grow at all.
+    SCALES = {"1k": 1000, "10k": 10000, "100k": 100000}
+    DEFAULT_SCALES = "1k,10k"
+    # deployments of the synthetic cluster per pod
+    DEPLOYMENTS_PER_POD = 0.1
+    SCENARIOS = ("startup", "list_pods", "list_deployments", "create_pods_bulk", "deploy_pod", "exec_pods")
+    # absolute limits, checked whatever the baseline says: the CLI has to show its main menu within
+    # STARTUP_TARGET_SECONDS of being imported, without having loaded the kubernetes package
+    STARTUP_TARGET_SECONDS = 0.25
+    TARGETS = {"startup": {"wall_seconds": STARTUP_TARGET_SECONDS, "kubernetes_loaded": 0}}
+    DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+    DEFAULT_TOLERANCE = 0.25
+    DEFAULT_REPEAT = 3
+    # differences below these are noise whatever the tolerance says
+    WALL_SECONDS_SLACK = 0.05
+    PEAK_RSS_KB_SLACK = 4096
+    BULK_CONCURRENCY = 16
+    BULK_QPS = 10000
+    EXEC_PODS = 100
+    EXEC_CMD = "true"
+    ROLLOUT_TIMEOUT_SECONDS = 30
+    METRICS = ("wall_seconds", "peak_rss_kb", "api_calls")
+    # informers start their WATCH in the background once listed, whether it is sent before the scenario
+    # exits is a race, so watches are reported but not part of api_calls
+    WATCH_OPERATION_PREFIX = "WATCH "
+    MSG_HEADER = "{:<6} {:<18} {:>12} {:>12} {:>10}  {}"
+    MSG_ROW = "{:<6} {:<18} {:>12.3f} {:>12} {:>10}  {}"
+    MSG_REGRESSION = "{} {}: {} {} -> {} (limit {})"
+    MSG_TARGET_MISSED = "{} {}: {} {} above target {}"
+    MSG_BASELINE_SAVED = "Baseline saved to {}"
+    MSG_NO_BASELINE = "No baseline at {}, run with --save-baseline to create one"
+    MSG_REGRESSIONS = "{} regression(s) against {}"
+    MSG_NO_REGRESSIONS = "No regressions against {}"
+
+    def __init__(self, scales, latency, bulk_count, tolerance, repeat=DEFAULT_REPEAT):
+        self.scales = scales
+        self.latency = latency
+        self.bulk_count = bulk_count
+        self.tolerance = tolerance
+        self.repeat = max(int(repeat), 1)
+
+    def run(self):
+        # {scale: {scenario: metrics}}
+        results = {}
+        print(self.MSG_HEADER.format("SCALE", "SCENARIO", "WALL(s)", "PEAK RSS(KB)", "API CALLS", "CALLS BY OPERATION"))
+        for scale in self.scales:
+            pods = self.SCALES[scale]
+            server = FakeApiServer(pods=pods, deployments=int(pods * self.DEPLOYMENTS_PER_POD),
+                                   latency=self.latency).start()
+            handle, kubeconfig_path = tempfile.mkstemp(suffix=".yaml")
+            os.close(handle)
+            try:
+                server.write_kubeconfig(kubeconfig_path)
+                results[scale] = {}
+                for scenario in self.SCENARIOS:
+                    runs = [self.run_measured(server, scenario, kubeconfig_path) for _ in range(self.repeat)]
+                    metrics, call_counts = sorted(runs, key=lambda run: run[0]["wall_seconds"])[len(runs) // 2]
+                    results[scale][scenario] = metrics
+                    print(self.MSG_ROW.format(scale, scenario, metrics["wall_seconds"], metrics["peak_rss_kb"],
+                                              metrics["api_calls"], self.format_counts(call_counts)))
+            finally:
+                server.stop()
+                os.unlink(kubeconfig_path)
+        return results
+
+    def run_measured(self, server, scenario, kubeconfig_path):
+        # one run of a scenario, (metrics, API call counts); objects it created are removed afterwards
+        checkpoint = server.checkpoint()
+        server.reset_counts()
+        metrics = self.run_scenario(scenario, kubeconfig_path)
+        call_counts = server.reset_counts()
+        server.restore(checkpoint)
+        metrics["api_calls"] = sum(count for op, count in call_counts.items()
+                                   if not op.startswith(self.WATCH_OPERATION_PREFIX))
+        metrics["api_calls_by_operation"] = dict(sorted(call_counts.items()))
+        return metrics, call_counts
+
+    def run_scenario(self, scenario, kubeconfig_path):
+        # run one scenario in a child interpreter, returns its wall time and peak RSS
+        env = dict(os.environ, KUBECONFIG=kubeconfig_path)
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--scenario", scenario,
+                                 "--bulk-count", str(self.bulk_count)],
+                                cwd=REPO_DIR, env=env, check=True, stdout=subprocess.PIPE).stdout
+        return json.loads(output.decode().strip().splitlines()[-1])
+
+    @staticmethod
+    def format_counts(call_counts):
+        return ", ".join("{}={}".format(op, count) for op, count in sorted(call_counts.items()))
+
+    def compare(self, results, baseline):
+        # list of regression messages of the results against the baseline
+        regressions = []
+        for scale, scenarios in results.items():
+            for scenario, metrics in scenarios.items():
+                for metric, target in self.TARGETS.get(scenario, {}).items():
+                    if metrics[metric] > target:
+                        regressions.append(self.MSG_TARGET_MISSED.format(scale, scenario, metric, metrics[metric],
+                                                                         target))
+                expected = baseline.get(scale, {}).get(scenario)
+                if expected is None:
+                    continue
+                limits = {
+                    "wall_seconds": expected["wall_seconds"] * (1 + self.tolerance) + self.WALL_SECONDS_SLACK,
+                    "peak_rss_kb": expected["peak_rss_kb"] * (1 + self.tolerance) + self.PEAK_RSS_KB_SLACK,
+                    "api_calls": expected["api_calls"],
+                }
+                for metric in self.METRICS:
+                    if metrics[metric] > limits[metric]:
+                        regressions.append(self.MSG_REGRESSION.format(scale, scenario, metric, expected[metric],
+                                                                      metrics[metric], round(limits[metric], 3)))
+        return regressions
+
+
+class Scenarios:
+    # The operations measured, run in the child interpreter against the server of $KUBECONFIG.
+    # Display output goes to /dev/null, only the time spent producing it is measured.
+    BULK_NAME_PATTERN = "bench-{}"
+    DEPLOY_NAME = "bench-ds"
+
+    STARTUP = "startup"
+
+    def __init__(self, bulk_count, scenario):
+        # importing the kubernetes package is measured by the startup scenario alone
+        self.bulk_count = bulk_count
+        self.k8s_client = None if scenario == self.STARTUP else self.new_client()
+
+    @staticmethod
+    def new_client():
+        from Client import Client
+        k8s_client = Client()
+        k8s_client.set_scope(Client.ALL_NAMESPACES)
+        return k8s_client
+
+    def run(self, scenario):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            started_at = time.monotonic()
+            metrics = getattr(self, scenario)() or {}
+            elapsed = time.monotonic() - started_at
+        metrics.update(wall_seconds=round(elapsed, 4), peak_rss_kb=self.peak_rss_kb())
+        return metrics
+
+    @staticmethod
+    def peak_rss_kb():
+        # ru_maxrss survives exec on Linux and would include the benchmark process (and its server) that
+        # forked this one, VmHWM belongs to this process image only
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    @staticmethod
+    def startup():
+        # import the CLI and build its menus, all that runs before the main menu is shown
+        import KubernetesCli
+        KubernetesCli.KubernetesCli()
+        return {"kubernetes_loaded": int("kubernetes" in sys.modules)}
+
+    def list_pods(self):
+        self.k8s_client.list_all_pods()
+
+    def list_deployments(self):
+        self.k8s_client.list_k8s_deployments()
+
+    def create_pods_bulk(self):
+        from BulkOperations import BulkCreator
+        from Config import NGINX_DEPLOY_FILE
+        bulk_creator = BulkCreator(self.k8s_client, BenchmarkSuite.BULK_CONCURRENCY, BenchmarkSuite.BULK_QPS)
+        bulk_creator.create(NGINX_DEPLOY_FILE, BulkCreator.names_for(self.BULK_NAME_PATTERN, self.bulk_count))
+
+    def deploy_pod(self):
+        from Config import DEPLOY_POD_FILE
+        self.k8s_client.deploy_k8s_pod(DEPLOY_POD_FILE, self.DEPLOY_NAME,
+                                       wait_timeout=BenchmarkSuite.ROLLOUT_TIMEOUT_SECONDS)
+
+    def exec_pods(self):
+        pod_keys = self.k8s_client.select_pods()[:BenchmarkSuite.EXEC_PODS]
+        self.k8s_client.exec_on_pods(pod_keys, BenchmarkSuite.EXEC_CMD)
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Client against a local fake Kubernetes API server")
+    parser.add_argument("--scale", default=BenchmarkSuite.DEFAULT_SCALES,
+                        help="comma separated cluster sizes out of {} (default {})".format(
+                            ",".join(BenchmarkSuite.SCALES), BenchmarkSuite.DEFAULT_SCALES))
+    parser.add_argument("--latency", type=float, default=0.0, help="latency injected per API request, in seconds")
+    parser.add_argument("--bulk-count", type=int, default=200, help="deployments created by create_pods_bulk")
+    parser.add_argument("--baseline", default=BenchmarkSuite.DEFAULT_BASELINE, help="baseline file to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=BenchmarkSuite.DEFAULT_TOLERANCE,
+                        help="allowed relative growth of wall time and peak RSS (default 0.25)")
+    parser.add_argument("--repeat", type=int, default=BenchmarkSuite.DEFAULT_REPEAT,
+                        help="runs per scenario, the median is reported (default 3)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--scenario", choices=BenchmarkSuite.SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.scale = [scale.strip() for scale in args.scale.split(",") if scale.strip()]
+    for scale in args.scale:
+        if scale not in BenchmarkSuite.SCALES:
+            parser.error("unknown scale: " + scale)
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.scenario is not None:
+        # child interpreter of BenchmarkSuite.run_scenario
+        print(json.dumps(Scenarios(args.bulk_count, args.scenario).run(args.scenario)))
+        return 0
+    suite = BenchmarkSuite(args.scale, args.latency, args.bulk_count, args.tolerance, args.repeat)
+    results = suite.run()
+    if args.output:
+        save_baseline(args.output, results)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(BenchmarkSuite.MSG_BASELINE_SAVED.format(args.baseline))
+        return 0
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(BenchmarkSuite.MSG_NO_BASELINE.format(args.baseline))
+        return 0
+    regressions = suite.compare(results, baseline)
+    for regression in regressions:
+        print(regression)
+    if len(regressions) != 0:
+        print(BenchmarkSuite.MSG_REGRESSIONS.format(len(regressions), args.baseline))
+        return 1
+    print(BenchmarkSuite.MSG_NO_REGRESSIONS.format(args.baseline))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())